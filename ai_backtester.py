@@ -1,16 +1,20 @@
 import pandas as pd
-import numpy as np
 from sqlalchemy import create_engine, inspect
-import matplotlib.pyplot as plt
-import joblib
-import pandas_ta as ta
 import argparse
 import os
 import time
 from datetime import datetime
 import json
-import streamlit as st # Diperlukan untuk @st.cache_data
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from github_sync import sync_to_github # Impor kurir kita
+from backtest_engine import jalankan_simulasi
+from performance_metrics import hitung_metrik, bootstrap_sharpe_ci, susun_kurva
+from features import load_price_data
+from prediction_store import get_predictions
+from instrumentation import span, mulai_run, selesai_run, cetak_ringkasan
+
+# --- KONFIGURASI ---
+UKURAN_BATCH_METRIK = 32   # Mode pabrik: metrik kinerja dihitung per batch ticker yang selesai, lalu ditulis
 
 # --- FUNGSI-FUNGSI BANTU ---
 def get_available_models():
@@ -20,10 +24,11 @@ def get_available_models():
     
     model_files = os.listdir('models')
     # Ambil nama ticker dari nama file
-    tickers = [f.replace('_model.joblib', '') for f in model_files if f.endswith('_model.joblib')]
+    # Model pendamping (_arah, _sl, _tp) milik portfolio_manager tidak ikut di-backtest
+    tickers = [f.replace('_model.joblib', '') for f in model_files
+               if f.endswith('_model.joblib') and not f.endswith(('_arah_model.joblib', '_sl_model.joblib', '_tp_model.joblib'))]
     return sorted(tickers)
 
-@st.cache_data
 def load_optimal_params():
     """Memuat file parameter optimal."""
     try:
@@ -32,103 +37,58 @@ def load_optimal_params():
     except FileNotFoundError:
         return {}
 
-def jalankan_ai_backtesting(ticker_symbol, engine, all_optimal_params, modal_awal=100_000_000, show_chart=True):
+def tambah_metrik(daftar_hasil, daftar_ekuitas, daftar_posisi):
     """
-    Menjalankan simulasi backtesting untuk satu saham dan mengembalikan hasilnya.
+    Metrik kinerja (CAGR, Sharpe/Sortino, drawdown, win rate, dll.) + CI bootstrap Sharpe untuk
+    banyak saham dalam satu pass tervektorisasi (kurva diisi NaN). Mengembalikan daftar hasil berisi metrik.
     """
-    model_filename = f'models/{ticker_symbol}_model.joblib'
-    
-    # --- 1. MEMUAT DATA & MEMBUAT FITUR (SINKRON DENGAN TRAINER FINAL) ---
-    try:
-        df_daily = pd.read_sql(f"SELECT * FROM '{ticker_symbol}'", engine, index_col='Date', parse_dates=['Date'])
-        if len(df_daily) < 250: return None
-    except Exception:
-        return None
+    ekuitas, posisi = susun_kurva(daftar_ekuitas, daftar_posisi)
+    with span('metrics'):
+        df_metrik = hitung_metrik(ekuitas, posisi)
+        df_metrik['sharpe_ci_low'], df_metrik['sharpe_ci_high'] = bootstrap_sharpe_ci(ekuitas).T
+    return [{**hasil, **metrik} for hasil, metrik in zip(daftar_hasil, df_metrik.to_dict('records'))]
 
-    params = all_optimal_params.get(ticker_symbol, {'rsi_length': 14, 'bbands_length': 20})
+def jalankan_ai_backtesting(ticker_symbol, engine, all_optimal_params, modal_awal=100_000_000, show_chart=True, n_jobs=None, metrik=True):
+    """
+    Menjalankan simulasi backtesting untuk satu saham dan mengembalikan hasilnya.
+    'n_jobs' (opsional) menimpa jumlah thread prediksi model, misalnya 1 saat
+    dijalankan di dalam process pool agar CPU tidak kelebihan beban.
+    'metrik=False' (mode pabrik) melewati metrik kinerja; hasil lalu memuat kurva
+    'ekuitas' dan 'posisi' (array) agar metriknya dihitung per batch oleh tambah_metrik.
+    """
+    # --- 1. MEMUAT DATA HARGA ---
+    df = load_price_data(ticker_symbol, engine, 'daily')
+    if len(df) < 250: return None
 
-    # Replikasi feature engineering dari trainer.py secara lengkap
-    try:
-        df_weekly = pd.read_sql(f"SELECT * FROM '{ticker_symbol}_weekly'", engine, index_col='Date', parse_dates=['Date'])
-        df_weekly['SMA_20_weekly'] = df_weekly.ta.sma(length=20)
-        df_weekly['RSI_14_weekly'] = df_weekly.ta.rsi(length=14)
-        df_weekly_features = df_weekly[['SMA_20_weekly', 'RSI_14_weekly']]
-        df = pd.merge_asof(df_daily, df_weekly_features, left_index=True, right_index=True)
-    except:
-        df = df_daily.copy()
-        df[['SMA_20_weekly', 'RSI_14_weekly']] = 0
-    
-    try:
-        df_sentiment = pd.read_sql(f"SELECT * FROM news_sentiment WHERE ticker='{ticker_symbol}'", engine, parse_dates=['date'])
-        if not df_sentiment.empty:
-            sentiment_daily = df_sentiment.groupby(df_sentiment['date'].dt.date).agg(sentiment_sum=('sentiment', 'sum')).reset_index()
-            sentiment_daily['date'] = pd.to_datetime(sentiment_daily['date'])
-            sentiment_daily.set_index('date', inplace=True)
-            df = df.merge(sentiment_daily, left_index=True, right_index=True, how='left')
-    except:
-        df['sentiment_sum'] = 0
-
-    df.ta.rsi(length=params.get('rsi_length', 14), append=True)
-    df.ta.macd(fast=12, slow=26, signal=9, append=True)
-    df.ta.bbands(length=params.get('bbands_length', 20), append=True)
-    df.ta.atr(length=14, append=True)
-    df.ta.obv(append=True)
-    df.ta.adx(length=14, append=True)
-    df.ta.cdl_pattern(name="all", append=True)
-    df.ta.pivots(append=True)
-    pivot_levels_raw = ['PIVOTS_TRAD_D_P','PIVOTS_TRAD_D_S1','PIVOTS_TRAD_D_R1','PIVOTS_TRAD_D_S2','PIVOTS_TRAD_D_R2']
-    pivot_levels_simple = ['p','s1','r1','s2','r2']
-    rename_dict = {old: new for old, new in zip(pivot_levels_raw, pivot_levels_simple)}
-    df.rename(columns=rename_dict, inplace=True)
-    for level in pivot_levels_simple:
-        if level in df.columns: df[f'Jarak_ke_{level.upper()}'] = (df['Close'] - df[level]) / df['Close']
-    for level in ['p', 's1', 'r1']:
-        if level in df.columns: df[f'Posisi_vs_{level.upper()}'] = np.where(df['Close'] > df[level], 1, 0)
-    df.fillna(0, inplace=True)
-    
-    # --- 2. MEMUAT MODEL AI & MEMBUAT PREDIKSI ---
-    try:
-        model = joblib.load(model_filename)
-    except FileNotFoundError:
+    # --- 2. MEMUAT SINYAL AI DARI PENYIMPANAN PREDIKSI ---
+    # Fitur & model hanya dijalankan ulang untuk tanggal baru atau versi model baru
+    prediksi = get_predictions(ticker_symbol, engine, all_optimal_params, n_jobs=n_jobs)
+    if prediksi is None:
         return None
+    df['Sinyal'] = prediksi['Sinyal'].reindex(df.index).fillna(0).astype(int)
 
-    required_features = model.feature_names_in_
-    for col in required_features:
-        if col not in df.columns: df[col] = 0
-    X = df[required_features]
-    df['Sinyal'] = model.predict(X)
-    # --- 3. SIMULASI BACKTESTING ---
-    kas = modal_awal
-    jumlah_saham = 0
-    nilai_portfolio_harian = []
-    
-    for i in range(len(df)):
-        harga_hari_ini = df['Close'].iloc[i]
-        if df['Sinyal'].iloc[i] == 1 and kas > 0:
-            jumlah_saham = kas / harga_hari_ini
-            kas = 0
-        elif df['Sinyal'].iloc[i] == 0 and jumlah_saham > 0:
-            kas = jumlah_saham * harga_hari_ini
-            jumlah_saham = 0
-        nilai_portfolio_harian.append(kas + (jumlah_saham * harga_hari_ini))
-        
-    df['Nilai_Portfolio'] = nilai_portfolio_harian
+    # --- 3. SIMULASI BACKTESTING (TERVEKTORISASI) ---
+    with span('simulate', ticker_symbol):
+        simulasi = jalankan_simulasi(df, kolom_sinyal='Sinyal', modal_awal=modal_awal)
+    df['Nilai_Portfolio'] = simulasi['nilai_portfolio']
 
     # --- 4. HASIL ---
-    nilai_akhir = df['Nilai_Portfolio'].iloc[-1]
-    total_return_pct = ((nilai_akhir - modal_awal) / modal_awal) * 100
-    
-    # Filter data untuk periode yang sama dengan backtest untuk perbandingan yang adil
-    df_filtered = df[df.index >= df.index[0]]
-    buy_and_hold_return_pct = ((df_filtered['Close'].iloc[-1] - df_filtered['Close'].iloc[0]) / df_filtered['Close'].iloc[0]) * 100
+    nilai_akhir = simulasi['nilai_akhir']
+    total_return_pct = simulasi['total_return_pct']
+    buy_and_hold_return_pct = simulasi['bh_return_pct']
     
     hasil = {
         "ticker": ticker_symbol,
         "ai_return_pct": total_return_pct,
         "bh_return_pct": buy_and_hold_return_pct,
-        "alpha_pct": total_return_pct - buy_and_hold_return_pct,
+        "alpha_pct": simulasi['alpha_pct'],
         "nilai_akhir": nilai_akhir
     }
+
+    ekuitas, posisi = simulasi['nilai_portfolio'].to_numpy(), simulasi['posisi'].to_numpy()
+    if not metrik:
+        return {**hasil, 'ekuitas': ekuitas, 'posisi': posisi}
+    hasil = tambah_metrik([hasil], [ekuitas], [posisi])[0]
     
     if show_chart:
         print(f"\n--- HASIL AKHIR BACKTESTING (AI) UNTUK {ticker_symbol} ---")
@@ -136,7 +96,12 @@ def jalankan_ai_backtesting(ticker_symbol, engine, all_optimal_params, modal_awa
         print(f"Nilai Akhir Portfolio : Rp {nilai_akhir:,.0f}")
         print(f"Total Return Strategi AI: {total_return_pct:.2f}%")
         print(f"Total Return Buy & Hold : {buy_and_hold_return_pct:.2f}%")
+        print(f"Jumlah Transaksi      : {len(simulasi['transaksi'])}")
+        print(f"CAGR / Max Drawdown   : {hasil['cagr_pct']:.2f}% / {hasil['max_drawdown_pct']:.2f}%")
+        print(f"Sharpe (CI 95%)       : {hasil['sharpe']:.2f} ({hasil['sharpe_ci_low']:.2f} s/d {hasil['sharpe_ci_high']:.2f})")
+        print(f"Win Rate / Exposure   : {hasil['win_rate_pct']:.2f}% / {hasil['exposure_pct']:.2f}%")
         
+        import matplotlib.pyplot as plt # Hanya dibutuhkan saat grafik ditampilkan (bukan mode massal/headless)
         plt.style.use('dark_background')
         plt.figure(figsize=(14, 7))
         plt.plot(df.index, df['Nilai_Portfolio'], label='Kinerja Strategi AI', color='purple')
@@ -148,11 +113,111 @@ def jalankan_ai_backtesting(ticker_symbol, engine, all_optimal_params, modal_awa
         
     return hasil
 
+# --- MESIN BACKTEST MASSAL (PROCESS POOL + STREAMING KE DISK) ---
+_worker_engine = None
+_worker_params = None
+
+def _init_worker(db_file_path, all_optimal_params):
+    """Inisialisasi setiap proses worker: satu engine database per proses."""
+    global _worker_engine, _worker_params
+    _worker_engine = create_engine(db_file_path)
+    _worker_params = all_optimal_params
+
+def _backtest_worker(ticker):
+    """Backtest satu ticker di dalam proses worker (tanpa grafik, prediksi 1 thread, metrik di proses utama)."""
+    try:
+        return ticker, jalankan_ai_backtesting(ticker, _worker_engine, _worker_params, show_chart=False, n_jobs=1, metrik=False)
+    except Exception as e:
+        print(f"\n-> [{ticker}] GAGAL: {e}")
+        return ticker, None
+
+def tulis_baris_hasil(hasil, partial_filename):
+    """
+    Menambahkan satu baris hasil ke file CSV sementara (header hanya saat file baru).
+    Jika header file yang ada berbeda dari kolom hasil (file dari versi lama, mis. sebelum
+    kolom metrik ditambahkan, atau laporan lama untuk --perbarui), file ditulis ulang dengan
+    kolom baru lebih dulu agar baris tidak bergeser kolom.
+    """
+    df_baris = pd.DataFrame([hasil])
+    file_baru = not os.path.exists(partial_filename)
+    if not file_baru:
+        with open(partial_filename, 'r', encoding='utf-8') as f:
+            header = f.readline().rstrip('\r\n').split(',')
+        if header != list(df_baris.columns):
+            df_lama = pd.read_csv(partial_filename)
+            kolom = list(df_baris.columns) + [k for k in df_lama.columns if k not in df_baris.columns]
+            df_lama.reindex(columns=kolom).to_csv(partial_filename, index=False)
+            df_baris = df_baris.reindex(columns=kolom)
+    df_baris.to_csv(partial_filename, mode='a', header=file_baru, index=False)
+
+def tulis_batch_hasil(batch, partial_filename):
+    """Menghitung metrik kinerja satu batch hasil worker sekaligus, lalu menulis barisnya."""
+    daftar_ekuitas = [hasil.pop('ekuitas') for hasil in batch]
+    daftar_posisi = [hasil.pop('posisi') for hasil in batch]
+    for hasil in tambah_metrik(batch, daftar_ekuitas, daftar_posisi):
+        tulis_baris_hasil(hasil, partial_filename)
+
+def gabungkan_hasil(partial_filename, output_filename):
+    """
+    Langkah akhir: urutkan semua baris sementara berdasarkan alpha_pct dan tulis laporan final.
+    Mengembalikan (df_hasil, daftar file yang benar-benar ditulis).
+    """
+    df_hasil = pd.read_csv(partial_filename)
+    df_hasil = df_hasil.drop_duplicates(subset=['ticker'], keep='last')
+    df_hasil.sort_values(by='alpha_pct', ascending=False, inplace=True)
+    df_hasil.to_csv(output_filename, index=False, float_format='%.2f')
+    file_ditulis = [output_filename]
+    try:
+        df_hasil.to_parquet(output_filename.replace('.csv', '.parquet'), index=False)
+        file_ditulis.append(output_filename.replace('.csv', '.parquet'))
+    except ImportError:
+        pass # pyarrow/fastparquet tidak terpasang, cukup CSV saja
+    return df_hasil, file_ditulis
+
+def jalankan_backtest_massal(tickers, db_file_path, all_optimal_params, partial_filename, workers=None):
+    """
+    Menjalankan backtest untuk banyak ticker secara paralel. Hasil ditulis ke
+    'partial_filename' per batch UKURAN_BATCH_METRIK ticker (metrik kinerja batch dihitung
+    dalam satu pass), dan sisa batch tetap ditulis jika run terhenti di tengah jalan.
+    """
+    total = len(tickers)
+    selesai, berhasil = 0, 0
+    batch = []
+    start_time = time.time()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(db_file_path, all_optimal_params)) as executor:
+        futures = [executor.submit(_backtest_worker, ticker) for ticker in tickers]
+        try:
+            for future in as_completed(futures):
+                ticker, hasil = future.result()
+                selesai += 1
+                if hasil:
+                    batch.append(hasil)
+                    berhasil += 1
+                if len(batch) >= UKURAN_BATCH_METRIK:
+                    tulis_batch_hasil(batch, partial_filename)
+                    batch = []
+
+                durasi = time.time() - start_time
+                throughput = selesai / durasi if durasi > 0 else 0
+                eta_menit = (total - selesai) / throughput / 60 if throughput > 0 else 0
+                print(f"({selesai}/{total}) {ticker:<10} | {throughput:.2f} saham/detik | ETA: {eta_menit:.1f} menit   ", end='\r')
+        finally:
+            if batch:
+                tulis_batch_hasil(batch, partial_filename)
+
+    return berhasil
+
 # --- BAGIAN EKSEKUSI UTAMA (DENGAN MODE GANDA DAN AUTO-SYNC) ---
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Backtester Model AI (Mode Pabrik & Spesialis).")
     parser.add_argument("--tickers", nargs='+', help="(Opsional) Daftar ticker spesifik yang akan di-backtest (contoh: BBCA.JK ASII.JK)")
+    parser.add_argument("--workers", type=int, default=None, help="(Opsional) Jumlah proses paralel untuk mode pabrik (default: jumlah core CPU).")
+    parser.add_argument("--resume", action='store_true', help="(Opsional) Lanjutkan mode pabrik dari file hasil sementara run sebelumnya.")
+    parser.add_argument("--perbarui", action='store_true', help="(Opsional) Mode pabrik hanya untuk --tickers: baris ticker lain di laporan lama dipertahankan (dipakai pipeline.py).")
     args = parser.parse_args()
+    mulai_run('ai_backtester')
     
     db_file_path = "sqlite:///data_saham.db"
     engine = create_engine(db_file_path)
@@ -161,7 +226,7 @@ if __name__ == "__main__":
 
     tickers_to_process = []
     
-    if args.tickers:
+    if args.tickers and not args.perbarui:
         # MODE SPESIALIS
         tickers_to_process = [ticker.upper() for ticker in args.tickers]
         print(f"--- MENJALANKAN DALAM MODE SPESIALIS UNTUK {len(tickers_to_process)} SAHAM ---")
@@ -172,29 +237,34 @@ if __name__ == "__main__":
                 print(f"Error: File model '{model_file}' tidak ditemukan. Jalankan 'trainer.py --tickers {ticker}' terlebih dahulu.")
                 continue
             jalankan_ai_backtesting(ticker, engine, all_optimal_params, show_chart=True)
+        selesai_run(mode='spesialis')
 
     else:
         # MODE PABRIK
         tickers_to_process = get_available_models()
+        if args.tickers:
+            tickers_to_process = [ticker for ticker in tickers_to_process if ticker in {t.upper() for t in args.tickers}]
         print(f"--- MENJALANKAN DALAM MODE PABRIK UNTUK {len(tickers_to_process)} MODEL YANG DITEMUKAN ---")
         
-        semua_hasil = []
+        output_filename = 'hasil_backtest_semua.csv'
+        partial_filename = 'hasil_backtest_semua.partial.csv'
+
+        if args.resume and os.path.exists(partial_filename):
+            sudah_selesai = set(pd.read_csv(partial_filename, usecols=['ticker'])['ticker'])
+            tickers_to_process = [t for t in tickers_to_process if t not in sudah_selesai]
+            print(f"Melanjutkan run sebelumnya: {len(sudah_selesai)} saham sudah selesai, {len(tickers_to_process)} tersisa.")
+        elif args.perbarui and os.path.exists(output_filename):
+            # Laporan lama jadi baris awal file sementara; gabungkan_hasil menyimpan baris terbaru per ticker
+            pd.read_csv(output_filename).to_csv(partial_filename, index=False)
+        elif os.path.exists(partial_filename):
+            os.remove(partial_filename)
+
         start_time = time.time()
+        jumlah_berhasil = jalankan_backtest_massal(tickers_to_process, db_file_path, all_optimal_params, partial_filename, workers=args.workers)
         
-        for i, ticker in enumerate(tickers_to_process):
-            print(f"({i+1}/{len(tickers_to_process)}) Backtesting: {ticker}", end='\r')
-            
-            hasil = jalankan_ai_backtesting(ticker, engine, all_optimal_params, show_chart=False)
-            
-            if hasil:
-                semua_hasil.append(hasil)
-        
-        if semua_hasil:
-            df_hasil = pd.DataFrame(semua_hasil)
-            df_hasil.sort_values(by='alpha_pct', ascending=False, inplace=True)
-            
-            output_filename = 'hasil_backtest_semua.csv'
-            df_hasil.to_csv(output_filename, index=False, float_format='%.2f')
+        if os.path.exists(partial_filename):
+            df_hasil, file_ditulis = gabungkan_hasil(partial_filename, output_filename)
+            os.remove(partial_filename)
             
             end_time = time.time()
             total_waktu_menit = (end_time - start_time) / 60
@@ -203,10 +273,11 @@ if __name__ == "__main__":
             print("--- PROSES BACKTESTING MASSAL SELESAI ---")
             print(f"Laporan Akhir:")
             print(f"Total waktu            : {total_waktu_menit:.2f} menit")
-            print(f"Total saham diuji      : {len(semua_hasil)}")
+            print(f"Total saham diuji      : {len(df_hasil)} ({jumlah_berhasil} pada run ini)")
             print("\n--- 20 SAHAM DENGAN KINERJA AI TERBAIK (vs. Buy & Hold) ---")
             print(df_hasil.head(20).to_string())
             print(f"\nLaporan peringkat lengkap tersimpan di file: '{output_filename}'")
+            cetak_ringkasan(selesai_run(mode='pabrik', saham=jumlah_berhasil))
             print("="*54)
 
             with open('logs/ai_backtester_last_run.log', 'w') as f:
@@ -214,6 +285,7 @@ if __name__ == "__main__":
             print("\nStempel waktu backtesting berhasil dicatat.")
             
             # --- PANGGIL "KURIR" UNTUK SINKRONISASI OTOMATIS ---
-            sync_to_github(f"Auto-sync: Update laporan backtest untuk {len(semua_hasil)} saham")
+            sync_to_github(f"Auto-sync: Update laporan backtest untuk {len(df_hasil)} saham", file_ditulis + ['logs/ai_backtester_last_run.log'])
         else:
-            print("Tidak ada hasil backtest yang bisa diproses.")
\ No newline at end of file
+            print("Tidak ada hasil backtest yang bisa diproses.")
+            selesai_run(mode='pabrik', saham=0)
\ No newline at end of file
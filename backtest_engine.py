@@ -0,0 +1,131 @@
+import pandas as pd
+import numpy as np
+from itertools import accumulate
+
+# --- MESIN BACKTEST TERVEKTORISASI ---
+# Semua fungsi di sini menurunkan status posisi langsung dari deret sinyal
+# dengan operasi NumPy, tanpa loop Python per baris.
+
+def posisi_dari_sinyal(sinyal, nilai_beli=1, nilai_jual=0):
+    """
+    Mengubah deret sinyal menjadi status posisi harian (1 = pegang saham, 0 = kas).
+    Sinyal 'nilai_beli' membuka posisi, 'nilai_jual' menutupnya, nilai lain
+    (misalnya 0 atau NaN pada sinyal .diff()) mempertahankan status sebelumnya.
+    """
+    sinyal = np.asarray(sinyal, dtype=float)
+    status = np.full(len(sinyal), np.nan)
+    status[sinyal == nilai_beli] = 1
+    status[sinyal == nilai_jual] = 0
+    # Forward-fill: setiap hari mewarisi status dari aksi terakhir
+    idx_aksi = np.where(~np.isnan(status), np.arange(len(status)), 0)
+    np.maximum.accumulate(idx_aksi, out=idx_aksi)
+    status = status[idx_aksi]
+    return np.nan_to_num(status, nan=0).astype(np.int8)
+
+def simulasi_posisi(harga, posisi, modal_awal=100_000_000):
+    """
+    Menghitung nilai portfolio harian dari deret harga dan status posisi.
+    Setiap pembelian memakai seluruh kas pada harga penutupan hari itu,
+    setiap penjualan mengembalikan seluruh saham menjadi kas.
+    Mengembalikan (nilai_portfolio, idx_beli, idx_jual, kas_per_transaksi).
+    """
+    harga = np.asarray(harga, dtype=float)
+    posisi = np.asarray(posisi, dtype=np.int8)
+    sebelumnya = np.concatenate(([0], posisi[:-1]))
+
+    idx_beli = np.flatnonzero((posisi == 1) & (sebelumnya == 0))
+    idx_jual = np.flatnonzero((posisi == 0) & (sebelumnya == 1))
+
+    # Kas sebelum transaksi ke-k. Rantai kas dihitung per transaksi (bukan per baris)
+    # dengan urutan operasi yang sama seperti loop lama agar hasilnya identik.
+    kas = np.array(list(accumulate(
+        zip(harga[idx_beli[:len(idx_jual)]], harga[idx_jual]),
+        lambda kas_awal, transaksi: (kas_awal / transaksi[0]) * transaksi[1],
+        initial=float(modal_awal)
+    )))
+    jumlah_saham = kas[:len(idx_beli)] / harga[idx_beli]
+
+    # Nomor transaksi aktif (hari memegang saham) dan jumlah penjualan yang sudah terjadi (hari kas)
+    pegang = posisi == 1
+    transaksi_ke = np.cumsum((posisi == 1) & (sebelumnya == 0)) - 1
+    jual_ke = np.cumsum((posisi == 0) & (sebelumnya == 1))
+
+    nilai_portfolio = kas[jual_ke]
+    nilai_portfolio[pegang] = jumlah_saham[transaksi_ke[pegang]] * harga[pegang]
+    return nilai_portfolio, idx_beli, idx_jual, kas
+
+def daftar_transaksi(index, harga, idx_beli, idx_jual):
+    """Menyusun tabel transaksi (beli/jual) dari indeks hasil simulasi."""
+    harga = np.asarray(harga, dtype=float)
+    harga_jual = np.full(len(idx_beli), np.nan)
+    harga_jual[:len(idx_jual)] = harga[idx_jual]
+    # Transaksi terakhir yang masih terbuka tidak punya tanggal jual (NaT)
+    tanggal_jual = pd.Series(index[idx_jual], dtype=index.dtype).reindex(range(len(idx_beli)))
+    return pd.DataFrame({
+        'tanggal_beli': index[idx_beli],
+        'harga_beli': harga[idx_beli],
+        'tanggal_jual': tanggal_jual.to_numpy(),
+        'harga_jual': harga_jual,
+        'return_pct': (harga_jual / harga[idx_beli] - 1) * 100
+    })
+
+def jalankan_simulasi(df, kolom_sinyal='Sinyal', modal_awal=100_000_000, nilai_beli=1, nilai_jual=0):
+    """
+    Menjalankan simulasi backtest lengkap untuk satu saham secara tervektorisasi.
+    Hasilnya identik dengan loop per baris yang lama (beli semua saat sinyal beli
+    dan ada kas, jual semua saat sinyal jual dan ada saham).
+    """
+    harga = df['Close'].to_numpy(dtype=float)
+    posisi = posisi_dari_sinyal(df[kolom_sinyal].to_numpy(), nilai_beli, nilai_jual)
+    nilai_portfolio, idx_beli, idx_jual, _ = simulasi_posisi(harga, posisi, modal_awal)
+
+    nilai_akhir = nilai_portfolio[-1]
+    total_return_pct = ((nilai_akhir - modal_awal) / modal_awal) * 100
+    buy_and_hold_return_pct = ((harga[-1] - harga[0]) / harga[0]) * 100
+
+    return {
+        "nilai_portfolio": pd.Series(nilai_portfolio, index=df.index, name='Nilai_Portfolio'),
+        "posisi": pd.Series(posisi, index=df.index, name='Posisi'),
+        "transaksi": daftar_transaksi(df.index, harga, idx_beli, idx_jual),
+        "total_return_pct": total_return_pct,
+        "bh_return_pct": buy_and_hold_return_pct,
+        "alpha_pct": total_return_pct - buy_and_hold_return_pct,
+        "nilai_akhir": nilai_akhir
+    }
+
+# --- PRIMITIF BATCH UNTUK SWEEP PARAMETER ---
+def sma_cumsum(harga, windows):
+    """
+    Menghitung SMA untuk banyak panjang window sekaligus dari satu pass cumulative sum.
+    Mengembalikan matriks (len(windows), len(harga)); NaN sebelum window terisi penuh.
+    """
+    harga = np.asarray(harga, dtype=float)
+    windows = np.asarray(windows, dtype=np.int64)
+    jumlah_kumulatif = np.concatenate(([0.0], np.cumsum(harga)))
+    t = np.arange(len(harga))
+    awal = t[None, :] + 1 - windows[:, None]
+    sma = (jumlah_kumulatif[t + 1][None, :] - jumlah_kumulatif[np.clip(awal, 0, None)]) / windows[:, None]
+    sma[awal < 0] = np.nan
+    return sma
+
+def posisi_crossover_batch(sma_cepat, sma_lambat):
+    """
+    Status posisi golden/death cross untuk banyak pasangan sekaligus (baris = pasangan).
+    Sama dengan aturan backtester: beli saat SMA cepat memotong ke atas SMA lambat,
+    jual saat memotong ke bawah; posisi yang sudah 'di atas' sejak hari pertama tidak dibeli.
+    """
+    di_atas = sma_cepat > sma_lambat
+    sudah_pernah_di_bawah = np.logical_or.accumulate(~di_atas, axis=1)
+    return (di_atas & sudah_pernah_di_bawah).astype(np.int8)
+
+def kurva_ekuitas_batch(harga, posisi, modal_awal=100_000_000):
+    """Kurva nilai portfolio untuk banyak varian posisi sekaligus (baris = varian)."""
+    harga = np.asarray(harga, dtype=float)
+    rasio = np.concatenate(([1.0], harga[1:] / harga[:-1]))
+    pegang_kemarin = np.concatenate((np.zeros((posisi.shape[0], 1), dtype=bool), posisi[:, :-1] == 1), axis=1)
+    return modal_awal * np.cumprod(np.where(pegang_kemarin, rasio[None, :], 1.0), axis=1)
+
+def max_drawdown_batch(ekuitas):
+    """Drawdown maksimum (dalam persen, bernilai negatif) untuk setiap baris kurva ekuitas."""
+    puncak = np.maximum.accumulate(ekuitas, axis=1)
+    return ((ekuitas / puncak - 1) * 100).min(axis=1)
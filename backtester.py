@@ -2,6 +2,11 @@ import pandas as pd
 import numpy as np
 from sqlalchemy import create_engine
 import matplotlib.pyplot as plt
+import argparse
+import time
+from itertools import product
+from backtest_engine import jalankan_simulasi, sma_cumsum, posisi_crossover_batch, kurva_ekuitas_batch, max_drawdown_batch
+from instrumentation import span, mulai_run, selesai_run, cetak_ringkasan
 
 def jalankan_backtesting(ticker_to_analyze, modal_awal=100_000_000):
     """
@@ -24,38 +29,22 @@ def jalankan_backtesting(ticker_to_analyze, modal_awal=100_000_000):
     df['Posisi'] = np.where(df['SMA50'] > df['SMA200'], 1, 0)
     df['Sinyal'] = df['Posisi'].diff()
 
-    # --- 2. INISIALISASI PORTOFOLIO & SIMULASI ---
-    kas = modal_awal
-    jumlah_saham = 0
-    nilai_portfolio_harian = []
-    
-    for i in range(len(df)):
-        harga_hari_ini = df['Close'].iloc[i]
-        
-        # Logika Beli
-        if df['Sinyal'].iloc[i] == 1 and kas > 0:
-            jumlah_saham_dibeli = kas / harga_hari_ini
-            jumlah_saham += jumlah_saham_dibeli
-            kas = 0
-            print(f"{df.index[i].date()}: BUY @ {harga_hari_ini:.2f} | Total Saham: {jumlah_saham:.2f}")
+    # --- 2. SIMULASI (TERVEKTORISASI) ---
+    # Sinyal 1 = Golden Cross (beli), -1 = Death Cross (jual)
+    simulasi = jalankan_simulasi(df, kolom_sinyal='Sinyal', modal_awal=modal_awal, nilai_beli=1, nilai_jual=-1)
+    df['Nilai_Portfolio'] = simulasi['nilai_portfolio']
 
-        # Logika Jual
-        elif df['Sinyal'].iloc[i] == -1 and jumlah_saham > 0:
-            kas += jumlah_saham * harga_hari_ini
-            print(f"{df.index[i].date()}: SELL @ {harga_hari_ini:.2f} | Kas Sekarang: Rp {kas:,.0f}")
-            jumlah_saham = 0
-            
-        # Hitung nilai portfolio setiap hari
-        nilai_portfolio_harian.append(kas + (jumlah_saham * harga_hari_ini))
-        
-    df['Nilai_Portfolio'] = nilai_portfolio_harian
+    for _, transaksi in simulasi['transaksi'].iterrows():
+        print(f"{transaksi['tanggal_beli'].date()}: BUY @ {transaksi['harga_beli']:.2f}")
+        if pd.notna(transaksi['tanggal_jual']):
+            print(f"{transaksi['tanggal_jual'].date()}: SELL @ {transaksi['harga_jual']:.2f} | Return: {transaksi['return_pct']:.2f}%")
     
     # --- 3. MENGHITUNG & MENAMPILKAN HASIL AKHIR ---
-    nilai_akhir = df['Nilai_Portfolio'].iloc[-1]
-    total_return_pct = ((nilai_akhir - modal_awal) / modal_awal) * 100
+    nilai_akhir = simulasi['nilai_akhir']
+    total_return_pct = simulasi['total_return_pct']
     
     # Hitung return "Buy and Hold" sebagai pembanding
-    buy_and_hold_return_pct = ((df['Close'].iloc[-1] - df['Close'].iloc[0]) / df['Close'].iloc[0]) * 100
+    buy_and_hold_return_pct = simulasi['bh_return_pct']
     
     print("\n--- HASIL AKHIR BACKTESTING ---")
     print(f"Modal Awal          : Rp {modal_awal:,.0f}")
@@ -76,6 +65,99 @@ def jalankan_backtesting(ticker_to_analyze, modal_awal=100_000_000):
     plt.grid(True)
     plt.show()
 
+# --- MODE SWEEP: BANYAK PASANGAN SMA SEKALIGUS ---
+def jalankan_sweep_sma(ticker, engine, windows_cepat, windows_lambat, modal_awal=100_000_000, chunk_param=2000):
+    """
+    Menguji seluruh grid pasangan (cepat, lambat) Golden Cross untuk satu saham.
+    Setiap SMA dihitung sekali dari satu pass cumulative sum; sinyal crossover dan
+    kurva ekuitas dihitung tervektorisasi di sepanjang sumbu parameter (per blok
+    'chunk_param' pasangan agar memori tetap terbatas).
+    """
+    try:
+        with span('db_load', ticker):
+            df = pd.read_sql(f"SELECT Date, Close FROM '{ticker}'", engine, index_col='Date', parse_dates=['Date'])
+    except Exception:
+        return pd.DataFrame()
+    harga = df['Close'].to_numpy(dtype=float)
+    pasangan = np.array([(f, s) for f, s in product(windows_cepat, windows_lambat) if f < s])
+    if len(harga) < 2 or len(pasangan) == 0:
+        return pd.DataFrame()
+
+    windows_unik = np.unique(pasangan)
+    sma = sma_cumsum(harga, windows_unik)
+    baris_ke = {w: i for i, w in enumerate(windows_unik)}
+    bh_return_pct = ((harga[-1] - harga[0]) / harga[0]) * 100
+
+    hasil = []
+    for awal in range(0, len(pasangan), chunk_param):
+        blok = pasangan[awal:awal + chunk_param]
+        idx_cepat = np.array([baris_ke[f] for f in blok[:, 0]])
+        idx_lambat = np.array([baris_ke[s] for s in blok[:, 1]])
+        with span('simulate', ticker):
+            posisi = posisi_crossover_batch(sma[idx_cepat], sma[idx_lambat])
+            ekuitas = kurva_ekuitas_batch(harga, posisi, modal_awal)
+        jumlah_transaksi = ((posisi[:, 1:] == 1) & (posisi[:, :-1] == 0)).sum(axis=1)
+        hasil.append(pd.DataFrame({
+            'ticker': ticker,
+            'fast': blok[:, 0],
+            'slow': blok[:, 1],
+            'return_pct': (ekuitas[:, -1] / modal_awal - 1) * 100,
+            'max_drawdown_pct': max_drawdown_batch(ekuitas),
+            'jumlah_transaksi': jumlah_transaksi,
+            'bh_return_pct': bh_return_pct
+        }))
+    return pd.concat(hasil, ignore_index=True)
+
+def tabel_heatmap(df_sweep, ticker, kolom='return_pct'):
+    """Mengubah hasil sweep satu saham menjadi tabel siap-heatmap (baris = fast, kolom = slow)."""
+    return df_sweep[df_sweep['ticker'] == ticker].pivot(index='fast', columns='slow', values=kolom)
+
 # --- BAGIAN EKSEKUSI UTAMA ---
 if __name__ == "__main__":
-    jalankan_backtesting('BBCA.JK')
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Backtester Golden Cross (tunggal & sweep parameter).")
+    parser.add_argument("--tickers", nargs='+', help="(Opsional) Daftar ticker. Default: BBCA.JK, atau semua saham dalam mode sweep.")
+    parser.add_argument("--sweep", action='store_true', help="Uji seluruh grid pasangan SMA (fast, slow) untuk setiap ticker.")
+    parser.add_argument("--fast", nargs=3, type=int, default=[5, 100, 5], metavar=('MULAI', 'SAMPAI', 'LANGKAH'), help="Rentang window SMA cepat.")
+    parser.add_argument("--slow", nargs=3, type=int, default=[20, 300, 10], metavar=('MULAI', 'SAMPAI', 'LANGKAH'), help="Rentang window SMA lambat.")
+    args = parser.parse_args()
+
+    if not args.sweep:
+        for ticker in (args.tickers or ['BBCA.JK']):
+            jalankan_backtesting(ticker.upper())
+    else:
+        engine = create_engine("sqlite:///data_saham.db")
+        if args.tickers:
+            tickers_to_process = [ticker.upper() for ticker in args.tickers]
+        else:
+            from trainer import get_available_stocks
+            tickers_to_process = get_available_stocks(engine)
+        windows_cepat = range(args.fast[0], args.fast[1] + 1, args.fast[2])
+        windows_lambat = range(args.slow[0], args.slow[1] + 1, args.slow[2])
+
+        start_time = time.time()
+        mulai_run('backtester_sweep')
+        semua_hasil = []
+        for i, ticker in enumerate(tickers_to_process):
+            print(f"({i+1}/{len(tickers_to_process)}) Sweep SMA: {ticker}", end='\r')
+            df_sweep = jalankan_sweep_sma(ticker, engine, windows_cepat, windows_lambat)
+            if not df_sweep.empty:
+                semua_hasil.append(df_sweep)
+
+        if semua_hasil:
+            df_hasil = pd.concat(semua_hasil, ignore_index=True)
+            output_filename = 'hasil_sweep_sma.csv'
+            df_hasil.to_csv(output_filename, index=False, float_format='%.2f')
+            total_waktu = time.time() - start_time
+            print("\n\n" + "="*54)
+            print("--- SWEEP PARAMETER SMA SELESAI ---")
+            print(f"Total waktu            : {total_waktu:.2f} detik")
+            print(f"Total saham            : {df_hasil['ticker'].nunique()}")
+            print(f"Total varian diuji     : {len(df_hasil)}")
+            print("\n--- 10 VARIAN TERBAIK ---")
+            print(df_hasil.sort_values(by='return_pct', ascending=False).head(10).to_string(index=False))
+            print(f"\nTabel lengkap (siap heatmap) tersimpan di file: '{output_filename}'")
+            cetak_ringkasan(selesai_run(saham=len(tickers_to_process)))
+            print("="*54)
+        else:
+            print("Tidak ada hasil sweep yang bisa diproses.")
+            selesai_run(saham=len(tickers_to_process))
\ No newline at end of file
@@ -0,0 +1,355 @@
+import pandas as pd
+import numpy as np
+from sqlalchemy import create_engine
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from datetime import datetime
+from itertools import product
+
+# --- KONFIGURASI ---
+# Benchmark jalur panas di atas universe sintetis yang deterministik. Setiap ukuran universe
+# dibangun di folder scratch sendiri (data_saham.db, models/) dan proses berpindah (chdir) ke
+# sana, sehingga database & model asli tidak pernah tersentuh. Hasil ditambahkan ke riwayat
+# JSON dan dibandingkan dengan run sebelumnya yang berkonfigurasi sama.
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+RIWAYAT_FILE = os.path.join(REPO_DIR, 'logs', 'benchmark_history.json')
+KAMUS_FILE = os.path.join(REPO_DIR, 'kamus_sentimen.csv')
+UKURAN_DEFAULT = [10, 100, 900]
+TAHUN_DEFAULT = 10
+HARI_PER_TAHUN = 252
+TANGGAL_AKHIR = '2025-12-31'   # Tetap (bukan hari ini) agar data identik di setiap run
+BATAS_REGRESI = 0.20           # Lebih lambat > 20% dari run sebelumnya = regresi
+GRID_BENCHMARK = {             # Potongan kecil grid optimizer.py (waktu per kombinasi yang diukur)
+    'rsi_length': [14, 21],
+    'bbands_length': [20],
+    'n_estimators': [50],
+    'max_depth': [10, 20],
+    'min_samples_leaf': [1]
+}
+
+# --- GENERATOR UNIVERSE SINTETIS ---
+def nama_ticker(i):
+    return f"SYN{i:04d}.JK"
+
+def buat_ohlcv(ticker, n_hari, seed=42):
+    """OHLCV harian ala yfinance (random walk log-normal), deterministik per (seed, ticker)."""
+    rng = np.random.default_rng([seed, zlib.crc32(ticker.encode())])
+    volatilitas = rng.uniform(0.01, 0.035)
+    close = rng.uniform(100, 10_000) * np.exp(np.cumsum(rng.normal(0.0003, volatilitas, n_hari)))
+    open_ = np.concatenate([[close[0]], close[:-1]]) * (1 + rng.normal(0, volatilitas / 3, n_hari))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, volatilitas / 2, n_hari)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, volatilitas / 2, n_hari)))
+    df = pd.DataFrame({
+        'Adj Close': close, 'Close': close, 'High': high, 'Low': low, 'Open': open_,
+        'Volume': rng.lognormal(15, 1, n_hari).astype(np.int64)
+    }, index=pd.bdate_range(end=TANGGAL_AKHIR, periods=n_hari, name='Date'))
+    return df
+
+def ke_mingguan(df_daily):
+    """Bar mingguan (label awal minggu, seperti interval '1wk' yfinance)."""
+    return df_daily.resample('W-MON', label='left', closed='left').agg({
+        'Adj Close': 'last', 'Close': 'last', 'High': 'max', 'Low': 'min', 'Open': 'first', 'Volume': 'sum'
+    }).dropna()
+
+def buat_berita(ticker, df_daily, per_minggu, mesin, kamus, seed=42):
+    """Baris berita sintetis (judul dari kata kamus + pengisi) dengan label sentimen dari mesin sentimen."""
+    from sentiment_engine import buat_judul_sintetis
+    rng = np.random.default_rng([seed, zlib.crc32(ticker.encode()), 1])
+    n = int(len(df_daily) / 5 * per_minggu)
+    tanggal = np.sort(rng.choice(df_daily.index.strftime('%Y-%m-%d'), size=n))
+    judul = [f"{ticker.replace('.JK', '')}: {teks}" for teks in buat_judul_sintetis(n, kamus, seed=zlib.crc32(ticker.encode()))]
+    return [{'date': d, 'ticker': ticker, 'headline': h, 'sentiment': int(s)}
+            for d, h, s in zip(tanggal, judul, mesin.skor_batch(judul))]
+
+def bangun_universe(engine, tickers, tahun, berita_per_minggu, seed=42):
+    """Menulis tabel harian, mingguan, latest_quotes dan berita. Mengembalikan waktu per fase (detik)."""
+    from latest_quotes import hitung_quote, simpan_quotes
+    from news_store import create_news_tables, simpan_berita
+    from sentiment_engine import MesinSentimen, muat_kamus
+    from data_versions import bump_version
+    kamus = muat_kamus(KAMUS_FILE)
+    mesin = MesinSentimen(kamus)
+
+    frames = {ticker: buat_ohlcv(ticker, tahun * HARI_PER_TAHUN, seed) for ticker in tickers}
+    waktu = {}
+    start_time = time.perf_counter()
+    for ticker, df_daily in frames.items():
+        df_daily.to_sql(ticker, engine, if_exists='replace', index=True)
+        ke_mingguan(df_daily).to_sql(f"{ticker}_weekly", engine, if_exists='replace', index=True)
+    simpan_quotes(engine, [hitung_quote(ticker, df) for ticker, df in frames.items()])
+    bump_version(engine, 'prices', tickers)
+    waktu['tulis_harga'] = time.perf_counter() - start_time
+
+    berita = [b for ticker, df in frames.items() for b in buat_berita(ticker, df, berita_per_minggu, mesin, kamus, seed)]
+    start_time = time.perf_counter()
+    create_news_tables(engine)
+    simpan_berita(engine, berita)
+    waktu['tulis_berita'] = time.perf_counter() - start_time
+    return waktu, len(berita)
+
+def buat_model_posisi(ticker, engine):
+    """Model Arah/SL/TP kecil untuk get_recommendation_for_position (persiapan, tidak diukur)."""
+    import joblib
+    from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+    from features import load_features, split_features_target
+    df = load_features(ticker, engine, {})
+    X, y = split_features_target(df)
+    sl = df['Low'][::-1].rolling(5, min_periods=1).min()[::-1].shift(-1).fillna(df['Low'])
+    tp = df['High'][::-1].rolling(5, min_periods=1).max()[::-1].shift(-1).fillna(df['High'])
+    for jenis, model, target in (('arah', RandomForestClassifier, y), ('sl', RandomForestRegressor, sl), ('tp', RandomForestRegressor, tp)):
+        joblib.dump(model(n_estimators=20, max_depth=8, random_state=42, n_jobs=-1).fit(X, target), f'models/{ticker}_{jenis}_model.joblib')
+
+def salin_model(sumber, tickers):
+    """Model sampel dipakai semua ticker lain (hard link bila bisa) agar snapshot memproses seluruh universe."""
+    for ticker in tickers:
+        tujuan = f'models/{ticker}_model.joblib'
+        if os.path.exists(tujuan):
+            continue
+        try:
+            os.link(sumber, tujuan)
+        except OSError:
+            shutil.copyfile(sumber, tujuan)
+
+# --- PENGUKURAN ---
+def ukur(fungsi, ulang=1):
+    """Median waktu (detik) 'fungsi()' dari 'ulang' kali pemanggilan, beserta keluaran pemanggilan terakhir."""
+    durasi = []
+    for _ in range(ulang):
+        start_time = time.perf_counter()
+        keluaran = fungsi()
+        durasi.append(time.perf_counter() - start_time)
+    return float(np.median(durasi)), keluaran
+
+def _gagal(keluaran):
+    """Keluaran yang menandakan target tidak bekerja: None, frame kosong, {'error'}, atau tuple berisi None/False."""
+    if keluaran is None:
+        return True
+    if isinstance(keluaran, pd.DataFrame):
+        return keluaran.empty
+    if isinstance(keluaran, dict):
+        return 'error' in keluaran
+    if isinstance(keluaran, tuple):
+        return any(x is None or x is False for x in keluaran)
+    return False
+
+def periksa_keluaran(keluaran, n):
+    """
+    Pesan galat jika keluaran target tidak mencakup 'n' ticker/kombinasi, None jika valid.
+    List dihitung per elemen yang berhasil, DataFrame per baris, keluaran lain tunggal (semua atau tidak sama sekali).
+    """
+    if isinstance(keluaran, list):
+        jumlah = sum(not _gagal(x) for x in keluaran)
+    elif isinstance(keluaran, pd.DataFrame):
+        jumlah = len(keluaran)
+    else:
+        jumlah = 0 if _gagal(keluaran) else n
+    if jumlah < n:
+        return f"Keluaran tidak valid: hanya {jumlah} dari {n} berhasil"
+    return None
+
+def jalankan_ukuran(n_ticker, folder, tahun, sampel, berita_per_minggu, workers, seed=42):
+    """
+    Seluruh benchmark untuk satu ukuran universe di 'folder'. Mengembalikan dict
+    nama -> {'detik', 'n'} ('n' = jumlah ticker/kombinasi yang diukur) atau {'error'}.
+    """
+    os.makedirs(os.path.join(folder, 'models'), exist_ok=True)
+    os.chdir(folder)
+    import data_cache
+    data_cache.kosongkan_cache() # Kunci cache (ticker, versi) sama di setiap ukuran
+    db_url = "sqlite:///data_saham.db"
+    engine = create_engine(db_url)
+    tickers = [nama_ticker(i) for i in range(n_ticker)]
+    contoh = tickers[:sampel]
+    hasil = {}
+
+    def catat(nama, siapkan, n=1, ulang=1):
+        """
+        'siapkan()' (tidak diukur: impor modul, data persiapan) mengembalikan fungsi yang diukur.
+        Target yang keluarannya gagal/kurang dari 'n' dicatat sebagai error, bukan waktu, agar
+        jalur panas yang rusak tidak terbaca sebagai "perbaikan" di riwayat.
+        """
+        print(f"  {nama:<24}", end='\r')
+        try:
+            detik, keluaran = ukur(siapkan(), ulang)
+            galat = periksa_keluaran(keluaran, n)
+            hasil[nama] = {'error': galat} if galat else {'detik': detik, 'n': n}
+        except Exception as e:
+            hasil[nama] = {'error': f"{type(e).__name__}: {e}"}
+
+    # 1. Penulisan data (ingestion)
+    try:
+        waktu, jumlah_berita = bangun_universe(engine, tickers, tahun, berita_per_minggu, seed)
+        hasil['tulis_harga'] = {'detik': waktu['tulis_harga'], 'n': n_ticker}
+        hasil['tulis_berita'] = {'detik': waktu['tulis_berita'], 'n': jumlah_berita}
+    except Exception as e:
+        hasil['tulis_harga'] = {'error': f"{type(e).__name__}: {e}"}
+        return hasil
+
+    # 2. load_data (cache bersama): dingin = dari SQLite, hangat = dari cache LRU
+    def load_semua():
+        from portfolio_manager import load_data
+        return lambda: [load_data(t) for t in tickers]
+    catat('load_data_dingin', load_semua, n_ticker)
+    catat('load_data_hangat', load_semua, n_ticker)
+
+    # 3. Pipeline fitur, pelatihan, grid optimizer (per ticker sampel)
+    def fitur():
+        from features import load_features
+        return lambda: [load_features(t, engine, {}) for t in contoh]
+    catat('fitur', fitur, len(contoh))
+
+    def train():
+        from trainer import train_model_for_ticker
+        return lambda: [train_model_for_ticker(t, engine, {}) for t in contoh]
+    catat('train_model', train, len(contoh))
+
+    kunci, nilai = zip(*GRID_BENCHMARK.items())
+    kombinasi = [dict(zip(kunci, v)) for v in product(*nilai)]
+    def grid():
+        from optimizer import cari_parameter_terbaik
+        raw_df = pd.read_sql(f"SELECT * FROM '{contoh[0]}'", engine, index_col='Date', parse_dates=['Date'])
+        return lambda: cari_parameter_terbaik(raw_df, kombinasi)
+    catat('optimizer_grid', grid, len(kombinasi))
+
+    # 4. Backtest: dingin = prediksi seluruh riwayat dihitung, hangat = dari penyimpanan prediksi
+    def backtest():
+        from ai_backtester import jalankan_ai_backtesting
+        return lambda: [jalankan_ai_backtesting(t, engine, {}, show_chart=False, n_jobs=1) for t in contoh]
+    catat('backtest_dingin', backtest, len(contoh))
+    catat('backtest_hangat', backtest, len(contoh))
+
+    # 5. Snapshot screener (seluruh universe) & run_screener
+    def snapshot():
+        from screener_snapshot import bangun_snapshot, simpan_snapshot
+        if os.path.exists(f'models/{contoh[0]}_model.joblib'):
+            salin_model(f'models/{contoh[0]}_model.joblib', tickers)
+        def bangun_dan_simpan():
+            df_snapshot = bangun_snapshot(tickers, db_url, {}, workers=workers)
+            if not df_snapshot.empty: # Snapshot kosong tidak menimpa tabel (run_screener ikut gagal terbaca)
+                simpan_snapshot(df_snapshot, engine)
+            return df_snapshot
+        return bangun_dan_simpan
+    catat('snapshot_screener', snapshot, n_ticker)
+
+    def screener():
+        from screener import run_screener
+        return lambda: run_screener(tickers, 'data_saham.db', 1.5, 2.0, 3.0)
+    catat('run_screener', screener, n_ticker, ulang=5)
+
+    # 6. Rekomendasi posisi portofolio (model Arah/SL/TP dibuat dulu, tidak diukur)
+    def rekomendasi():
+        from portfolio_manager import get_recommendation_for_position
+        for t in contoh:
+            buat_model_posisi(t, engine)
+        return lambda: [get_recommendation_for_position({'ticker': t, 'buy_price': 1000}) for t in contoh]
+    catat('rekomendasi_posisi', rekomendasi, len(contoh))
+    return hasil
+
+# --- RIWAYAT & PERBANDINGAN ---
+def muat_riwayat(path=RIWAYAT_FILE):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return []
+
+def simpan_riwayat(run, path=RIWAYAT_FILE):
+    """Menambahkan satu run ke riwayat JSON (ditulis atomik)."""
+    riwayat = muat_riwayat(path) + [run]
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(riwayat, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+def run_pembanding(riwayat, run):
+    """Run terakhir sebelumnya dengan konfigurasi data yang sama (tahun, sampel, berita, seed)."""
+    kunci = ('tahun', 'sampel', 'berita_per_minggu', 'seed')
+    for lama in reversed(riwayat):
+        if all(lama['konfigurasi'].get(k) == run['konfigurasi'].get(k) for k in kunci):
+            return lama
+    return None
+
+def versi_git():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+def cetak_laporan(run, pembanding):
+    """Tabel waktu per ukuran universe, dengan selisih terhadap run pembanding."""
+    print("\n" + "="*54)
+    print(f"--- BENCHMARK JALUR PANAS ({run['konfigurasi']['tahun']} tahun data, commit {run['commit']}) ---")
+    if pembanding:
+        print(f"Dibandingkan dengan run {pembanding['waktu'][:19]} (commit {pembanding['commit']})")
+    regresi = []
+    for ukuran, hasil in run['hasil'].items():
+        print(f"\nUniverse {ukuran} saham:")
+        for nama, h in hasil.items():
+            lama = (pembanding or {}).get('hasil', {}).get(ukuran, {}).get(nama, {})
+            if 'error' in h:
+                baris = f"  {nama:<20} : GAGAL ({h['error'][:60]})"
+                if lama.get('detik'): # Sebelumnya berhasil: jalur panas rusak juga regresi
+                    baris += "  <-- REGRESI"
+                    regresi.append(f"{nama}@{ukuran}")
+                print(baris)
+                continue
+            baris = f"  {nama:<20} : {h['detik']:>9.3f} dtk  ({h['detik'] / max(h['n'], 1) * 1000:>9.2f} ms/item, n={h['n']})"
+            if lama.get('detik'):
+                selisih = h['detik'] / lama['detik'] - 1
+                baris += f"  {selisih:+.0%}"
+                if selisih > BATAS_REGRESI:
+                    baris += "  <-- REGRESI"
+                    regresi.append(f"{nama}@{ukuran}")
+            print(baris)
+    print("="*54)
+    return regresi
+
+# --- BAGIAN EKSEKUSI UTAMA ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark jalur panas di atas universe sintetis (database scratch terpisah).")
+    parser.add_argument("--ukuran", nargs='+', type=int, default=UKURAN_DEFAULT, help="Ukuran universe (jumlah saham) yang diukur.")
+    parser.add_argument("--tahun", type=int, default=TAHUN_DEFAULT, help="Panjang riwayat harga sintetis (tahun).")
+    parser.add_argument("--sampel", type=int, default=3, help="Jumlah saham untuk benchmark per ticker (fitur, train, backtest, rekomendasi).")
+    parser.add_argument("--berita-per-minggu", type=float, default=1.0, help="Rata-rata berita sintetis per saham per minggu.")
+    parser.add_argument("--workers", type=int, default=None, help="Jumlah proses untuk snapshot screener (default: jumlah core CPU).")
+    parser.add_argument("--seed", type=int, default=42, help="Seed generator data sintetis.")
+    parser.add_argument("--folder", help="(Opsional) Folder scratch; default folder sementara yang dihapus setelah selesai.")
+    parser.add_argument("--catatan", default="", help="(Opsional) Label run di riwayat, mis. nama perubahan yang diuji.")
+    parser.add_argument("--tanpa-riwayat", action='store_true', help="Jangan tambahkan hasil ke riwayat JSON.")
+    args = parser.parse_args()
+
+    sys.path.insert(0, REPO_DIR) # Modul repo tetap bisa diimpor setelah chdir ke folder scratch
+    folder = os.path.abspath(args.folder) if args.folder else tempfile.mkdtemp(prefix='benchmark_')
+    asal = os.getcwd()
+    run = {
+        'waktu': datetime.now().isoformat(), 'commit': versi_git(), 'catatan': args.catatan,
+        'python': sys.version.split()[0], 'pandas': pd.__version__, 'cpu': os.cpu_count(),
+        'konfigurasi': {'tahun': args.tahun, 'sampel': args.sampel, 'berita_per_minggu': args.berita_per_minggu, 'seed': args.seed},
+        'hasil': {}
+    }
+    start_time = time.time()
+    try:
+        for ukuran in sorted(args.ukuran):
+            print(f"--- Universe {ukuran} saham x {args.tahun} tahun ---")
+            run['hasil'][str(ukuran)] = jalankan_ukuran(ukuran, os.path.join(folder, f"universe_{ukuran}"), args.tahun,
+                                                        min(args.sampel, ukuran), args.berita_per_minggu, args.workers, args.seed)
+    finally:
+        os.chdir(asal)
+        if not args.folder:
+            shutil.rmtree(folder, ignore_errors=True)
+
+    riwayat = muat_riwayat()
+    regresi = cetak_laporan(run, run_pembanding(riwayat, run))
+    print(f"Total waktu            : {(time.time() - start_time) / 60:.2f} menit")
+    if regresi:
+        print(f"Regresi (> {BATAS_REGRESI:.0%}) : {', '.join(regresi)}")
+    if not args.tanpa_riwayat:
+        simpan_riwayat(run)
+        print(f"Hasil ditambahkan ke '{os.path.relpath(RIWAYAT_FILE, REPO_DIR)}'.")
@@ -0,0 +1,122 @@
+import pandas as pd
+import numpy as np
+import argparse
+import time
+
+# --- KONFIGURASI ---
+MAKS_TITIK = 1500   # Titik per garis yang dikirim ke browser untuk rentang yang sedang dilihat
+MAKS_MARKER = 500   # Marker sinyal AI maksimum per grafik
+
+# --- DOWNSAMPLING LTTB (LARGEST-TRIANGLE-THREE-BUCKETS) ---
+def lttb_indeks(x, y, n_target):
+    """
+    Indeks titik yang dipertahankan oleh algoritma LTTB. Titik pertama dan terakhir
+    selalu dipilih; dari setiap bucket di antaranya dipilih titik yang membentuk segitiga
+    terluas dengan titik terpilih sebelumnya dan rata-rata bucket berikutnya, sehingga
+    puncak & lembah harga tetap terlihat walau jumlah titik jauh berkurang.
+    """
+    n = len(y)
+    if n_target is None or n_target >= n or n_target < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    batas = np.linspace(1, n - 1, n_target - 1).astype(np.int64)
+    terpilih = np.empty(n_target, dtype=np.int64)
+    terpilih[0], terpilih[-1] = 0, n - 1
+
+    a = 0
+    for i in range(n_target - 2):
+        mulai, akhir = batas[i], batas[i + 1]
+        akhir_berikut = batas[i + 2] if i + 2 < len(batas) else n
+        rata_x, rata_y = x[akhir:akhir_berikut].mean(), y[akhir:akhir_berikut].mean()
+        luas = np.abs((x[a] - rata_x) * (y[mulai:akhir] - y[a]) - (x[a] - x[mulai:akhir]) * (rata_y - y[a]))
+        a = mulai + int(np.argmax(luas))
+        terpilih[i + 1] = a
+    return terpilih
+
+def downsample_lttb(df, kolom_acuan='Close', n_target=MAKS_TITIK):
+    """Baris-baris DataFrame yang dipilih LTTB pada 'kolom_acuan' (kolom lain ikut baris yang sama)."""
+    idx = lttb_indeks(df.index.asi8, df[kolom_acuan].to_numpy(), n_target)
+    return df.iloc[idx]
+
+def tipis_merata(df, maks=MAKS_MARKER):
+    """Menipiskan baris secara merata menjadi maksimal 'maks' baris (untuk marker)."""
+    if len(df) <= maks:
+        return df
+    return df.iloc[np.linspace(0, len(df) - 1, maks).astype(np.int64)]
+
+# --- GRAFIK ---
+def bangun_grafik_harga(df, bbu_col=None, bbl_col=None, n_titik=MAKS_TITIK, webgl=True):
+    """
+    Grafik harga + Bollinger Bands + marker sinyal AI. Dengan pengaturan bawaan data
+    di-downsample LTTB dan digambar dengan WebGL (Scattergl). n_titik=None dan
+    webgl=False menghasilkan grafik lama (semua titik, SVG) untuk pembanding.
+    """
+    import plotly.graph_objects as go # Diimpor saat grafik pertama dibangun, bukan saat halaman dimuat
+    Scatter = go.Scattergl if webgl else go.Scatter
+    df_garis = downsample_lttb(df, 'Close', n_titik) if n_titik else df
+    fig = go.Figure()
+    fig.add_trace(Scatter(x=df_garis.index, y=df_garis['Close'], mode='lines', name='Harga Penutupan', line=dict(color='skyblue')))
+
+    if bbu_col in df.columns and bbl_col in df.columns:
+        fig.add_trace(Scatter(x=df_garis.index, y=df_garis[bbu_col], mode='lines', name='Bollinger Atas', line=dict(width=0.5, color='gray')))
+        fig.add_trace(Scatter(x=df_garis.index, y=df_garis[bbl_col], mode='lines', name='Bollinger Bawah', line=dict(width=0.5, color='gray'), fill='tonexty', fillcolor='rgba(128,128,128,0.1)'))
+
+    if 'Prediksi_Sinyal' in df.columns:
+        buy_periods = df[df['Prediksi_Sinyal'] == 1]
+        if n_titik:
+            buy_periods = tipis_merata(buy_periods)
+        fig.add_trace(Scatter(x=buy_periods.index, y=buy_periods['Close'], mode='markers', name='AI: Beli/Tahan', marker=dict(color='lime', size=5, symbol='circle-open')))
+    return fig
+
+def jumlah_titik(fig):
+    """Jumlah titik data di semua trace (murah, tanpa serialisasi)."""
+    return sum(len(trace.x) for trace in fig.data)
+
+def ukuran_payload(fig):
+    """Ukuran JSON grafik yang dikirim ke browser (byte). Menserialisasi seluruh grafik: hanya untuk pengukuran CLI."""
+    return len(fig.to_json().encode('utf-8'))
+
+def ukur_grafik(df, bbu_col=None, bbl_col=None, **kwargs):
+    """Membangun grafik sekaligus mengukur waktu bangun + serialisasi (detik), payload (byte) dan jumlah titik."""
+    start_time = time.perf_counter()
+    fig = bangun_grafik_harga(df, bbu_col, bbl_col, **kwargs)
+    payload = ukuran_payload(fig)
+    durasi = time.perf_counter() - start_time
+    return fig, {'payload_byte': payload, 'waktu_detik': durasi, 'jumlah_titik': jumlah_titik(fig)}
+
+# --- BAGIAN EKSEKUSI UTAMA (PENGUKURAN SEBELUM/SESUDAH) ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mengukur payload & waktu grafik Analisis Detail: SVG penuh vs LTTB + WebGL.")
+    parser.add_argument("--tickers", nargs='+', help="(Opsional) Ticker dari database. Default: data sintetis.")
+    parser.add_argument("--hari", type=int, default=5000, help="Panjang data sintetis (hari bursa).")
+    args = parser.parse_args()
+
+    if args.tickers:
+        from sqlalchemy import create_engine
+        from features import load_price_data
+        engine = create_engine("sqlite:///data_saham.db")
+        daftar = [(t.upper(), load_price_data(t.upper(), engine)) for t in args.tickers]
+    else:
+        rng = np.random.default_rng(42)
+        index = pd.bdate_range('2005-01-03', periods=args.hari)
+        close = 1000 * np.exp(np.cumsum(rng.normal(0, 0.02, args.hari)))
+        daftar = [('SINTETIS', pd.DataFrame({'Close': close}, index=index))]
+
+    for ticker, df in daftar:
+        if df.empty:
+            print(f"[{ticker}] Data tidak ditemukan, dilewati.")
+            continue
+        # Bollinger 20 & sinyal dummy cukup untuk mengukur beban grafik
+        std = df['Close'].rolling(20).std()
+        df = df.assign(BBU=df['Close'].rolling(20).mean() + 2 * std, BBL=df['Close'].rolling(20).mean() - 2 * std,
+                       Prediksi_Sinyal=(df['Close'] > df['Close'].rolling(50).mean()).astype(int)).fillna(0)
+        _, sebelum = ukur_grafik(df, 'BBU', 'BBL', n_titik=None, webgl=False)
+        _, sesudah = ukur_grafik(df, 'BBU', 'BBL')
+        print("="*54)
+        print(f"--- GRAFIK {ticker} ({len(df)} hari) ---")
+        print(f"{'':<22}{'Sebelum (SVG)':>15}{'Sesudah (LTTB+GL)':>19}")
+        print(f"{'Jumlah titik':<22}{sebelum['jumlah_titik']:>15,}{sesudah['jumlah_titik']:>19,}")
+        print(f"{'Payload (KB)':<22}{sebelum['payload_byte'] / 1024:>15,.1f}{sesudah['payload_byte'] / 1024:>19,.1f}")
+        print(f"{'Bangun+serialisasi (ms)':<22}{sebelum['waktu_detik'] * 1000:>15,.1f}{sesudah['waktu_detik'] * 1000:>19,.1f}")
+        print("="*54)
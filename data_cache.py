@@ -0,0 +1,122 @@
+import pandas as pd
+import os
+import threading
+from collections import OrderedDict
+from features import load_price_data
+from data_versions import get_versions
+from instrumentation import span, hitung
+
+# --- KONFIGURASI ---
+# Satu cache per proses, dipakai bersama semua halaman dan semua sesi Streamlit.
+# Anggaran memori bisa diatur lewat variabel lingkungan DATA_CACHE_MB.
+BATAS_MEMORI = int(os.environ.get('DATA_CACHE_MB', 512)) * 1024 * 1024
+
+# Frame di cache tidak pernah disalin saat hit jika pandas memakai Copy-on-Write (selalu aktif
+# di pandas 3, atau diaktifkan sendiri oleh aplikasi di pandas 2): pembaca menerima salinan dangkal
+# dan perubahan olehnya tidak menyentuh frame di cache. Tanpa CoW pembaca menerima salinan penuh.
+# Opsi global pandas sengaja tidak diubah di sini.
+
+_lock = threading.RLock()
+_entri = OrderedDict()   # kunci -> (nilai, ukuran_byte), urutan = LRU (paling lama dipakai di depan)
+_sedang_dimuat = {}      # kunci -> Lock, agar satu kunci hanya dimuat sekali walau diminta banyak sesi
+_statistik = {'hit': 0, 'miss': 0, 'eviction': 0, 'byte': 0}
+
+# --- INTI CACHE LRU ---
+def _ukuran_objek(nilai):
+    """Perkiraan ukuran memori sebuah nilai di cache (byte)."""
+    if isinstance(nilai, (pd.DataFrame, pd.Series)):
+        return int(nilai.memory_usage(index=True).sum())
+    return 0
+
+def _copy_on_write_aktif():
+    if int(pd.__version__.split('.')[0]) >= 3:
+        return True
+    try:
+        return pd.get_option('mode.copy_on_write') is True
+    except KeyError:
+        return False # pandas lama tanpa opsi ini
+
+def _bagikan(nilai):
+    """
+    Nilai yang diserahkan ke pembaca: salinan dangkal untuk frame jika Copy-on-Write aktif
+    (tanpa menyalin data), salinan penuh jika tidak, sehingga pembaca tidak pernah mengubah isi cache.
+    """
+    if isinstance(nilai, (pd.DataFrame, pd.Series)):
+        return nilai.copy(deep=not _copy_on_write_aktif())
+    return nilai
+
+def _simpan(kunci, nilai, ukuran):
+    """Memasukkan entri lalu mengusir entri paling lama dipakai sampai anggaran terpenuhi."""
+    with _lock:
+        if kunci in _entri:
+            _statistik['byte'] -= _entri.pop(kunci)[1]
+        _entri[kunci] = (nilai, ukuran)
+        _statistik['byte'] += ukuran
+        while _statistik['byte'] > BATAS_MEMORI and len(_entri) > 1:
+            _, (_, ukuran_lama) = _entri.popitem(last=False)
+            _statistik['byte'] -= ukuran_lama
+            _statistik['eviction'] += 1
+
+def get_or_load(kunci, loader, ukuran=None):
+    """
+    Mengambil nilai dari cache atau memanggil 'loader()' jika belum ada. 'kunci' harus
+    memuat versi data (lihat data_versions) agar data baru otomatis dimuat ulang.
+    """
+    with _lock:
+        if kunci in _entri:
+            _entri.move_to_end(kunci)
+            _statistik['hit'] += 1
+            hitung('data_cache_hit')
+            return _bagikan(_entri[kunci][0])
+        kunci_lock = _sedang_dimuat.setdefault(kunci, threading.Lock())
+
+    with kunci_lock:
+        with _lock:
+            # Sesi lain mungkin sudah selesai memuat kunci yang sama selama kita menunggu
+            if kunci in _entri:
+                _entri.move_to_end(kunci)
+                _statistik['hit'] += 1
+                return _bagikan(_entri[kunci][0])
+            _statistik['miss'] += 1
+        hitung('data_cache_miss')
+        try:
+            nilai = loader()
+            _simpan(kunci, nilai, _ukuran_objek(nilai) if ukuran is None else ukuran)
+        finally:
+            with _lock:
+                _sedang_dimuat.pop(kunci, None)
+    return _bagikan(nilai)
+
+def statistik_cache():
+    """Penghitung hit/miss/eviction, jumlah entri dan pemakaian memori saat ini."""
+    with _lock:
+        total = _statistik['hit'] + _statistik['miss']
+        return {
+            **_statistik,
+            'entri': len(_entri),
+            'batas_byte': BATAS_MEMORI,
+            'hit_rate_pct': _statistik['hit'] / total * 100 if total else 0.0
+        }
+
+def kosongkan_cache():
+    """Menghapus semua entri (penghitung tetap)."""
+    with _lock:
+        _entri.clear()
+        _statistik['byte'] = 0
+
+# --- LOADER BERSAMA ---
+def load_price(ticker, engine, timeframe='daily'):
+    """Data harga harian/mingguan satu ticker, dikunci versi harga di data_versions."""
+    versi = get_versions(engine, ticker, ('prices',))
+    kunci = ('prices', str(engine.url), ticker, timeframe, versi)
+    return get_or_load(kunci, lambda: load_price_data(ticker, engine, timeframe))
+
+def load_model(model_filename):
+    """Model joblib, dikunci waktu modifikasi & ukuran file (model baru otomatis dimuat ulang)."""
+    import joblib # Impor malas: halaman yang tidak memuat model tidak membayar biaya impornya
+    stat = os.stat(model_filename)
+    kunci = ('model', model_filename, stat.st_mtime_ns, stat.st_size)
+    def muat():
+        with span('model_load'):
+            return joblib.load(model_filename)
+    return get_or_load(kunci, muat, ukuran=stat.st_size)
@@ -0,0 +1,71 @@
+import pandas as pd
+from sqlalchemy import text as sqlalchemy_text
+from datetime import datetime
+
+# --- KONFIGURASI ---
+# Registri versi data: setiap penulis (get_data, news_scraper, trainer, optimizer) menaikkan
+# versi artifact per ticker setelah menulis. Loader yang di-cache Streamlit memasukkan versi
+# ini ke argumennya, sehingga hanya ticker yang berubah yang dimuat ulang.
+TABLE_NAME = "data_versions"
+SEMUA = '*' # Baris global: dinaikkan jika seluruh artifact berubah (mis. tabel dibuat ulang)
+ARTIFACTS = ('prices', 'sentiment', 'model', 'params')
+
+# --- FUNGSI-FUNGSI DATABASE ---
+def create_versions_table(engine):
+    """Membuat tabel registri versi jika belum ada."""
+    with engine.connect() as conn:
+        conn.execute(sqlalchemy_text(f"""
+        CREATE TABLE IF NOT EXISTS {TABLE_NAME} (
+            artifact VARCHAR(20) NOT NULL,
+            ticker VARCHAR(20) NOT NULL,
+            version INTEGER NOT NULL,
+            updated_at TIMESTAMP,
+            PRIMARY KEY (artifact, ticker)
+        );
+        """))
+        conn.commit()
+
+def bump_version(engine, artifact, tickers=None):
+    """
+    Menaikkan versi 'artifact' untuk daftar 'tickers', atau versi global jika None
+    (semua ticker dianggap berubah).
+    """
+    create_versions_table(engine)
+    tickers = [SEMUA] if tickers is None else list(tickers)
+    sekarang = datetime.now().isoformat()
+    with engine.connect() as conn:
+        conn.execute(sqlalchemy_text(f"""
+        INSERT INTO {TABLE_NAME} (artifact, ticker, version, updated_at) VALUES (:artifact, :ticker, 1, :sekarang)
+        ON CONFLICT(artifact, ticker) DO UPDATE SET version = version + 1, updated_at = excluded.updated_at
+        """), [{"artifact": artifact, "ticker": ticker, "sekarang": sekarang} for ticker in tickers])
+        conn.commit()
+
+def get_versions(engine, ticker, artifacts=ARTIFACTS):
+    """
+    Kunci versi untuk cache satu ticker: tuple (versi ticker, versi global) per artifact.
+    Semua nol jika registri belum ada.
+    """
+    try:
+        with engine.connect() as conn:
+            baris = conn.execute(sqlalchemy_text(f"SELECT artifact, ticker, version FROM {TABLE_NAME} WHERE ticker IN (:ticker, :semua)"),
+                                 {"ticker": ticker, "semua": SEMUA}).fetchall()
+    except Exception:
+        baris = []
+    versi = {(artifact, t): version for artifact, t, version in baris}
+    return tuple((versi.get((a, ticker), 0), versi.get((a, SEMUA), 0)) for a in artifacts)
+
+def get_total_version(engine, artifact):
+    """Kunci versi untuk cache lintas ticker (daftar saham, file parameter): berubah jika ada ticker yang berubah."""
+    try:
+        with engine.connect() as conn:
+            return conn.execute(sqlalchemy_text(f"SELECT COALESCE(SUM(version), 0) FROM {TABLE_NAME} WHERE artifact = :artifact"),
+                                {"artifact": artifact}).scalar()
+    except Exception:
+        return 0
+
+def load_versions(engine):
+    """Seluruh isi registri (untuk ditampilkan di Pusat Kontrol)."""
+    try:
+        return pd.read_sql(f"SELECT * FROM {TABLE_NAME} ORDER BY updated_at DESC", engine)
+    except Exception:
+        return pd.DataFrame(columns=['artifact', 'ticker', 'version', 'updated_at'])
@@ -0,0 +1,239 @@
+import pandas as pd
+import numpy as np
+import json
+from sqlalchemy import text as sqlalchemy_text
+from news_store import load_sentiment_harian
+from instrumentation import span
+
+# --- KONFIGURASI FITUR (SINKRON DENGAN TRAINER FINAL) ---
+DEFAULT_PARAMS = {'rsi_length': 14, 'bbands_length': 20}
+PIVOT_LEVELS_RAW = ['PIVOTS_TRAD_D_P','PIVOTS_TRAD_D_S1','PIVOTS_TRAD_D_R1','PIVOTS_TRAD_D_S2','PIVOTS_TRAD_D_R2']
+PIVOT_LEVELS_SIMPLE = ['p','s1','r1','s2','r2']
+FUTURE_PERIOD = 5        # Target: harga 5 hari ke depan...
+PROFIT_THRESHOLD = 0.02  # ...naik lebih dari 2%
+
+# Mode tail-window: jumlah baris riwayat yang cukup agar indikator terpanjang (MACD 26+9,
+# BBands/RSI hasil optimasi) dan pemulusan EMA/Wilder (RSI, ATR, ADX) sudah konvergen.
+# Sisa pengaruh data yang dibuang ~ (1 - 1/30)^400, jauh di bawah toleransi pembulatan.
+LOOKBACK_HARIAN = 400
+LOOKBACK_MINGGUAN = 200
+
+# --- FUNGSI-FUNGSI PEMUAT DATA ---
+def load_price_data(ticker, engine, timeframe='daily'):
+    """Memuat tabel harga harian/mingguan satu ticker. DataFrame kosong jika gagal."""
+    table_name = f"{ticker}_weekly" if timeframe == 'weekly' else ticker
+    try:
+        with span('db_load', ticker):
+            return pd.read_sql(f"SELECT * FROM '{table_name}'", engine, index_col='Date', parse_dates=['Date'])
+    except Exception:
+        return pd.DataFrame()
+
+def load_price_tail(ticker, engine, n_baris, timeframe='daily'):
+    """
+    Memuat hanya 'n_baris' terakhir tabel harga lewat query berbatas tanggal
+    (memanfaatkan indeks Date). DataFrame kosong jika gagal.
+    """
+    table_name = f"{ticker}_weekly" if timeframe == 'weekly' else ticker
+    query = (f"SELECT * FROM '{table_name}' WHERE Date >= "
+             f"(SELECT Date FROM '{table_name}' ORDER BY Date DESC LIMIT 1 OFFSET {int(n_baris) - 1}) ORDER BY Date")
+    try:
+        with span('db_load', ticker):
+            df = pd.read_sql(query, engine, index_col='Date', parse_dates=['Date'])
+        if df.empty:
+            # Tabel lebih pendek dari n_baris: subquery kosong, muat seluruh tabel
+            return load_price_data(ticker, engine, timeframe)
+        return df
+    except Exception:
+        return pd.DataFrame()
+
+def obv_sebelum(ticker, engine, tanggal):
+    """
+    Nilai OBV riwayat penuh pada 'tanggal', dihitung di SQLite (window function) tanpa
+    memuat baris lama ke pandas. Baris pertama tabel bertanda +1 seperti pandas_ta.
+    """
+    query = f"""
+    SELECT SUM(sv) FROM (
+        SELECT Date, CASE
+            WHEN LAG(Close) OVER (ORDER BY Date) IS NULL THEN Volume
+            WHEN Close > LAG(Close) OVER (ORDER BY Date) THEN Volume
+            WHEN Close < LAG(Close) OVER (ORDER BY Date) THEN -Volume
+            ELSE 0 END AS sv
+        FROM '{ticker}'
+    ) WHERE Date <= :tanggal
+    """
+    with span('db_load', ticker), engine.connect() as conn:
+        hasil = conn.execute(sqlalchemy_text(query), {"tanggal": str(tanggal)}).scalar()
+    return float(hasil or 0)
+
+def load_sentiment_daily(ticker, engine, mulai=None):
+    """
+    Jumlah skor sentimen berita per hari (opsional sejak 'mulai') dari tabel ringkasan
+    sentiment_daily. Hanya kolom sentiment_sum (fitur model). DataFrame kosong jika tidak ada berita.
+    """
+    with span('db_load', ticker):
+        return load_sentiment_harian(engine, ticker, mulai, kolom=('sentiment_sum',))
+
+# --- REKAYASA FITUR ---
+def aktifkan_pandas_ta():
+    """
+    Mengimpor pandas_ta saat indikator pertama kali dihitung (impor ini mendaftarkan
+    accessor df.ta). Sengaja tidak di level modul: impornya berat, sedangkan banyak
+    pengguna features.py (halaman Streamlit, data_cache) hanya butuh pemuat data.
+    """
+    import pandas_ta  # noqa: F401
+
+def weekly_features(df_weekly):
+    """Fitur mingguan yang di-merge ke data harian (SMA 20 & RSI 14 mingguan)."""
+    aktifkan_pandas_ta()
+    df_weekly = df_weekly.copy()
+    df_weekly['SMA_20_weekly'] = df_weekly.ta.sma(length=20)
+    df_weekly['RSI_14_weekly'] = df_weekly.ta.rsi(length=14)
+    return df_weekly[['SMA_20_weekly', 'RSI_14_weekly']]
+
+def build_features(df_daily, df_weekly, sentiment_daily, params):
+    """
+    Membangun seluruh fitur model persis seperti trainer.py: fitur mingguan,
+    sentimen harian, indikator teknikal, pola candlestick dan pivot points.
+    """
+    aktifkan_pandas_ta()
+    if df_weekly is not None and not df_weekly.empty:
+        df = pd.merge_asof(df_daily, weekly_features(df_weekly), left_index=True, right_index=True)
+    else:
+        df = df_daily.copy()
+        df[['SMA_20_weekly', 'RSI_14_weekly']] = 0
+
+    if sentiment_daily is not None and not sentiment_daily.empty:
+        df = df.merge(sentiment_daily, left_index=True, right_index=True, how='left')
+
+    df.ta.rsi(length=params.get('rsi_length', 14), append=True)
+    df.ta.macd(fast=12, slow=26, signal=9, append=True)
+    df.ta.bbands(length=params.get('bbands_length', 20), append=True)
+    df.ta.atr(length=14, append=True)
+    df.ta.obv(append=True)
+    df.ta.adx(length=14, append=True)
+    df.ta.cdl_pattern(name="all", append=True)
+    df.ta.pivots(append=True)
+    rename_dict = {old: new for old, new in zip(PIVOT_LEVELS_RAW, PIVOT_LEVELS_SIMPLE)}
+    df.rename(columns=rename_dict, inplace=True)
+    for level in PIVOT_LEVELS_SIMPLE:
+        if level in df.columns: df[f'Jarak_ke_{level.upper()}'] = (df['Close'] - df[level]) / df['Close']
+    for level in ['p', 's1', 'r1']:
+        if level in df.columns: df[f'Posisi_vs_{level.upper()}'] = np.where(df['Close'] > df[level], 1, 0)
+    df.fillna(0, inplace=True)
+    return df
+
+def load_features(ticker, engine, all_optimal_params, min_rows=250):
+    """Memuat data harian, mingguan & sentimen lalu membangun fitur. None jika data kurang."""
+    df_daily = load_price_data(ticker, engine, 'daily')
+    if len(df_daily) < min_rows:
+        return None
+    df_weekly = load_price_data(ticker, engine, 'weekly')
+    sentiment_daily = load_sentiment_daily(ticker, engine)
+    params = all_optimal_params.get(ticker, DEFAULT_PARAMS)
+    with span('feature_build', ticker):
+        return build_features(df_daily, df_weekly, sentiment_daily, params)
+
+def load_features_tail(ticker, engine, all_optimal_params, n_terakhir=1, min_rows=250):
+    """
+    Mode tail-window: fitur untuk 'n_terakhir' baris terakhir saja, dihitung dari
+    LOOKBACK_HARIAN baris ekstra (bukan seluruh riwayat). OBV yang kumulatif sejak
+    baris pertama dikoreksi dengan offset dari SQL. None jika data kurang.
+    """
+    df_daily = load_price_tail(ticker, engine, LOOKBACK_HARIAN + n_terakhir, 'daily')
+    if len(df_daily) < min_rows:
+        return None
+    df_weekly = load_price_tail(ticker, engine, LOOKBACK_MINGGUAN, 'weekly')
+    sentiment_daily = load_sentiment_daily(ticker, engine, mulai=df_daily.index[0])
+    params = all_optimal_params.get(ticker, DEFAULT_PARAMS)
+    with span('feature_build', ticker):
+        df = build_features(df_daily, df_weekly, sentiment_daily, params)
+    if 'OBV' in df.columns:
+        # OBV tail dimulai dari +Volume baris pertama; geser ke nilai OBV riwayat penuh
+        df['OBV'] += obv_sebelum(ticker, engine, df_daily.index[0]) - df_daily['Volume'].iloc[0]
+    return df.iloc[-n_terakhir:]
+
+def feature_matrix(df, model):
+    """Menyusun matriks X sesuai urutan fitur model; fitur yang tidak ada diisi 0."""
+    required_features = model.feature_names_in_
+    missing = [col for col in required_features if col not in df.columns]
+    if missing:
+        df = df.assign(**{col: 0 for col in missing})
+    return df[required_features]
+
+def split_features_target(df):
+    """Menambahkan Target (naik > 2% dalam 5 hari) dan memisahkan X & y seperti trainer.py."""
+    df = df.copy()
+    df['Target'] = np.where(df['Close'].shift(-FUTURE_PERIOD) > df['Close'] * (1 + PROFIT_THRESHOLD), 1, 0)
+    kolom_non_fitur = [col for col in df.columns if col in PIVOT_LEVELS_SIMPLE + ['Target']]
+    return df.drop(columns=kolom_non_fitur), df['Target']
+
+# --- VERIFIKASI MODE TAIL-WINDOW ---
+def bandingkan_tail_vs_penuh(ticker, engine, all_optimal_params, n_terakhir=5):
+    """
+    Selisih maksimum per kolom antara fitur tail-window dan fitur riwayat penuh,
+    relatif terhadap |nilai| + 1 (jadi absolut untuk nilai di sekitar nol).
+    Kolom riwayat penuh yang tidak ada di mode tail bernilai inf.
+    """
+    df_penuh = load_features(ticker, engine, all_optimal_params)
+    df_tail = load_features_tail(ticker, engine, all_optimal_params, n_terakhir=n_terakhir)
+    if df_penuh is None or df_tail is None:
+        return None
+    df_penuh = df_penuh.iloc[-n_terakhir:].astype(float)
+    selisih = (df_tail.reindex(columns=df_penuh.columns).astype(float) - df_penuh).abs() / (df_penuh.abs() + 1)
+    return selisih.max().fillna(np.inf).sort_values(ascending=False)
+
+def uji_sintetis(n_ticker=4, tahun=6, n_terakhir=5):
+    """
+    Verifikasi mandiri tanpa data_saham.db: universe sintetis benchmark.py (harga harian,
+    mingguan & berita) ditulis ke database sementara, lalu setiap ticker dibandingkan.
+    Sebagian ticker memakai parameter non-default agar panjang RSI/BBands ikut teruji.
+    Mengembalikan dict ticker -> selisih per kolom (lihat bandingkan_tail_vs_penuh).
+    """
+    import tempfile
+    from sqlalchemy import create_engine
+    import benchmark # Impor malas: generator data sintetis hanya untuk verifikasi
+    tickers = [benchmark.nama_ticker(i) for i in range(n_ticker)]
+    all_optimal_params = {ticker: {'rsi_length': 21, 'bbands_length': 30} for ticker in tickers[1::2]}
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{tmp}/uji_fitur.db")
+        benchmark.bangun_universe(engine, tickers, tahun, berita_per_minggu=2)
+        hasil = {ticker: bandingkan_tail_vs_penuh(ticker, engine, all_optimal_params, n_terakhir) for ticker in tickers}
+        engine.dispose()
+    return hasil
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    from sqlalchemy import create_engine
+    parser = argparse.ArgumentParser(description="Verifikasi: fitur mode tail-window harus sama dengan fitur riwayat penuh.")
+    parser.add_argument("--tickers", nargs='+', help="(Opsional) Verifikasi ticker di data_saham.db. Tanpa ini: universe sintetis di database sementara.")
+    parser.add_argument("--sintetis", type=int, default=4, help="Jumlah ticker sintetis (mode tanpa --tickers).")
+    parser.add_argument("--tahun", type=int, default=6, help="Panjang riwayat sintetis dalam tahun (harus melebihi jendela tail).")
+    parser.add_argument("--baris", type=int, default=5, help="Jumlah baris terakhir yang dibandingkan.")
+    parser.add_argument("--toleransi", type=float, default=1e-6, help="Selisih relatif maksimum yang diizinkan (setiap kolom fitur).")
+    args = parser.parse_args()
+
+    if args.tickers:
+        engine = create_engine("sqlite:///data_saham.db")
+        try:
+            with open('optimal_params.json', 'r') as f:
+                all_optimal_params = json.load(f)
+        except FileNotFoundError:
+            all_optimal_params = {}
+        hasil = {ticker: bandingkan_tail_vs_penuh(ticker, engine, all_optimal_params, args.baris)
+                 for ticker in [t.upper() for t in args.tickers]}
+    else:
+        hasil = uji_sintetis(args.sintetis, args.tahun, args.baris)
+
+    gagal = 0
+    for ticker, selisih in hasil.items():
+        if selisih is None:
+            print(f"[{ticker}] Data tidak cukup, dilewati.")
+            gagal += not args.tickers # Universe sintetis selalu cukup panjang
+            continue
+        melebihi = selisih[selisih > args.toleransi]
+        gagal += not melebihi.empty
+        print(f"[{ticker}] {'LOLOS' if melebihi.empty else 'GAGAL'} | {len(selisih)} kolom, selisih relatif maks: {selisih.iloc[0]:.2e} ({selisih.index[0]})")
+        for kolom, nilai in melebihi.items():
+            print(f"    {kolom:<28} {nilai:.2e}")
+    sys.exit(1 if gagal else 0)
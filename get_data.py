@@ -1,53 +1,134 @@
-import yfinance as yf
 import pandas as pd
 from sqlalchemy import create_engine
 import time
 import argparse
 import os
+import io
+import numpy as np
 from datetime import datetime, timedelta
 from github_sync import sync_to_github
+from data_versions import bump_version
+from latest_quotes import hitung_quote, simpan_quotes
+from http_cache import HttpCache
+from instrumentation import span, hitung, mulai_run, selesai_run, cetak_ringkasan
 
 # --- KONFIGURASI & SETUP ---
 db_file_path = "sqlite:///data_saham.db"
 engine = create_engine(db_file_path)
 start_date = "2020-01-01"
 
+# --- UNDUHAN DENGAN CACHE ---
+def _ratakan_kolom(data):
+    if isinstance(data.columns, pd.MultiIndex):
+        data.columns = data.columns.get_level_values(0)
+    return data
+
+def _baca_payload(body):
+    """Payload cache (CSV) menjadi DataFrame; None jika tidak bisa diurai (entri rusak/format lain = cache miss)."""
+    try:
+        data = pd.read_csv(io.BytesIO(body), index_col='Date', parse_dates=['Date'], float_precision='round_trip')
+    except Exception:
+        return None
+    if not isinstance(data.index, pd.DatetimeIndex) or 'Close' not in data.columns:
+        return None
+    return data
+
+def unduh(ticker_symbol, interval, end_date, cache=None):
+    """
+    yf.download satu ticker. yfinance tidak membuka header HTTP-nya, jadi payload disimpan
+    utuh (sebagai CSV, bukan pickle: tidak bergantung versi pandas dan tidak menjalankan kode
+    saat dibaca) di HttpCache('yfinance') dan hanya dipakai ulang selama masih dalam jendela
+    kesegaran (tanpa validasi kondisional). Payload kosong tidak disimpan.
+    """
+    import yfinance as yf # Impor malas: hanya dibutuhkan saat benar-benar mengunduh
+    kunci = f"yfinance://download?ticker={ticker_symbol}&interval={interval}&start={start_date}&end={end_date.date()}&format=csv"
+    entri = cache.baca(kunci) if cache else None
+    if entri and entri['segar']:
+        data = _baca_payload(entri['body'])
+        if data is not None:
+            hitung('unduhan_dari_cache')
+            return data
+
+    with span('network_fetch', ticker_symbol):
+        data = yf.download(
+            ticker_symbol, start=start_date, end=end_date,
+            interval=interval, progress=False, timeout=10, auto_adjust=False
+        )
+    data = _ratakan_kolom(data)
+    if cache and not data.empty:
+        data.index.name = 'Date'
+        cache.simpan(kunci, data.to_csv().encode('utf-8'))
+    return data
+
+# --- PERBANDINGAN DENGAN DATA TERSIMPAN ---
+def bandingkan_tersimpan(table_name, data_baru):
+    """
+    Membandingkan unduhan dengan SELURUH tabel tersimpan. Mengembalikan (berubah, sejak):
+    'berubah' False jika tidak ada baris baru maupun revisi; 'sejak' = tanggal pertama baris
+    tersimpan yang nilainya berubah atau hilang (mis. penyesuaian split/dividen pada bar lama),
+    None jika unduhan hanya menambah baris atau tabel belum ada.
+    """
+    try:
+        with span('db_load', table_name):
+            data_lama = pd.read_sql(f'SELECT * FROM "{table_name}"', engine, index_col='Date', parse_dates=['Date'])
+    except Exception:
+        return True, None
+    kolom = [k for k in data_baru.columns if k in data_lama.columns]
+    if data_lama.empty or len(kolom) < len(data_baru.columns):
+        return True, None
+    lama = data_lama[kolom].to_numpy(dtype=float)
+    baru = data_baru[kolom].reindex(data_lama.index).to_numpy(dtype=float)
+    direvisi = ~np.isclose(lama, baru, rtol=1e-9, atol=0, equal_nan=True).all(axis=1)
+    sejak = data_lama.index[direvisi.argmax()] if direvisi.any() else None
+    return sejak is not None or not data_baru.index.isin(data_lama.index).all(), sejak
+
 # --- FUNGSI UTAMA UNTUK UPDATE DATA SATU SAHAM (DIPERBAIKI TOTAL) ---
-def update_stock_data(ticker_symbol):
+def update_stock_data(ticker_symbol, cache=None):
     """
-    Mengunduh dan MENIMPA data Harian & Mingguan untuk satu ticker
-    untuk memastikan data selalu yang terbaru.
+    Mengunduh data Harian & Mingguan untuk satu ticker dan MENIMPA tabel yang isinya berubah.
+    Tabel yang identik dengan unduhan tidak ditulis ulang; versi harga hanya naik jika ada
+    tabel yang berubah, sehingga cache halaman dan tahap hilir pipeline tidak memproses ulang.
     """
     end_date = datetime.now() + timedelta(days=1)
     
     try:
         # --- PROSES DATA HARIAN (DAILY) ---
-        data_daily = yf.download(
-            ticker_symbol, start=start_date, end=end_date,
-            interval="1d", progress=False, timeout=10, auto_adjust=False
-        )
+        data_daily = unduh(ticker_symbol, "1d", end_date, cache)
         
         if data_daily.empty:
             # Jika tidak ada data sama sekali, anggap gagal
             return False 
         
-        # Selalu timpa data yang ada
-        if isinstance(data_daily.columns, pd.MultiIndex):
-            data_daily.columns = data_daily.columns.get_level_values(0)
-        data_daily.to_sql(ticker_symbol, engine, if_exists='replace', index=True)
+        harian_berubah, sejak = bandingkan_tersimpan(ticker_symbol, data_daily)
+        if harian_berubah:
+            with span('db_write', ticker_symbol):
+                data_daily.to_sql(ticker_symbol, engine, if_exists='replace', index=True)
+            # Perbarui kuotasi terakhir dari data yang sudah ada di memori (tanpa membaca ulang tabel)
+            simpan_quotes(engine, [hitung_quote(ticker_symbol, data_daily)])
         
         # --- PROSES DATA MINGGUAN (WEEKLY) ---
-        data_weekly = yf.download(
-            ticker_symbol, start=start_date, end=end_date,
-            interval="1wk", progress=False, timeout=10, auto_adjust=False
-        )
-
+        # Selalu diproses: bar mingguan berjalan bisa berubah walau data harian sudah sama
+        data_weekly = unduh(ticker_symbol, "1wk", end_date, cache)
+        mingguan_berubah = False
         if not data_weekly.empty:
             table_name_weekly = f"{ticker_symbol}_weekly"
-            if isinstance(data_weekly.columns, pd.MultiIndex):
-                data_weekly.columns = data_weekly.columns.get_level_values(0)
-            data_weekly.to_sql(table_name_weekly, engine, if_exists='replace', index=True)
-        
+            mingguan_berubah, sejak_mingguan = bandingkan_tersimpan(table_name_weekly, data_weekly)
+            if mingguan_berubah:
+                with span('db_write', ticker_symbol):
+                    data_weekly.to_sql(table_name_weekly, engine, if_exists='replace', index=True)
+            if sejak_mingguan is not None:
+                sejak = min(sejak, sejak_mingguan) if sejak is not None else sejak_mingguan
+
+        # Prediksi tersimpan sejak baris lampau pertama yang direvisi tidak berlaku lagi
+        if sejak is not None:
+            from prediction_store import hapus_prediksi # Impor malas: menarik features/model hanya jika ada revisi
+            hapus_prediksi(engine, ticker_symbol, sejak)
+
+        if harian_berubah or mingguan_berubah:
+            # Tandai data harga ticker ini berubah agar cache halaman memuat ulang hanya ticker ini
+            bump_version(engine, 'prices', [ticker_symbol])
+        else:
+            hitung('ticker_tidak_berubah')
         return True
 
     except Exception:
@@ -66,6 +147,7 @@ if __name__ == "__main__":
         nargs='+', 
         help="(Opsional) Daftar ticker spesifik yang akan diunduh (contoh: BBCA.JK TLKM.JK)"
     )
+    parser.add_argument("--tanpa-cache", action='store_true', help="Selalu unduh ulang (abaikan cache HTTP di disk).")
     args = parser.parse_args()
 
     tickers_to_process = []
@@ -91,13 +173,16 @@ if __name__ == "__main__":
     gagal_count = 0
     gagal_list = []
     start_time = time.time()
+    mulai_run('get_data')
+    cache = None if args.tanpa_cache else HttpCache('yfinance')
     
     # Loop utama
     for i, ticker in enumerate(tickers_to_process):
         # Tampilkan progres di baris yang sama agar tidak spam terminal
         print(f"Memproses {i+1}/{total_saham}: {ticker}", end='\r')
         
-        sukses = update_stock_data(ticker)
+        unduhan_sebelum = cache.miss if cache else 0
+        sukses = update_stock_data(ticker, cache)
         
         if sukses:
             sukses_count += 1
@@ -105,8 +190,12 @@ if __name__ == "__main__":
             gagal_count += 1
             gagal_list.append(ticker)
         
-        # Jeda singkat untuk menghormati server yfinance
-        time.sleep(0.5)
+        # Jeda singkat untuk menghormati server yfinance (tidak perlu jika semua dari cache)
+        if cache is None or cache.miss > unduhan_sebelum or not sukses:
+            time.sleep(0.5)
+
+    if cache:
+        cache.pangkas()
 
     # LAPORAN AKHIR
     end_time = time.time()
@@ -119,7 +208,10 @@ if __name__ == "__main__":
     print(f"Total saham diproses   : {total_saham}")
     print(f"Berhasil diunduh       : {sukses_count}")
     print(f"Gagal diunduh          : {gagal_count}")
+    if cache:
+        print(f"Cache HTTP             : {cache.ringkasan()}")
     
+    cetak_ringkasan(selesai_run(saham=total_saham, berhasil=sukses_count))
     if gagal_count > 0:
         print("\nDaftar saham yang gagal:")
         print(", ".join(gagal_list))
@@ -132,4 +224,4 @@ if __name__ == "__main__":
     
     # Panggil "kurir" untuk sinkronisasi otomatis
     if sukses_count > 0:
-        sync_to_github(f"Auto-sync: Update {sukses_count} data saham")
\ No newline at end of file
+        sync_to_github(f"Auto-sync: Update {sukses_count} data saham", ['data_saham.db', 'logs/get_data_last_run.log'])
\ No newline at end of file
@@ -1,46 +1,267 @@
 import subprocess
+import sys
 import os
+import json
+import time
+import threading
+import tempfile
+import argparse
 from datetime import datetime
 
-def run_command(command):
-    """Menjalankan perintah terminal dan mengembalikan outputnya."""
-    try:
-        result = subprocess.run(command, check=True, shell=True, capture_output=True, text=True)
-        return result.stdout
-    except subprocess.CalledProcessError as e:
-        print(f"Error saat menjalankan perintah: {' '.join(command)}")
-        print(e.stderr)
+# --- KONFIGURASI ---
+# Setiap tahap (get_data, optimizer, trainer, ai_backtester, news_scraper) hanya MENGAJUKAN
+# artefak yang ia ubah ke antrian. Satu proses "pengirim" di latar belakang menunggu sampai
+# antrian diam selama DEBOUNCE_DETIK, lalu menggabungkan semua pengajuan menjadi satu commit
+# (hanya path yang diajukan, tanpa memindai seluruh tree) dan melakukan push. Tahap komputasi
+# tidak pernah menunggu jaringan.
+SYNC_DIR = os.path.join('logs', 'sync')
+ANTRIAN_FILE = os.path.join(SYNC_DIR, 'antrian.jsonl')
+PROSES_FILE = os.path.join(SYNC_DIR, 'antrian.proses.jsonl')  # Pengajuan yang sedang dikirim (bertahan jika pengirim mati)
+LOCK_FILE = os.path.join(SYNC_DIR, 'pengirim.lock')
+STATUS_FILE = os.path.join(SYNC_DIR, 'status.json')
+LOG_FILE = os.path.join(SYNC_DIR, 'pengirim.log')
+DEBOUNCE_DETIK = float(os.environ.get('SYNC_DEBOUNCE_DETIK', 90))
+BATAS_HEARTBEAT = 30        # Detik tanpa heartbeat sebelum lock pengirim dianggap basi
+REMOTE = "origin"
+BRANCH = "main"
+TIMEOUT_PUSH = 600
+
+# --- PERINTAH GIT ---
+def run_git(args, input_text=None, cwd=None):
+    """Menjalankan 'git <args>' (list argumen, tanpa shell). Mengembalikan CompletedProcess."""
+    return subprocess.run(['git'] + args, input=input_text, capture_output=True, text=True,
+                          cwd=cwd, timeout=TIMEOUT_PUSH)
+
+def commit_artefak(paths, commit_message, cwd=None):
+    """
+    Stage & commit HANYA 'paths' (lewat --pathspec-from-file, aman untuk ribuan file model).
+    Mengembalikan hash commit, atau None jika tidak ada perubahan pada path tersebut.
+    """
+    paths = sorted({path for path in paths if os.path.exists(os.path.join(cwd or '.', path))})
+    if not paths:
         return None
+    daftar = '\n'.join(paths) + '\n'
+    hasil = run_git(['add', '--pathspec-from-file=-'], daftar, cwd)
+    if hasil.returncode != 0:
+        raise RuntimeError(f"git add gagal: {hasil.stderr.strip()}")
+    # Pathspec juga pada commit: hal lain yang kebetulan ter-stage oleh pengguna tidak ikut
+    hasil = run_git(['commit', '-m', commit_message, '--pathspec-from-file=-'], daftar, cwd)
+    if hasil.returncode != 0 and 'nothing to commit' in hasil.stdout + hasil.stderr:
+        return None
+    if hasil.returncode != 0:
+        raise RuntimeError(f"git commit gagal: {hasil.stderr.strip() or hasil.stdout.strip()}")
+    return run_git(['rev-parse', '--short', 'HEAD'], cwd=cwd).stdout.strip()
+
+def push(cwd=None):
+    """Push ke REMOTE/BRANCH. Mengembalikan (berhasil, pesan)."""
+    hasil = run_git(['push', REMOTE, BRANCH], cwd=cwd)
+    return hasil.returncode == 0, (hasil.stderr or hasil.stdout).strip()
+
+# --- ANTRIAN PENGAJUAN ---
+def _baca_jsonl(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return [json.loads(baris) for baris in f if baris.strip()]
+    except FileNotFoundError:
+        return []
 
-def sync_to_github(commit_message):
+def sync_to_github(commit_message, paths):
     """
-    Fungsi utama untuk melakukan sinkronisasi (add, commit, push) ke GitHub.
+    Mengajukan artefak yang diubah sebuah tahap untuk disinkronkan, lalu langsung kembali.
+    Commit & push dikerjakan proses pengirim di latar belakang (digabung dengan pengajuan
+    tahap lain yang masuk dalam jendela debounce).
     """
-    print("\n--- MEMULAI SINKRONISASI OTOMATIS KE GITHUB ---")
-    
-    # 1. Tambahkan semua perubahan
-    print("1. Menambahkan semua perubahan (git add .)...")
-    run_command("git add .")
-    
-    # 2. Buat commit dengan pesan yang dinamis
-    # Tambahkan stempel waktu ke pesan commit agar unik
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    full_commit_message = f'"{commit_message} - {timestamp}"'
-    print(f"2. Membuat commit dengan pesan: {full_commit_message}...")
-    run_command(f"git commit -m {full_commit_message}")
-    
-    # 3. Kirim ke GitHub
-    print("3. Mengirim perubahan ke GitHub (git push)...")
-    push_output = run_command("git push origin main")
-    
-    if push_output is not None:
-        print("--- SINKRONISASI BERHASIL ---")
-        if "Uploading LFS objects" in push_output:
-            print("File besar (LFS) berhasil diunggah.")
+    os.makedirs(SYNC_DIR, exist_ok=True)
+    paths = sorted({os.path.relpath(path).replace(os.sep, '/') for path in paths})
+    entri = {'pesan': commit_message, 'paths': paths, 'waktu': datetime.now().isoformat()}
+    with open(ANTRIAN_FILE, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(entri) + '\n')
+    print(f"\n--- SINKRONISASI GITHUB DIAJUKAN ({len(paths)} artefak, dikirim di latar belakang) ---")
+    if not _lock_aktif():
+        mulai_pengirim()
+
+def mulai_pengirim():
+    """Menjalankan proses pengirim yang lepas dari proses pemanggil (sesi/grup proses sendiri)."""
+    if os.name == 'nt':
+        opsi = {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP | subprocess.DETACHED_PROCESS | subprocess.CREATE_NO_WINDOW}
     else:
-        print("--- SINKRONISASI GAGAL ---")
+        opsi = {'start_new_session': True}
+    with open(LOG_FILE, 'a', encoding='utf-8') as log:
+        subprocess.Popen([sys.executable, os.path.abspath(__file__), '--pengirim'], cwd=os.getcwd(),
+                         stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT, **opsi)
+
+def _ambil_antrian():
+    """Memindahkan antrian ke file proses (atomik) dan mengembalikan seluruh pengajuan yang belum terkirim."""
+    entri = _baca_jsonl(PROSES_FILE) # Sisa pengirim sebelumnya yang mati di tengah jalan
+    if os.path.exists(ANTRIAN_FILE):
+        baru = ANTRIAN_FILE + '.baru'
+        os.replace(ANTRIAN_FILE, baru)
+        entri += _baca_jsonl(baru)
+        with open(PROSES_FILE + '.tmp', 'w', encoding='utf-8') as f:
+            f.writelines(json.dumps(e) + '\n' for e in entri)
+        os.replace(PROSES_FILE + '.tmp', PROSES_FILE)
+        os.remove(baru)
+    return entri
+
+def gabung_pesan(entri):
+    """Satu pesan commit untuk beberapa pengajuan: ringkasan di baris pertama, rinciannya di badan."""
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    pesan = list(dict.fromkeys(e['pesan'] for e in entri))
+    if len(pesan) == 1:
+        return f"{pesan[0]} - {timestamp}"
+    return f"Auto-sync: {len(pesan)} tahap pipeline - {timestamp}\n\n" + '\n'.join(f"- {p}" for p in pesan)
+
+def kirim_antrian(cwd=None):
+    """Commit gabungan + push untuk seluruh pengajuan yang menunggu. Menulis status.json."""
+    entri = _ambil_antrian()
+    if not entri:
+        return None
+    paths = sorted({path for e in entri for path in e['paths']})
+    status = {'waktu': datetime.now().isoformat(), 'pengajuan': len(entri), 'artefak': len(paths),
+              'commit': None, 'push': None, 'error': None}
+    try:
+        status['commit'] = commit_artefak(paths, gabung_pesan(entri), cwd)
+        os.remove(PROSES_FILE) # Sudah tercatat di commit lokal; push yang gagal diulang pada pengiriman berikutnya
+        berhasil, pesan = push(cwd)
+        status['push'] = 'berhasil' if berhasil else 'gagal'
+        if not berhasil:
+            status['error'] = pesan
+    except Exception as e:
+        status['error'] = str(e)
+    with open(STATUS_FILE + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(status, f)
+    os.replace(STATUS_FILE + '.tmp', STATUS_FILE)
+    print(f"[{status['waktu']}] {status['pengajuan']} pengajuan, {status['artefak']} artefak -> "
+          f"commit {status['commit']}, push {status['push']}{' | ' + status['error'] if status['error'] else ''}", flush=True)
+    return status
 
+def baca_status_sync():
+    """Hasil pengiriman terakhir (None jika belum pernah)."""
+    try:
+        with open(STATUS_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+# --- PROSES PENGIRIM (DIJALANKAN SEBAGAI PROSES TERPISAH) ---
+def _lock_aktif():
+    """True jika ada pengirim hidup (heartbeat file lock masih baru)."""
+    try:
+        return time.time() - os.path.getmtime(LOCK_FILE) < BATAS_HEARTBEAT
+    except FileNotFoundError:
+        return False
+
+def _ambil_lock():
+    """Mengambil lock pengirim (file eksklusif); lock basi milik pengirim yang mati diambil alih."""
+    for _ in range(2):
+        try:
+            fd = os.open(LOCK_FILE, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            os.write(fd, str(os.getpid()).encode())
+            os.close(fd)
+            return True
+        except FileExistsError:
+            if _lock_aktif():
+                return False
+            try:
+                os.remove(LOCK_FILE)
+            except FileNotFoundError:
+                pass
+    return False
+
+def jalankan_pengirim(debounce=DEBOUNCE_DETIK):
+    """
+    Menunggu antrian diam selama 'debounce' detik lalu mengirimnya; berulang sampai antrian
+    kosong. Setelah lock dilepas antrian diperiksa sekali lagi, sehingga pengajuan yang
+    masuk tepat saat pengirim berhenti tidak tertinggal.
+    """
+    while _ambil_lock():
+        selesai = threading.Event()
+        def heartbeat():
+            while not selesai.wait(5):
+                os.utime(LOCK_FILE)
+        threading.Thread(target=heartbeat, daemon=True).start()
+        try:
+            while os.path.exists(ANTRIAN_FILE) or os.path.exists(PROSES_FILE):
+                if os.path.exists(ANTRIAN_FILE) and time.time() - os.path.getmtime(ANTRIAN_FILE) < debounce:
+                    time.sleep(1)
+                    continue
+                if kirim_antrian()['error'] and os.path.exists(PROSES_FILE):
+                    break # Commit gagal: pengajuan tetap di file proses untuk pengiriman berikutnya
+        finally:
+            selesai.set()
+            os.remove(LOCK_FILE)
+        if not os.path.exists(ANTRIAN_FILE) or os.path.exists(PROSES_FILE):
+            break
+
+# --- UJI DENGAN REMOTE BARE LOKAL ---
+def uji_repo_lokal():
+    """
+    Verifikasi alur lengkap di folder sementara: repo kerja + repo bare sebagai 'origin'.
+    Dua pengajuan dari dua "tahap" harus menjadi SATU commit yang hanya berisi artefak yang
+    diajukan, dan commit itu harus sampai di remote bare.
+    """
+    asal = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        remote, kerja = os.path.join(tmp, 'remote.git'), os.path.join(tmp, 'kerja')
+        run_git(['init', '--bare', '-b', BRANCH, remote])
+        run_git(['init', '-b', BRANCH, kerja])
+        for kunci, nilai in (('user.name', 'uji'), ('user.email', 'uji@lokal')):
+            run_git(['config', kunci, nilai], cwd=kerja)
+        run_git(['remote', 'add', REMOTE, remote], cwd=kerja)
+        os.chdir(kerja)
+        try:
+            for path in ('data_saham.db', 'optimal_params.json', 'catatan_pribadi.txt', 'models/AAAA.JK_model.joblib'):
+                os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+                with open(path, 'w') as f:
+                    f.write('v1')
+            run_git(['add', 'catatan_pribadi.txt'])
+            run_git(['commit', '-m', 'awal'])
+            run_git(['push', REMOTE, BRANCH])
+            with open('catatan_pribadi.txt', 'w') as f:
+                f.write('v2 (tidak diajukan, tidak boleh ikut)')
+
+            sync_to_github("Auto-sync: Update 1 data saham", ['data_saham.db'])
+            sync_to_github("Auto-sync: Latih ulang 1 model AI", ['models/AAAA.JK_model.joblib', 'data_saham.db'])
+            start_time = time.time()
+            while (os.path.exists(ANTRIAN_FILE) or os.path.exists(LOCK_FILE)) and time.time() - start_time < 60:
+                time.sleep(0.5)
+
+            log_remote = run_git(['log', '--format=%s', BRANCH], cwd=remote).stdout.splitlines()
+            isi_commit = run_git(['show', '--name-only', '--format=', BRANCH], cwd=remote).stdout.split()
+            cek = {
+                'satu commit gabungan di remote': len(log_remote) == 2 and log_remote[0].startswith('Auto-sync: 2 tahap'),
+                'hanya artefak yang diajukan': sorted(isi_commit) == ['data_saham.db', 'models/AAAA.JK_model.joblib'],
+                'file lain tidak ter-stage': 'catatan_pribadi.txt' in run_git(['status', '--porcelain']).stdout,
+                'antrian kosong': not os.path.exists(ANTRIAN_FILE) and not os.path.exists(PROSES_FILE),
+            }
+        finally:
+            os.chdir(asal)
+    return cek
+
+# --- BAGIAN EKSEKUSI UTAMA ---
 if __name__ == "__main__":
-    # Contoh cara penggunaan jika file ini dijalankan langsung
-    print("Ini adalah script utilitas. Jalankan script lain seperti get_data.py untuk menggunakannya.")
-    # sync_to_github("Tes sinkronisasi manual")
+    parser = argparse.ArgumentParser(description="Sinkronisasi artefak ke GitHub: antrian, commit gabungan & push di latar belakang.")
+    parser.add_argument("--pengirim", action='store_true', help="(Internal) Jalankan proses pengirim.")
+    parser.add_argument("--flush", action='store_true', help="Kirim antrian sekarang juga (tanpa menunggu debounce).")
+    parser.add_argument("--status", action='store_true', help="Tampilkan antrian dan hasil pengiriman terakhir.")
+    parser.add_argument("--uji", action='store_true', help="Uji alur lengkap dengan repo bare lokal sebagai remote.")
+    args = parser.parse_args()
+
+    if args.pengirim:
+        jalankan_pengirim()
+    elif args.flush:
+        jalankan_pengirim(debounce=0)
+        print(baca_status_sync())
+    elif args.uji:
+        os.environ['SYNC_DEBOUNCE_DETIK'] = '2' # Diwarisi proses pengirim
+        hasil = uji_repo_lokal()
+        print("="*54)
+        print("--- UJI SINKRONISASI (REMOTE BARE LOKAL) ---")
+        for nama, lulus in hasil.items():
+            print(f"{'LULUS' if lulus else 'GAGAL':<6} {nama}")
+        print("="*54)
+        sys.exit(0 if all(hasil.values()) else 1)
+    else:
+        print(f"Pengajuan menunggu : {len(_baca_jsonl(ANTRIAN_FILE)) + len(_baca_jsonl(PROSES_FILE))}")
+        print(f"Pengirim aktif     : {'ya' if _lock_aktif() else 'tidak'}")
+        print(f"Pengiriman terakhir: {baca_status_sync()}")
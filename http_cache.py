@@ -0,0 +1,189 @@
+import hashlib
+import json
+import os
+import time
+import argparse
+import urllib.parse
+
+# --- KONFIGURASI ---
+# Cache respons HTTP di disk, dipakai bersama news_scraper.py dan get_data.py. Setiap entri
+# disimpan sebagai <hash>.body + <hash>.json (metadata: url, ETag, Last-Modified, waktu simpan)
+# di cache/http/<sumber>/. Entri yang masih segar dipakai tanpa jaringan sama sekali; entri
+# basi dikirim ulang dengan If-None-Match / If-Modified-Since sehingga server cukup menjawab 304.
+CACHE_DIR = os.path.join("cache", "http")
+MAKS_BYTE = 500 * 1024 * 1024   # Batas total ukuran cache; entri paling lama tidak diakses dibuang lebih dulu
+
+# Jendela kesegaran per sumber (detik). Sumber yang tidak terdaftar memakai 'default'.
+SEGAR_DETIK = {
+    'news': 6 * 3600,       # Hasil pencarian berita: cukup segar untuk rerun di hari yang sama
+    'yfinance': 4 * 3600,   # Payload harga: harga penutupan tidak berubah setelah bursa tutup
+    'default': 3600,
+}
+
+# --- FUNGSI BANTU ---
+def normalisasi_url(url):
+    """URL kanonik untuk kunci cache: skema & host huruf kecil, parameter query diurutkan, tanpa fragmen."""
+    bagian = urllib.parse.urlsplit(url)
+    query = urllib.parse.urlencode(sorted(urllib.parse.parse_qsl(bagian.query, keep_blank_values=True)))
+    return urllib.parse.urlunsplit((bagian.scheme.lower(), bagian.netloc.lower(), bagian.path or '/', query, ''))
+
+def _tulis_atomik(path, data):
+    """Menulis file secara atomik (tulis file sementara lalu os.replace)."""
+    with open(path + '.tmp', 'wb') as f:
+        f.write(data)
+    os.replace(path + '.tmp', path)
+
+def _semua_entri(folder=CACHE_DIR):
+    """List (path_body, ukuran, waktu_akses_terakhir) seluruh entri di cache."""
+    entri = []
+    for root, _, files in os.walk(folder):
+        for nama in files:
+            if nama.endswith('.body'):
+                path = os.path.join(root, nama)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entri.append((path, stat.st_size, stat.st_mtime))
+    return entri
+
+def pangkas(folder=CACHE_DIR, maks_byte=MAKS_BYTE):
+    """
+    Membuang entri paling lama tidak diakses (LRU, memakai mtime file body yang diperbarui
+    setiap hit) sampai total ukuran cache <= maks_byte. Mengembalikan jumlah entri dibuang.
+    """
+    entri = sorted(_semua_entri(folder), key=lambda e: e[2])
+    total = sum(ukuran for _, ukuran, _ in entri)
+    dibuang = 0
+    for path, ukuran, _ in entri:
+        if total <= maks_byte:
+            break
+        for p in (path, path[:-len('.body')] + '.json'):
+            try:
+                os.remove(p)
+            except FileNotFoundError:
+                pass
+        total -= ukuran
+        dibuang += 1
+    return dibuang
+
+def statistik(folder=CACHE_DIR):
+    """Jumlah entri dan ukuran (byte) per sumber."""
+    hasil = {}
+    for path, ukuran, _ in _semua_entri(folder):
+        sumber = os.path.basename(os.path.dirname(path))
+        jumlah, total = hasil.get(sumber, (0, 0))
+        hasil[sumber] = (jumlah + 1, total + ukuran)
+    return hasil
+
+# --- CACHE PER SUMBER ---
+class HttpCache:
+    """
+    Cache satu sumber data. Alur pemakaian:
+      entri = cache.baca(url)
+      if entri and entri['segar']: pakai entri['body']
+      else: kirim permintaan dengan cache.header_kondisional(entri);
+            304 -> cache.segarkan(url), pakai entri['body']; 200 -> cache.simpan(url, body, headers)
+    """
+    def __init__(self, sumber, folder=CACHE_DIR, segar_detik=None, maks_byte=MAKS_BYTE):
+        self.sumber = sumber
+        self.folder = os.path.join(folder, sumber)
+        self.root = folder
+        self.segar_detik = segar_detik if segar_detik is not None else SEGAR_DETIK.get(sumber, SEGAR_DETIK['default'])
+        self.maks_byte = maks_byte
+        self.hit = self.revalidasi = self.miss = 0
+        os.makedirs(self.folder, exist_ok=True)
+
+    def _path(self, url):
+        kunci = hashlib.sha1(normalisasi_url(url).encode('utf-8')).hexdigest()
+        return os.path.join(self.folder, kunci)
+
+    def baca(self, url):
+        """
+        Entri cache untuk 'url' sebagai dict (body bytes, etag, last_modified, disimpan, segar),
+        atau None jika belum ada. Hit entri segar dihitung di sini.
+        """
+        path = self._path(url)
+        try:
+            with open(path + '.json', encoding='utf-8') as f:
+                meta = json.load(f)
+            with open(path + '.body', 'rb') as f:
+                body = f.read()
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        meta['body'] = body
+        meta['segar'] = time.time() - meta['disimpan'] < self.segar_detik
+        if meta['segar']:
+            self.hit += 1
+            os.utime(path + '.body') # Tandai baru diakses (urutan LRU)
+        return meta
+
+    def header_kondisional(self, entri):
+        """Header If-None-Match / If-Modified-Since untuk memvalidasi ulang entri basi."""
+        header = {}
+        if entri:
+            if entri.get('etag'):
+                header['If-None-Match'] = entri['etag']
+            if entri.get('last_modified'):
+                header['If-Modified-Since'] = entri['last_modified']
+        return header
+
+    def simpan(self, url, body, headers=None):
+        """Menyimpan respons 200 (body str/bytes) beserta validatornya (dihitung sebagai unduhan baru)."""
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        headers = headers or {}
+        path = self._path(url)
+        _tulis_atomik(path + '.body', body)
+        _tulis_atomik(path + '.json', json.dumps({
+            'url': normalisasi_url(url),
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'disimpan': time.time(),
+        }).encode('utf-8'))
+        self.miss += 1
+
+    def segarkan(self, url):
+        """Server menjawab 304: entri lama masih valid, mulai ulang jendela kesegarannya."""
+        path = self._path(url)
+        try:
+            with open(path + '.json', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        meta['disimpan'] = time.time()
+        _tulis_atomik(path + '.json', json.dumps(meta).encode('utf-8'))
+        os.utime(path + '.body')
+        self.revalidasi += 1
+
+    def pangkas(self):
+        """Pangkas LRU seluruh cache (semua sumber berbagi satu anggaran ukuran)."""
+        return pangkas(self.root, self.maks_byte)
+
+    def ringkasan(self):
+        """Teks ringkas hit/304/unduhan baru untuk laporan akhir."""
+        return f"{self.hit} segar, {self.revalidasi} tervalidasi (304), {self.miss} baru"
+
+# --- BAGIAN EKSEKUSI UTAMA (STATISTIK & PERAWATAN) ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Statistik dan perawatan cache HTTP di disk.")
+    parser.add_argument("--pangkas", action='store_true', help="Buang entri LRU sampai ukuran cache di bawah batas.")
+    parser.add_argument("--maks-mb", type=float, default=MAKS_BYTE / 1024 / 1024, help="Batas ukuran cache (MB) untuk --pangkas.")
+    parser.add_argument("--kosongkan", nargs='*', metavar='SUMBER', help="Hapus seluruh entri (atau hanya sumber tertentu).")
+    args = parser.parse_args()
+
+    if args.kosongkan is not None:
+        for path, _, _ in _semua_entri(CACHE_DIR):
+            if not args.kosongkan or os.path.basename(os.path.dirname(path)) in args.kosongkan:
+                for p in (path, path[:-len('.body')] + '.json'):
+                    if os.path.exists(p):
+                        os.remove(p)
+    dibuang = pangkas(CACHE_DIR, int(args.maks_mb * 1024 * 1024)) if args.pangkas else 0
+
+    print("="*54)
+    print("--- CACHE HTTP ---")
+    for sumber, (jumlah, ukuran) in sorted(statistik(CACHE_DIR).items()):
+        print(f"{sumber:<22} : {jumlah} entri, {ukuran / 1024 / 1024:.1f} MB (segar {SEGAR_DETIK.get(sumber, SEGAR_DETIK['default']) / 3600:.0f} jam)")
+    if args.pangkas:
+        print(f"Entri dibuang (LRU)    : {dibuang}")
+    print("="*54)
@@ -0,0 +1,367 @@
+import json
+import os
+import sys
+import time
+import atexit
+import argparse
+import threading
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+# --- KONFIGURASI ---
+# Instrumentasi ringan jalur panas: span (context manager) per tahap dan penghitung. Setiap run
+# script (mulai_run ... selesai_run) menambahkan SATU baris JSON ke logs/metrics/runs.jsonl berisi
+# waktu per tahap, ticker paling lambat per tahap dan penghitung. Di luar run aktif span tidak
+# mencatat apa pun (biaya hampir nol), jadi modul bersama aman diinstrumentasi.
+#
+# Waktu span adalah waktu "sendiri": durasi span anak dikurangkan dari induknya, sehingga total
+# per tahap tidak dihitung dua kali (mis. feature_build tidak memuat waktu db_load di dalamnya).
+#
+# Di dalam server Streamlit setiap sesi berjalan di thread-nya sendiri: run di sana bersifat
+# thread-lokal (hanya span thread itu), tidak menyentuh os.environ dan tidak ditulis ke RUNS_FILE,
+# melainkan ke ring buffer di memori yang ikut ditampilkan Pusat Kontrol.
+METRICS_DIR = os.path.join("logs", "metrics")
+RUNS_FILE = os.path.join(METRICS_DIR, "runs.jsonl")
+ENV_RUN = "METRICS_RUN"   # "<run_id>|<file bagian>", diwariskan ke proses worker (ProcessPoolExecutor)
+TOP_OUTLIER = 10          # Ticker paling lambat yang disimpan per tahap
+MAKS_UKURAN_RUNS = 5 * 1024**2   # Byte; di atas ini RUNS_FILE dipangkas ke separuh run terbaru
+MAKS_RUN_SERVER = 200     # Run sesi Streamlit yang disimpan di memori
+
+TAHAP = {
+    'db_load': 'Muat DB',
+    'feature_build': 'Bangun fitur',
+    'model_load': 'Muat model',
+    'train': 'Latih model',
+    'model_save': 'Simpan model',
+    'predict': 'Prediksi',
+    'simulate': 'Simulasi',
+    'metrics': 'Metrik kinerja',
+    'network_fetch': 'Ambil jaringan',
+    'parse': 'Urai & skor berita',
+    'db_write': 'Tulis DB',
+    'screen': 'Peringkat screener',
+}
+
+_lock = threading.Lock()
+_lokal = threading.local()   # Tumpukan span per thread: [tahap, ticker, detik_anak]
+_run = None                  # Run aktif milik proses ini (dibuat mulai_run)
+_runs_server = deque(maxlen=MAKS_RUN_SERVER)   # Rekaman run sesi Streamlit (thread-lokal)
+
+def _data_kosong():
+    return {'tahap': {}, 'ticker': {}, 'counter': {}}
+
+_data = _data_kosong()       # tahap -> [detik, n]; "tahap|ticker" -> detik; counter -> n
+
+def _setelah_fork():
+    """Worker hasil fork mewarisi salinan run & data induk: mulai kosong agar tidak dihitung dua kali."""
+    global _run, _data, _lock
+    _run = None
+    _data = _data_kosong()
+    _lock = threading.Lock()
+    _lokal.stack = []
+    _lokal.run = None
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_setelah_fork)
+
+# --- PENCATATAN ---
+def _di_sesi_streamlit():
+    """True jika thread ini menjalankan script sesi Streamlit (bukan script CLI/worker)."""
+    if 'streamlit' not in sys.modules:
+        return False
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        return get_script_run_ctx(suppress_warning=True) is not None
+    except Exception:
+        return False
+
+def _mode_worker():
+    """Proses anak tanpa run sendiri yang mewarisi run induk: hasil dikirim lewat file bagian."""
+    return _run is None and bool(os.environ.get(ENV_RUN))
+
+def _run_lokal():
+    return getattr(_lokal, 'run', None)
+
+def aktif():
+    return _run_lokal() is not None or _run is not None or bool(os.environ.get(ENV_RUN))
+
+def catat(tahap, detik, ticker=None, n=1):
+    """Mencatat durasi secara langsung (untuk kode async/callback yang tidak bisa memakai span)."""
+    if not aktif():
+        return
+    lokal = _run_lokal()
+    with _lock:
+        data = lokal['_data'] if lokal else _data
+        total = data['tahap'].setdefault(tahap, [0.0, 0])
+        total[0] += detik
+        total[1] += n
+        if ticker is not None:
+            kunci = f"{tahap}|{ticker}"
+            data['ticker'][kunci] = data['ticker'].get(kunci, 0.0) + detik
+    if not lokal and _mode_worker() and not getattr(_lokal, 'stack', None):
+        _kirim_bagian()
+
+def hitung(nama, n=1):
+    """Menambah penghitung 'nama' (mis. cache_hit, baris_ditulis) sebanyak n."""
+    if not aktif():
+        return
+    lokal = _run_lokal()
+    with _lock:
+        data = lokal['_data'] if lokal else _data
+        data['counter'][nama] = data['counter'].get(nama, 0) + n
+    if not lokal and _mode_worker() and not getattr(_lokal, 'stack', None):
+        _kirim_bagian()
+
+@contextmanager
+def span(tahap, ticker=None):
+    """
+    Mengukur blok kode sebagai 'tahap'. Ticker diwarisi dari span induk bila tidak diberikan,
+    sehingga db_load di dalam feature_build ikut tercatat per ticker.
+    """
+    if not aktif():
+        yield
+        return
+    stack = getattr(_lokal, 'stack', None)
+    if stack is None:
+        stack = _lokal.stack = []
+    if ticker is None and stack:
+        ticker = stack[-1][1]
+    bingkai = [tahap, ticker, 0.0]
+    stack.append(bingkai)
+    mulai = time.perf_counter()
+    try:
+        yield
+    finally:
+        total = time.perf_counter() - mulai
+        stack.pop()
+        if stack:
+            stack[-1][2] += total
+        catat(tahap, total - bingkai[2], ticker)
+
+def _kirim_bagian():
+    """Worker: tambahkan data yang terkumpul ke file bagian run induk (satu baris JSON per kiriman)."""
+    global _data
+    with _lock:
+        data, _data = _data, _data_kosong()
+    if not any(data.values()):
+        return
+    try:
+        path = os.environ[ENV_RUN].split('|', 1)[1]
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(data) + '\n')
+    except (OSError, IndexError, KeyError):
+        pass # Instrumentasi tidak boleh menggagalkan pekerjaan utama
+
+def _gabung(data, bagian):
+    for tahap, (detik, n) in bagian['tahap'].items():
+        total = data['tahap'].setdefault(tahap, [0.0, 0])
+        total[0] += detik
+        total[1] += n
+    for kunci, detik in bagian['ticker'].items():
+        data['ticker'][kunci] = data['ticker'].get(kunci, 0.0) + detik
+    for nama, n in bagian['counter'].items():
+        data['counter'][nama] = data['counter'].get(nama, 0) + n
+
+# --- SIKLUS RUN ---
+def mulai_run(skrip):
+    """
+    Memulai run untuk 'skrip'. Mengembalikan False (tanpa efek) jika proses ini sudah punya run
+    aktif, mis. run_screener dipanggil dari dalam script lain. Di sesi Streamlit run dibuat
+    thread-lokal (lihat KONFIGURASI).
+    """
+    global _run, _data
+    if _run is not None or _run_lokal() is not None:
+        return False
+    if _di_sesi_streamlit():
+        _lokal.run = {
+            'run_id': f"{datetime.now():%Y%m%d-%H%M%S}-{skrip}-{os.getpid()}-{threading.get_ident()}",
+            'skrip': skrip, 'induk': None, 'mulai': datetime.now().isoformat(timespec='seconds'), 'argv': [],
+            '_perf': time.perf_counter(), '_data': _data_kosong(),
+        }
+        return True
+    induk = os.environ.get(ENV_RUN)
+    run_id = f"{datetime.now():%Y%m%d-%H%M%S}-{skrip}-{os.getpid()}"
+    bagian = os.path.abspath(os.path.join(METRICS_DIR, 'bagian', f"{run_id}.jsonl"))
+    try:
+        os.makedirs(os.path.dirname(bagian), exist_ok=True)
+    except OSError:
+        pass
+    with _lock:
+        _data = _data_kosong()
+    _run = {
+        'run_id': run_id, 'skrip': skrip, 'induk': induk.split('|', 1)[0] if induk else None,
+        'mulai': datetime.now().isoformat(timespec='seconds'), 'argv': sys.argv[1:],
+        '_perf': time.perf_counter(), '_env_induk': induk, '_bagian': bagian,
+    }
+    os.environ[ENV_RUN] = f"{run_id}|{bagian}"
+    return True
+
+def _statistik_tahap(data):
+    """Ringkasan per tahap: total, jumlah span, median/p95/maks per ticker dan ticker paling lambat."""
+    per_ticker = {}
+    for kunci, detik in data['ticker'].items():
+        tahap, ticker = kunci.split('|', 1)
+        per_ticker.setdefault(tahap, []).append((ticker, detik))
+    hasil, outlier = {}, {}
+    for tahap, (detik, n) in sorted(data['tahap'].items(), key=lambda item: -item[1][0]):
+        hasil[tahap] = {'detik': round(detik, 4), 'n': n}
+        baris = sorted(per_ticker.get(tahap, []), key=lambda item: -item[1])
+        if baris:
+            nilai = sorted(d for _, d in baris)
+            hasil[tahap].update(ticker_n=len(nilai), p50=round(nilai[len(nilai) // 2], 4),
+                                p95=round(nilai[int(0.95 * (len(nilai) - 1))], 4), maks=round(nilai[-1], 4))
+            outlier[tahap] = [[ticker, round(d, 4)] for ticker, d in baris[:TOP_OUTLIER]]
+    return hasil, outlier
+
+def selesai_run(status='ok', **info):
+    """
+    Menutup run aktif: menggabungkan kiriman worker, menambahkan satu baris ke RUNS_FILE dan
+    mengembalikan ringkasannya (None jika tidak ada run aktif).
+    """
+    global _run, _data
+    lokal = _run_lokal()
+    if lokal is not None:
+        _lokal.run = None
+        rekaman = _rekaman(lokal, lokal['_data'], status, info)
+        with _lock:
+            _runs_server.append(rekaman)
+        return rekaman
+    if _run is None:
+        return None
+    run, _run = _run, None
+    if run['_env_induk']:
+        os.environ[ENV_RUN] = run['_env_induk']
+    else:
+        os.environ.pop(ENV_RUN, None)
+
+    with _lock:
+        data, _data = _data, _data_kosong()
+    try:
+        with open(run['_bagian'], encoding='utf-8') as f:
+            for baris in f:
+                try:
+                    _gabung(data, json.loads(baris))
+                except (json.JSONDecodeError, KeyError):
+                    continue
+        os.remove(run['_bagian'])
+    except FileNotFoundError:
+        pass
+
+    rekaman = _rekaman(run, data, status, info)
+    try:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        with open(RUNS_FILE, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(rekaman, default=str) + '\n')
+        _pangkas_runs()
+    except OSError:
+        pass
+    return rekaman
+
+def _rekaman(run, data, status, info):
+    """Satu baris rekaman run dari status run dan data yang sudah digabung."""
+    tahap, outlier = _statistik_tahap(data)
+    durasi = time.perf_counter() - run['_perf']
+    rekaman = {k: v for k, v in run.items() if not k.startswith('_')}
+    rekaman.update(selesai=datetime.now().isoformat(timespec='seconds'), durasi=round(durasi, 3), status=status,
+                   info=info, tahap=tahap, outlier=outlier, counter=data['counter'])
+    return rekaman
+
+def _pangkas_runs(path=RUNS_FILE, batas=MAKS_UKURAN_RUNS):
+    """Jika RUNS_FILE melewati 'batas' byte, simpan hanya separuh run terbaru (tulis sementara lalu os.replace)."""
+    if os.path.getsize(path) <= batas:
+        return
+    with open(path, encoding='utf-8') as f:
+        baris = f.readlines()
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        f.writelines(baris[len(baris) // 2:])
+    os.replace(path + '.tmp', path)
+
+@atexit.register
+def _selesai_darurat():
+    """Run yang tidak ditutup (script berhenti karena error/Ctrl+C) tetap dicatat."""
+    if _run is not None:
+        selesai_run('terputus')
+
+@contextmanager
+def run(skrip, **info):
+    """Context manager mulai_run/selesai_run; menjadi no-op jika sudah berada di dalam run lain."""
+    dimulai = mulai_run(skrip)
+    try:
+        yield
+    except BaseException:
+        if dimulai:
+            selesai_run('error', **info)
+        raise
+    if dimulai:
+        selesai_run('ok', **info)
+
+# --- LAPORAN ---
+def cetak_ringkasan(rekaman, maks_tahap=6):
+    """Baris rincian waktu per tahap untuk blok Laporan Akhir script."""
+    if not rekaman or not rekaman['tahap']:
+        return
+    print("Rincian waktu (span)   :")
+    for tahap, s in list(rekaman['tahap'].items())[:maks_tahap]:
+        terlambat = rekaman['outlier'].get(tahap, [[None]])[0][0]
+        ekor = f", terlambat {terlambat}" if terlambat else ""
+        print(f"  {TAHAP.get(tahap, tahap):<20} : {s['detik']:>9.2f} dtk ({s['n']} span{ekor})")
+
+def muat_runs(path=RUNS_FILE, skrip=None, batas=200):
+    """
+    Rekaman run terbaru (opsional hanya untuk 'skrip'), urut dari yang paling lama. Run sesi
+    Streamlit di proses ini (ring buffer memori) ikut digabung.
+    """
+    try:
+        with open(path, encoding='utf-8') as f:
+            baris = f.readlines()
+    except FileNotFoundError:
+        baris = []
+    runs = []
+    for teks in reversed(baris):
+        try:
+            rekaman = json.loads(teks)
+        except json.JSONDecodeError:
+            continue
+        if skrip is None or rekaman.get('skrip') == skrip:
+            runs.append(rekaman)
+            if len(runs) >= batas:
+                break
+    with _lock:
+        runs += [r for r in _runs_server if skrip is None or r['skrip'] == skrip]
+    return sorted(runs, key=lambda r: r['mulai'])[-batas:]
+
+def tabel_tahap(runs):
+    """DataFrame panjang (run_id, skrip, mulai, tahap, detik, n) untuk grafik tren & rincian."""
+    import pandas as pd # Impor malas: modul ini diimpor oleh semua script dan worker
+    baris = [{'run_id': r['run_id'], 'skrip': r['skrip'], 'mulai': pd.Timestamp(r['mulai']), 'durasi': r['durasi'],
+              'tahap': TAHAP.get(tahap, tahap), 'detik': s['detik'], 'n': s['n']}
+             for r in runs for tahap, s in r.get('tahap', {}).items()]
+    return pd.DataFrame(baris, columns=['run_id', 'skrip', 'mulai', 'durasi', 'tahap', 'detik', 'n'])
+
+def tabel_outlier(rekaman):
+    """DataFrame ticker paling lambat per tahap untuk satu run."""
+    import pandas as pd
+    baris = [{'tahap': TAHAP.get(tahap, tahap), 'ticker': ticker, 'detik': detik,
+              'x_median': detik / rekaman['tahap'][tahap]['p50'] if rekaman['tahap'][tahap].get('p50') else None}
+             for tahap, daftar in rekaman.get('outlier', {}).items() for ticker, detik in daftar]
+    return pd.DataFrame(baris, columns=['tahap', 'ticker', 'detik', 'x_median'])
+
+# --- BAGIAN EKSEKUSI UTAMA (RINGKASAN RUN TERAKHIR) ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ringkasan metrik run dari logs/metrics/runs.jsonl.")
+    parser.add_argument("--skrip", help="(Opsional) Hanya run script ini, mis. trainer atau run_screener.")
+    parser.add_argument("--terakhir", type=int, default=5, help="Jumlah run terakhir yang ditampilkan.")
+    args = parser.parse_args()
+
+    runs = muat_runs(skrip=args.skrip, batas=args.terakhir)
+    if not runs:
+        print(f"Belum ada run tercatat di '{RUNS_FILE}'.")
+    for rekaman in runs:
+        print("="*54)
+        print(f"{rekaman['skrip']} | {rekaman['mulai']} | {rekaman['durasi']:.1f} dtk | {rekaman['status']}")
+        cetak_ringkasan(rekaman, maks_tahap=len(TAHAP))
+        if rekaman['counter']:
+            print("Penghitung             : " + ", ".join(f"{k}={v}" for k, v in sorted(rekaman['counter'].items())))
+    if runs:
+        print("="*54)
@@ -0,0 +1,236 @@
+import subprocess
+import sys
+import os
+import json
+import time
+import threading
+import re
+import argparse
+import signal
+from contextlib import contextmanager
+from collections import deque
+from datetime import datetime
+
+# --- KONFIGURASI ---
+# Setiap job berjalan di proses "supervisor" terpisah yang lepas dari Streamlit, jadi
+# halaman tetap responsif dan job tetap jalan walau tab browser ditutup.
+JOBS_DIR = os.path.join('logs', 'jobs')
+MAKS_JOB_PARALEL = 2        # Job berjalan bersamaan maksimum
+MAKS_BARIS_LOG = 2000       # Ring buffer: hanya baris terakhir yang disimpan
+BATAS_HEARTBEAT = 30        # Detik tanpa heartbeat sebelum job dianggap hilang (supervisor mati)
+LOCK_MULAI = os.path.join(JOBS_DIR, 'mulai.lock')
+BATAS_LOCK_MULAI = 10       # Detik sebelum lock mulai_job dianggap basi (pemegangnya mati)
+STATUS_AKTIF = ('menunggu', 'berjalan')
+
+# --- FUNGSI-FUNGSI STATUS & LOG ---
+def _job_dir(job_id):
+    return os.path.join(JOBS_DIR, job_id)
+
+def baca_status(job_id):
+    """Membaca status.json sebuah job (None jika tidak ada / sedang ditulis)."""
+    try:
+        with open(os.path.join(_job_dir(job_id), 'status.json'), 'r', encoding='utf-8') as f:
+            status = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if status['status'] in STATUS_AKTIF and time.time() - status.get('heartbeat', 0) > BATAS_HEARTBEAT:
+        status['status'] = 'hilang'
+    return status
+
+def _tulis_status(job_id, status):
+    """Menulis status.json secara atomik (tulis file sementara lalu os.replace)."""
+    path = os.path.join(_job_dir(job_id), 'status.json')
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(status, f)
+    os.replace(path + '.tmp', path)
+
+def daftar_job(limit=20):
+    """Status job terbaru lebih dulu."""
+    if not os.path.exists(JOBS_DIR):
+        return []
+    semua = (baca_status(job_id) for job_id in sorted(os.listdir(JOBS_DIR), reverse=True)
+             if os.path.isdir(_job_dir(job_id))) # Lewati mulai.lock
+    return [status for status in semua if status][:limit]
+
+def baca_log(job_id, setelah_seq=0):
+    """
+    Baris log dengan nomor urut > 'setelah_seq' sebagai list (seq, teks). Pemanggil cukup
+    mengingat seq terakhir yang sudah ditampilkan untuk mengambil baris baru saja.
+    """
+    try:
+        with open(os.path.join(_job_dir(job_id), 'output.log'), 'r', encoding='utf-8', errors='replace') as f:
+            baris = [line.rstrip('\n').split('\t', 1) for line in f]
+    except FileNotFoundError:
+        return []
+    return [(int(seq), teks) for seq, teks in baris if int(seq) > setelah_seq]
+
+# --- MEMULAI & MEMBATALKAN JOB ---
+@contextmanager
+def _kunci_mulai(timeout=5):
+    """
+    Lock file eksklusif (O_EXCL) di sekitar pemeriksaan "job sudah berjalan?" dan penulisan
+    status 'menunggu', sehingga dua sesi yang menekan tombol bersamaan tidak sama-sama lolos.
+    Lock basi milik proses yang mati diambil alih.
+    """
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    batas = time.time() + timeout
+    while True:
+        try:
+            fd = os.open(LOCK_MULAI, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            os.write(fd, str(os.getpid()).encode())
+            os.close(fd)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(LOCK_MULAI) > BATAS_LOCK_MULAI:
+                    os.remove(LOCK_MULAI)
+                    continue
+            except FileNotFoundError:
+                continue
+            if time.time() > batas:
+                raise TimeoutError("Lock mulai_job sedang dipegang proses lain.")
+            time.sleep(0.05)
+    try:
+        yield
+    finally:
+        os.remove(LOCK_MULAI)
+
+def mulai_job(command):
+    """
+    Memulai 'command' (mis. ['trainer.py', '--tickers', 'BBCA.JK']) sebagai job latar belakang.
+    Mengembalikan (job_id, None) atau (None, pesan_error) jika batas paralel tercapai
+    atau script yang sama masih berjalan.
+    """
+    try:
+        with _kunci_mulai():
+            aktif = [job for job in daftar_job(limit=100) if job['status'] in STATUS_AKTIF]
+            if len(aktif) >= MAKS_JOB_PARALEL:
+                return None, f"Sudah ada {len(aktif)} job berjalan (maksimum {MAKS_JOB_PARALEL}). Tunggu atau batalkan salah satunya."
+            if any(job['command'][0] == command[0] for job in aktif):
+                return None, f"`{command[0]}` masih berjalan. Tunggu sampai selesai atau batalkan dulu."
+
+            # Status 'menunggu' ditulis selagi lock dipegang: pemanggil berikutnya langsung melihatnya aktif
+            job_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{os.path.splitext(command[0])[0]}"
+            os.makedirs(_job_dir(job_id))
+            _tulis_status(job_id, {
+                'id': job_id, 'command': command, 'status': 'menunggu', 'returncode': None,
+                'mulai': datetime.now().isoformat(), 'selesai': None, 'pid': None,
+                'heartbeat': time.time(), 'seq': 0, 'progres': ''
+            })
+    except TimeoutError as e:
+        return None, str(e)
+
+    # Supervisor dilepas dari proses Streamlit (sesi/grup proses sendiri)
+    if os.name == 'nt':
+        opsi = {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP | subprocess.DETACHED_PROCESS | subprocess.CREATE_NO_WINDOW}
+    else:
+        opsi = {'start_new_session': True}
+    subprocess.Popen([sys.executable, os.path.abspath(__file__), '--supervise', job_id],
+                     stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, **opsi)
+    return job_id, None
+
+def batalkan_job(job_id):
+    """Meminta supervisor menghentikan job (lewat file penanda 'cancel')."""
+    open(os.path.join(_job_dir(job_id), 'cancel'), 'w').close()
+
+# --- SUPERVISOR (DIJALANKAN SEBAGAI PROSES TERPISAH) ---
+def _baca_output(stream, ring, status, lock):
+    """
+    Thread pembaca stdout anak. Baris yang diakhiri '\\r' (progres ala print(end='\\r'))
+    hanya menimpa kolom 'progres', tidak menumpuk di log.
+    """
+    sisa = ''
+    for potongan in iter(lambda: stream.read1(4096), b''):
+        sisa += potongan.decode('utf-8', errors='replace')
+        bagian = re.split(r'(\r\n|\r|\n)', sisa)
+        sisa = bagian.pop()
+        with lock:
+            for teks, pemisah in zip(bagian[::2], bagian[1::2]):
+                if pemisah == '\r':
+                    status['progres'] = teks
+                elif teks.strip() or ring:
+                    status['seq'] += 1
+                    ring.append((status['seq'], teks))
+    if sisa:
+        with lock:
+            status['seq'] += 1
+            ring.append((status['seq'], sisa))
+
+def _simpan_log(job_id, ring):
+    """Menulis ring buffer ke output.log (ukuran file selalu terbatas MAKS_BARIS_LOG baris)."""
+    path = os.path.join(_job_dir(job_id), 'output.log')
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        f.writelines(f"{seq}\t{teks}\n" for seq, teks in ring)
+    os.replace(path + '.tmp', path)
+
+def _hentikan_grup(proses, paksa=False):
+    """
+    Menghentikan anak beserta seluruh turunannya (tahap pipeline, worker ProcessPoolExecutor)
+    lewat grup prosesnya. paksa=False mengirim SIGTERM / CTRL_BREAK, paksa=True SIGKILL / taskkill.
+    """
+    try:
+        if os.name == 'nt':
+            if paksa:
+                subprocess.run(['taskkill', '/F', '/T', '/PID', str(proses.pid)],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            else:
+                proses.send_signal(signal.CTRL_BREAK_EVENT)
+        else:
+            os.killpg(proses.pid, signal.SIGKILL if paksa else signal.SIGTERM)
+    except (ProcessLookupError, PermissionError, OSError):
+        pass # Grup sudah habis
+
+def supervise(job_id):
+    """Menjalankan script job, menyimpan log & status berkala, dan menangani pembatalan."""
+    status = baca_status(job_id)
+    ring = deque(maxlen=MAKS_BARIS_LOG)
+    lock = threading.Lock()
+    env = {**os.environ, 'PYTHONUNBUFFERED': '1', 'PYTHONIOENCODING': 'utf-8'}
+    # Anak memimpin grup prosesnya sendiri agar pembatalan menjangkau semua turunannya
+    if os.name == 'nt':
+        opsi = {'creationflags': subprocess.CREATE_NO_WINDOW | subprocess.CREATE_NEW_PROCESS_GROUP}
+    else:
+        opsi = {'start_new_session': True}
+
+    proses = subprocess.Popen([sys.executable] + status['command'], stdout=subprocess.PIPE,
+                              stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL, env=env, **opsi)
+    status.update(status='berjalan', pid=proses.pid)
+    pembaca = threading.Thread(target=_baca_output, args=(proses.stdout, ring, status, lock), daemon=True)
+    pembaca.start()
+
+    dibatalkan = False
+    while proses.poll() is None:
+        if not dibatalkan and os.path.exists(os.path.join(_job_dir(job_id), 'cancel')):
+            dibatalkan = True
+            _hentikan_grup(proses)
+            try:
+                proses.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                pass
+            # Turunan yang mengabaikan SIGTERM (atau anak yang belum keluar) dipaksa berhenti
+            _hentikan_grup(proses, paksa=True)
+        with lock:
+            status['heartbeat'] = time.time()
+            _simpan_log(job_id, ring)
+            _tulis_status(job_id, status)
+        time.sleep(1)
+
+    pembaca.join(timeout=5)
+    with lock:
+        status.update(returncode=proses.returncode, selesai=datetime.now().isoformat(), heartbeat=time.time(),
+                      status='dibatalkan' if dibatalkan else ('selesai' if proses.returncode == 0 else 'gagal'))
+        _simpan_log(job_id, ring)
+        _tulis_status(job_id, status)
+
+# --- BAGIAN EKSEKUSI UTAMA ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Job runner latar belakang untuk Pusat Kontrol.")
+    parser.add_argument("--supervise", metavar="JOB_ID", help="(Internal) Jalankan supervisor untuk job ini.")
+    parser.add_argument("--list", action='store_true', help="Tampilkan daftar job terbaru.")
+    args = parser.parse_args()
+
+    if args.supervise:
+        supervise(args.supervise)
+    else:
+        for job in daftar_job():
+            print(f"{job['id']:<45} {job['status']:<11} {' '.join(job['command'])}")
@@ -0,0 +1,116 @@
+import pandas as pd
+from sqlalchemy import create_engine, inspect, text as sqlalchemy_text
+import argparse
+import time
+from datetime import datetime
+from instrumentation import span
+
+# --- KONFIGURASI ---
+# Tabel kecil berisi kuotasi terakhir setiap saham, diperbarui get_data.py setiap kali
+# data harga ditulis. Pembaca yang hanya butuh harga terakhir (portofolio, ringkasan
+# universe) cukup satu query berindeks, tanpa membaca seluruh tabel harga per ticker.
+TABLE_NAME = "latest_quotes"
+KOLOM_QUOTE = ['ticker', 'last_date', 'close', 'prev_close', 'change', 'change_pct', 'volume', 'updated_at']
+
+# --- FUNGSI-FUNGSI DATABASE ---
+def create_quotes_table(engine):
+    """Membuat tabel latest_quotes jika belum ada (ticker sebagai primary key = indeks)."""
+    with engine.connect() as conn:
+        conn.execute(sqlalchemy_text(f"""
+        CREATE TABLE IF NOT EXISTS {TABLE_NAME} (
+            ticker VARCHAR(20) PRIMARY KEY,
+            last_date TIMESTAMP,
+            close REAL,
+            prev_close REAL,
+            change REAL,
+            change_pct REAL,
+            volume REAL,
+            updated_at TIMESTAMP
+        );
+        """))
+        conn.commit()
+
+def hitung_quote(ticker, df_daily):
+    """Kuotasi terakhir dari DataFrame harian (cukup dua baris terakhir). None jika kosong."""
+    if df_daily is None or df_daily.empty:
+        return None
+    terakhir = df_daily.iloc[-1]
+    prev_close = float(df_daily['Close'].iloc[-2]) if len(df_daily) > 1 else None
+    close = float(terakhir['Close'])
+    change = close - prev_close if prev_close is not None else None
+    return {
+        'ticker': ticker,
+        'last_date': pd.Timestamp(df_daily.index[-1]).isoformat(sep=' '),
+        'close': close,
+        'prev_close': prev_close,
+        'change': change,
+        'change_pct': change / prev_close * 100 if prev_close else None,
+        'volume': float(terakhir['Volume']) if 'Volume' in df_daily.columns else None,
+        'updated_at': datetime.now().isoformat()
+    }
+
+def simpan_quotes(engine, quotes):
+    """Upsert daftar kuotasi (hasil hitung_quote) dalam satu transaksi."""
+    quotes = [quote for quote in quotes if quote]
+    if not quotes:
+        return
+    create_quotes_table(engine)
+    kolom = ", ".join(KOLOM_QUOTE)
+    nilai = ", ".join(f":{k}" for k in KOLOM_QUOTE)
+    pembaruan = ", ".join(f"{k} = excluded.{k}" for k in KOLOM_QUOTE if k != 'ticker')
+    with span('db_write'), engine.begin() as conn:
+        conn.execute(sqlalchemy_text(f"""
+        INSERT INTO {TABLE_NAME} ({kolom}) VALUES ({nilai})
+        ON CONFLICT(ticker) DO UPDATE SET {pembaruan}
+        """), quotes)
+
+def baca_dua_baris_terakhir(ticker, engine):
+    """Dua baris harian terakhir satu ticker langsung dari SQL (untuk backfill)."""
+    df = pd.read_sql(f'SELECT Date, Close, Volume FROM "{ticker}" ORDER BY Date DESC LIMIT 2', engine,
+                     index_col='Date', parse_dates=['Date'])
+    return df.sort_index()
+
+def load_latest_quotes(engine, tickers=None):
+    """
+    Kuotasi terakhir seluruh universe (atau hanya 'tickers') sebagai satu DataFrame kecil
+    berindeks ticker. DataFrame kosong jika tabel belum dibangun.
+    """
+    try:
+        df = pd.read_sql(f"SELECT * FROM {TABLE_NAME}", engine, parse_dates=['last_date'])
+    except Exception:
+        return pd.DataFrame(columns=KOLOM_QUOTE).set_index('ticker')
+    if tickers is not None:
+        df = df[df['ticker'].isin(list(tickers))]
+    return df.set_index('ticker')
+
+def backfill_quotes(engine, tickers=None):
+    """Membangun ulang kuotasi dari tabel harga yang sudah ada. Mengembalikan jumlah ticker yang ditulis."""
+    if tickers is None:
+        tickers = [name for name in inspect(engine).get_table_names()
+                   if '.' in name and not name.endswith(('_weekly', '_sentiment')) and 'news' not in name and 'broker' not in name]
+    quotes = []
+    for i, ticker in enumerate(tickers):
+        print(f"Memproses {i+1}/{len(tickers)}: {ticker:<10}", end='\r')
+        try:
+            quotes.append(hitung_quote(ticker, baca_dua_baris_terakhir(ticker, engine)))
+        except Exception:
+            continue # Tabel harga tidak ada / rusak
+    simpan_quotes(engine, quotes)
+    return sum(quote is not None for quote in quotes)
+
+# --- BAGIAN EKSEKUSI UTAMA (BACKFILL) ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Membangun ulang tabel latest_quotes dari tabel harga yang sudah ada.")
+    parser.add_argument("--tickers", nargs='+', help="(Opsional) Hanya ticker tertentu.")
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite:///data_saham.db")
+    start_time = time.time()
+    jumlah = backfill_quotes(engine, [ticker.upper() for ticker in args.tickers] if args.tickers else None)
+
+    print("\n\n" + "="*54)
+    print("--- BACKFILL LATEST QUOTES SELESAI ---")
+    print(f"Laporan Akhir:")
+    print(f"Total waktu            : {time.time() - start_time:.2f} detik")
+    print(f"Kuotasi ditulis        : {jumlah}")
+    print("="*54)
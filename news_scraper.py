@@ -1,138 +1,330 @@
-import requests
+import asyncio
+import aiohttp
 from bs4 import BeautifulSoup
 import pandas as pd
-from sqlalchemy import create_engine, text as sqlalchemy_text
+from sqlalchemy import create_engine
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
 import time
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 import urllib.parse
-import numpy as np
 from github_sync import sync_to_github # Impor kurir
+from data_versions import bump_version
+from news_store import create_news_tables, simpan_berita
+from sentiment_engine import skor_sentimen
+from http_cache import HttpCache
+from instrumentation import catat, mulai_run, selesai_run, cetak_ringkasan
 
 # --- KONFIGURASI ---
 db_file_path = "sqlite:///data_saham.db"
 engine = create_engine(db_file_path)
 
-# --- KAMUS SENTIMEN MINI ---
-KAMUS_POSITIF = [
-    'laba', 'naik', 'untung', 'akuisisi', 'sukses', 'optimis', 'bullish',
-    'ekspansi', 'pertumbuhan', 'meningkat', 'positif', 'inovasi', 'efisiensi',
-    'prospek cerah', 'rekor', 'tertinggi', 'menguat', 'surplus', 'right issue', 'buyback'
-]
-KAMUS_NEGATIF = [
-    'rugi', 'turun', 'anjlok', 'boncos', 'pesimis', 'bearish', 'lesu',
-    'koreksi', 'penurunan', 'melemah', 'negatif', 'skandal', 'gagal',
-    'krisis', 'utang', 'defisit', 'masalah', 'risiko', 'jatuh', 'gugatan'
-]
+BASE_URL = "https://news.google.com"
+HEADERS = { "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/108.0.0.0 Safari/537.36" }
+MAKS_KONKUREN = 8        # Permintaan HTTP bersamaan maksimum (juga ukuran pool koneksi)
+RATE_PER_HOST = 2.0      # Token bucket per host: permintaan per detik...
+BURST_PER_HOST = 4       # ...dengan lonjakan maksimum sebanyak ini
+MAKS_PERCOBAAN = 4       # Percobaan ulang untuk 429 / 5xx / error jaringan
+BACKOFF_DASAR = 2.0      # Detik; digandakan setiap percobaan dan diberi jitter
+BACKOFF_MAKS = 60.0
+TIMEOUT_DETIK = 15
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'news_scraper')
 
+# --- ANALISIS SENTIMEN ---
 def analisis_sentimen_sederhana(teks):
-    teks = teks.lower()
-    skor = 0
-    for kata in KAMUS_POSITIF:
-        if kata in teks: skor += 1
-    for kata in KAMUS_NEGATIF:
-        if kata in teks: skor -= 1
-    if skor > 0: return 1
-    elif skor < 0: return -1
-    else: return 0
-
-def scrape_and_analyze_news(ticker_symbol):
+    """Label sentimen -1/0/1 satu judul (kamus berbobot di kamus_sentimen.csv, lihat sentiment_engine)."""
+    return int(skor_sentimen([teks])[0])
+
+# --- URL & PARSING ---
+def buat_url(ticker_symbol, base_url=BASE_URL):
+    """URL pencarian Google News untuk berita saham 14 hari terakhir."""
     stock_name = ticker_symbol.replace('.JK', '')
-    
     end_date = datetime.now()
     start_date = end_date - timedelta(days=14)
-    start_date_str = start_date.strftime('%Y-%m-%d')
-    end_date_str = end_date.strftime('%Y-%m-%d')
-    
-    search_query = f"saham {stock_name} after:{start_date_str} before:{end_date_str}"
-    
-    encoded_query = urllib.parse.quote(search_query)
-    url = f"https://news.google.com/search?q={encoded_query}&hl=id&gl=ID&ceid=ID:id"
-    
-    headers = { "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/108.0.0.0 Safari/537.36" }
-    
-    total_berita_ditemukan = 0
-    try:
-        response = requests.get(url, headers=headers, timeout=15)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-        articles = soup.find_all('article')
-        news_list = []
-        
-        for article in articles:
-            title_tag = article.find('a', class_='JtKRv')
-            time_tag = article.find('time', class_='hvbAAd')
-            
-            if title_tag and time_tag and time_tag.has_attr('datetime'):
-                title = title_tag.text
-                article_date = pd.to_datetime(time_tag['datetime']).date()
-                sentiment_score = analisis_sentimen_sederhana(title)
-                
-                news_list.append({
-                    'date': article_date.isoformat(),
-                    'ticker': ticker_symbol, 
-                    'headline': title, 
-                    'sentiment': sentiment_score
-                })
-
-        if not news_list:
-            return 0
-
-        df_news = pd.DataFrame(news_list)
-        df_news.to_sql('news_sentiment', engine, if_exists='append', index=False)
-        total_berita_ditemukan = len(df_news)
-
-    except requests.exceptions.RequestException:
+    search_query = f"saham {stock_name} after:{start_date.strftime('%Y-%m-%d')} before:{end_date.strftime('%Y-%m-%d')}"
+    return f"{base_url.rstrip('/')}/search?q={urllib.parse.quote(search_query)}&hl=id&gl=ID&ceid=ID:id"
+
+def parse_halaman(html, ticker_symbol):
+    """Mengurai halaman hasil pencarian menjadi list berita + skor sentimen (CPU-bound, dijalankan di thread pool)."""
+    soup = BeautifulSoup(html, 'html.parser')
+    news_list = []
+    for article in soup.find_all('article'):
+        title_tag = article.find('a', class_='JtKRv')
+        time_tag = article.find('time', class_='hvbAAd')
+
+        if title_tag and time_tag and time_tag.has_attr('datetime'):
+            news_list.append({
+                'date': pd.to_datetime(time_tag['datetime']).date().isoformat(),
+                'ticker': ticker_symbol,
+                'headline': title_tag.text
+            })
+    # Seluruh judul satu halaman diberi skor sekaligus (satu pemindaian regex)
+    for berita, skor in zip(news_list, skor_sentimen([berita['headline'] for berita in news_list])):
+        berita['sentiment'] = int(skor)
+    return news_list
+
+# --- PEMBATAS LAJU & PENGAMBILAN HALAMAN ---
+class TokenBucket:
+    """Token bucket asyncio: rata-rata 'rate' permintaan/detik dengan lonjakan hingga 'kapasitas'."""
+    def __init__(self, rate, kapasitas):
+        self.rate = rate
+        self.kapasitas = kapasitas
+        self.token = kapasitas
+        self.terakhir = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def ambil(self):
+        async with self.lock:
+            while True:
+                sekarang = time.monotonic()
+                self.token = min(self.kapasitas, self.token + (sekarang - self.terakhir) * self.rate)
+                self.terakhir = sekarang
+                if self.token >= 1:
+                    self.token -= 1
+                    return
+                await asyncio.sleep((1 - self.token) / self.rate)
+
+def jeda_backoff(percobaan, retry_after=None):
+    """Jeda sebelum percobaan ulang: eksponensial dengan jitter penuh, menghormati header Retry-After."""
+    if retry_after and retry_after.isdigit():
+        return min(float(retry_after), BACKOFF_MAKS)
+    return random.uniform(0, min(BACKOFF_MAKS, BACKOFF_DASAR * 2 ** percobaan))
+
+async def ambil_halaman(session, url, bucket, semaphore, cache=None):
+    """
+    Mengambil satu halaman. 429 dan 5xx (serta error jaringan) dicoba ulang dengan backoff
+    ber-jitter; status lain di luar 2xx dianggap gagal permanen. None jika gagal.
+    Dengan 'cache' (HttpCache), halaman yang masih segar tidak diminta ke jaringan sama sekali
+    dan halaman basi divalidasi ulang dengan permintaan kondisional (304 = pakai salinan lama).
+    """
+    entri = cache.baca(url) if cache else None
+    if entri and entri['segar']:
+        return entri['body'].decode('utf-8')
+    header = cache.header_kondisional(entri) if cache else {}
+    for percobaan in range(MAKS_PERCOBAAN):
+        async with semaphore:
+            await bucket.ambil()
+            try:
+                async with session.get(url, headers=header) as response:
+                    if response.status == 304 and entri:
+                        cache.segarkan(url)
+                        return entri['body'].decode('utf-8')
+                    if response.status == 429 or response.status >= 500:
+                        jeda = jeda_backoff(percobaan, response.headers.get('Retry-After'))
+                    elif response.status >= 400:
+                        return None
+                    else:
+                        html = await response.text()
+                        if cache:
+                            cache.simpan(url, html, response.headers)
+                        return html
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                jeda = jeda_backoff(percobaan)
+        if percobaan < MAKS_PERCOBAAN - 1: # Tidak menunggu setelah percobaan terakhir
+            await asyncio.sleep(jeda) # Di luar semaphore: slot dipakai permintaan lain selama menunggu
+    return None
+
+async def scrape_semua(tickers, base_url=BASE_URL, konkuren=MAKS_KONKUREN, rate=RATE_PER_HOST, on_selesai=None, cache=None):
+    """
+    Mengambil & mengurai berita banyak saham secara bersamaan dengan satu pool koneksi
+    (melalui 'cache' HttpCache jika diberikan).
+    Mengembalikan dict ticker -> list berita (list kosong jika gagal / tidak ada berita).
+    'on_selesai(ticker, jumlah_selesai)' dipanggil setiap satu ticker selesai.
+    """
+    semaphore = asyncio.Semaphore(konkuren)
+    buckets = {}
+    loop = asyncio.get_running_loop()
+    hasil = {}
+
+    connector = aiohttp.TCPConnector(limit=konkuren)
+    timeout = aiohttp.ClientTimeout(total=TIMEOUT_DETIK)
+    with ThreadPoolExecutor(max_workers=min(4, os.cpu_count() or 1)) as parser_pool:
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=HEADERS) as session:
+            async def proses(ticker):
+                url = buat_url(ticker, base_url)
+                host = urllib.parse.urlsplit(url).netloc
+                bucket = buckets.setdefault(host, TokenBucket(rate, BURST_PER_HOST))
+                # Coroutine saling menyela, jadi durasi dicatat langsung (bukan span); termasuk antre rate limit
+                mulai = time.perf_counter()
+                html = await ambil_halaman(session, url, bucket, semaphore, cache)
+                catat('network_fetch', time.perf_counter() - mulai, ticker)
+                news_list = []
+                if html:
+                    try:
+                        mulai = time.perf_counter()
+                        news_list = await loop.run_in_executor(parser_pool, parse_halaman, html, ticker)
+                        catat('parse', time.perf_counter() - mulai, ticker)
+                    except Exception as e:
+                        print(f"\n-> [{ticker}] GAGAL mengurai halaman: {e}")
+                return ticker, news_list
+
+            for i, task in enumerate(asyncio.as_completed([proses(ticker) for ticker in tickers])):
+                ticker, news_list = await task
+                hasil[ticker] = news_list
+                if on_selesai:
+                    on_selesai(ticker, i + 1)
+    return hasil
+
+# --- PENYIMPANAN ---
+def simpan_hasil(hasil, engine):
+    """
+    Menyimpan berita secara inkremental (news_store: INSERT OR IGNORE + ringkasan harian)
+    dan menaikkan versi sentimen hanya untuk ticker yang mendapat berita baru.
+    Mengembalikan (jumlah berita ditemukan, jumlah berita baru).
+    """
+    semua_berita = [berita for news_list in hasil.values() for berita in news_list]
+    create_news_tables(engine)
+    baru = simpan_berita(engine, semua_berita)
+    if baru:
+        bump_version(engine, 'sentiment', baru)
+    return len(semua_berita), sum(baru.values())
+
+# --- UJI DENGAN SERVER LOKAL (HALAMAN HASIL TEREKAM) ---
+class _HandlerUji(BaseHTTPRequestHandler):
+    """
+    Pengganti Google News: /search?q=saham <KODE> ... dijawab dari fixtures/news_scraper/<KODE>.html.
+    Kode khusus: TLKM -> 429 sekali dulu, GAGL -> selalu 503, NOTF -> 404. ETag dipakai untuk 304.
+    """
+    permintaan = {}
+    lock = threading.Lock()
+
+    def do_GET(self):
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+        kode = query.get('q', ['saham ?'])[0].split()[1]
+        with self.lock:
+            ke = self.permintaan[kode] = self.permintaan.get(kode, 0) + 1
+        if kode == 'GAGL' or (kode == 'TLKM' and ke == 1):
+            self.send_response(503 if kode == 'GAGL' else 429)
+            self.send_header('Retry-After', '1' if kode == 'GAGL' else '0')
+            self.end_headers()
+            return
+        path = os.path.join(FIXTURE_DIR, f"{kode}.html")
+        if not os.path.exists(path):
+            self.send_error(404)
+            return
+        etag = f'"{kode}-v1"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        with open(path, 'rb') as f:
+            body = f.read()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
         pass
-    except Exception as e:
-        print(f"-> [{ticker_symbol}] GAGAL (error tak terduga): {e}")
-    
-    return total_berita_ditemukan
+
+def uji_server_lokal():
+    """
+    Menjalankan scrape_semua terhadap server HTTP lokal yang menyajikan halaman hasil terekam:
+    penguraian, percobaan ulang 429/5xx, tanpa jeda setelah percobaan terakhir, revalidasi
+    cache (304) dan penyimpanan inkremental ke database sementara.
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _HandlerUji)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    tickers = ['BBCA.JK', 'TLKM.JK', 'KOSONG.JK', 'GAGL.JK', 'NOTF.JK']
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            start_time = time.perf_counter()
+            waktu_selesai = {}
+            cache = HttpCache('news', folder=tmp, segar_detik=0) # Selalu basi: setiap pengambilan ulang bersyarat
+            hasil = asyncio.run(scrape_semua(tickers, base_url, rate=50, cache=cache,
+                                             on_selesai=lambda ticker, _: waktu_selesai.setdefault(ticker, time.perf_counter() - start_time)))
+            hasil_ulang = asyncio.run(scrape_semua(['BBCA.JK'], base_url, rate=50, cache=cache))
+            uji_engine = create_engine(f"sqlite:///{os.path.join(tmp, 'uji.db')}")
+            disimpan = [simpan_hasil(hasil, uji_engine), simpan_hasil(hasil, uji_engine)]
+            uji_engine.dispose()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    permintaan = _HandlerUji.permintaan
+    return {
+        'BBCA: 3 berita terurai (artikel tanpa <time> dilewati)': len(hasil['BBCA.JK']) == 3
+            and all(set(b) == {'date', 'ticker', 'headline', 'sentiment'} for b in hasil['BBCA.JK']),
+        'TLKM: 429 dicoba ulang lalu berhasil': permintaan.get('TLKM') == 2 and len(hasil['TLKM.JK']) == 2,
+        'KOSONG: halaman tanpa artikel -> list kosong': hasil['KOSONG.JK'] == [],
+        f'GAGL: 503 menyerah setelah {MAKS_PERCOBAAN} percobaan': permintaan.get('GAGL') == MAKS_PERCOBAAN and hasil['GAGL.JK'] == [],
+        'GAGL: tanpa jeda setelah percobaan terakhir': waktu_selesai.get('GAGL.JK', 99) < MAKS_PERCOBAAN - 0.5,
+        'NOTF: 404 tidak dicoba ulang': permintaan.get('NOTF') == 1 and hasil['NOTF.JK'] == [],
+        'cache: pengambilan ulang divalidasi dengan 304': cache.revalidasi == 1 and hasil_ulang['BBCA.JK'] == hasil['BBCA.JK'],
+        'simpan: berita baru hanya sekali': disimpan == [(5, 5), (5, 0)],
+    }
 
 # --- BAGIAN EKSEKUSI UTAMA ---
 if __name__ == "__main__":
-    
+    parser = argparse.ArgumentParser(description="Scraper berita & analisis sentimen (asinkron, dengan pembatas laju per host).")
+    parser.add_argument("--tickers", nargs='+', help="(Opsional) Hanya perbarui sentimen ticker tertentu.")
+    parser.add_argument("--base-url", default=BASE_URL, help="(Opsional) Host sumber berita, mis. server lokal untuk pengujian.")
+    parser.add_argument("--konkuren", type=int, default=MAKS_KONKUREN, help="Permintaan HTTP bersamaan maksimum.")
+    parser.add_argument("--rate", type=float, default=RATE_PER_HOST, help="Permintaan per detik per host.")
+    parser.add_argument("--tanpa-cache", action='store_true', help="Selalu ambil ulang dari jaringan (abaikan cache HTTP di disk).")
+    parser.add_argument("--uji", action='store_true', help="Uji mesin scraping dengan server HTTP lokal (fixtures/news_scraper).")
+    args = parser.parse_args()
+
+    if args.uji:
+        hasil = uji_server_lokal()
+        print("="*54)
+        print("--- UJI SCRAPER (SERVER HTTP LOKAL) ---")
+        for nama, lulus in hasil.items():
+            print(f"{'LULUS' if lulus else 'GAGAL':<6} {nama}")
+        print("="*54)
+        sys.exit(0 if all(hasil.values()) else 1)
+
     print("\n--- MULAI PROSES SCRAPING & ANALISIS SENTIMEN ---")
-    
-    try:
-        with engine.connect() as conn:
-            conn.execute(sqlalchemy_text("DROP TABLE IF EXISTS news_sentiment"))
-            conn.commit()
-        print("Tabel sentimen lama berhasil dihapus.")
-    except Exception as e:
-        print(f"Tidak bisa menghapus tabel lama (mungkin belum ada): {e}")
+    if args.tickers:
+        tickers_to_process = [ticker.upper() for ticker in args.tickers]
+        print(f"MODE SPESIFIK: Akan memproses sentimen untuk {len(tickers_to_process)} saham.")
+    else:
+        try:
+            df_all_stocks = pd.read_csv('semua_saham_bei.csv')
+            tickers_to_process = df_all_stocks['ticker'].tolist()
+            print(f"MODE PABRIK: Akan memproses sentimen untuk {len(tickers_to_process)} saham.")
+        except FileNotFoundError:
+            print("File 'semua_saham_bei.csv' tidak ditemukan. Menggunakan watchlist default.")
+            tickers_to_process = ['BBCA.JK', 'TLKM.JK', 'ASII.JK', 'BMRI.JK', 'GOTO.JK']
 
-    try:
-        df_all_stocks = pd.read_csv('semua_saham_bei.csv')
-        tickers_to_process = df_all_stocks['ticker'].tolist()
-        print(f"MODE PABRIK: Akan memproses sentimen untuk {len(tickers_to_process)} saham.")
-    except FileNotFoundError:
-        print("File 'semua_saham_bei.csv' tidak ditemukan. Menggunakan watchlist default.")
-        tickers_to_process = ['BBCA.JK', 'TLKM.JK', 'ASII.JK', 'BMRI.JK', 'GOTO.JK']
-    
     start_time = time.time()
-    total_berita_global = 0
-    
-    for i, ticker in enumerate(tickers_to_process):
-        print(f"Memproses sentimen: ({i+1}/{len(tickers_to_process)}) {ticker}", end='\r')
-        
-        jumlah_berita_ditemukan = scrape_and_analyze_news(ticker)
-        total_berita_global += jumlah_berita_ditemukan
-        
-        time.sleep(np.random.uniform(2, 4))
-        
-    end_time = time.time()
-    total_waktu_menit = (end_time - start_time) / 60
-    
+    mulai_run('news_scraper')
+    cache = None if args.tanpa_cache else HttpCache('news')
+    hasil = asyncio.run(scrape_semua(
+        tickers_to_process, args.base_url, args.konkuren, args.rate,
+        on_selesai=lambda ticker, selesai: print(f"Memproses sentimen: ({selesai}/{len(tickers_to_process)}) {ticker:<10}", end='\r'),
+        cache=cache
+    ))
+    if cache:
+        cache.pangkas()
+    total_berita_global, total_berita_baru = simpan_hasil(hasil, engine)
+    total_waktu_menit = (time.time() - start_time) / 60
+
     print("\n\n" + "="*54)
     print(f"--- SEMUA PROSES SENTIMEN SELESAI ---")
     print(f"Total Waktu              : {total_waktu_menit:.2f} menit")
     print(f"Total Saham Diproses     : {len(tickers_to_process)}")
+    print(f"Saham dengan Berita      : {sum(1 for news_list in hasil.values() if news_list)}")
     print(f"Total Judul Berita Ditemukan: {total_berita_global}")
+    print(f"Berita Baru Tersimpan    : {total_berita_baru} (sisanya sudah ada)")
+    if cache:
+        print(f"Cache HTTP               : {cache.ringkasan()}")
+    cetak_ringkasan(selesai_run(saham=len(tickers_to_process), berita_baru=total_berita_baru))
     print("="*54)
 
+    os.makedirs('logs', exist_ok=True)
     with open('logs/news_scraper_last_run.log', 'w') as f:
         f.write(datetime.now().isoformat())
     print("\nStempel waktu update berhasil dicatat.")
 
-    if total_berita_global > 0:
-        sync_to_github(f"Auto-sync: Update data sentimen untuk {len(tickers_to_process)} saham")
\ No newline at end of file
+    if total_berita_baru > 0:
+        sync_to_github(f"Auto-sync: Update data sentimen untuk {len(tickers_to_process)} saham", ['data_saham.db', 'logs/news_scraper_last_run.log'])
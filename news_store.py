@@ -0,0 +1,151 @@
+import pandas as pd
+from sqlalchemy import create_engine, inspect, bindparam, text as sqlalchemy_text
+import hashlib
+import re
+import argparse
+import time
+from instrumentation import span
+
+# --- KONFIGURASI ---
+# Berita disimpan inkremental: setiap judul diberi hash, dan pasangan (ticker, date, hash)
+# unik sehingga jendela pencarian 14 hari yang tumpang tindih tidak menghasilkan duplikat.
+# Ringkasan harian (sentiment_daily) diperbarui setiap kali berita baru masuk, jadi pembaca
+# (features, halaman Analisis Detail) tidak perlu groupby ulang per ticker.
+NEWS_TABLE = "news_sentiment"
+DAILY_TABLE = "sentiment_daily"
+
+# --- FUNGSI-FUNGSI DATABASE ---
+def hash_headline(headline):
+    """Hash judul berita yang dinormalisasi (huruf kecil, spasi dirapikan)."""
+    normal = re.sub(r'\s+', ' ', str(headline).strip().lower())
+    return hashlib.sha1(normal.encode('utf-8')).hexdigest()[:16]
+
+def create_news_tables(engine):
+    """
+    Membuat tabel berita (dengan constraint unik & indeks ticker+date) dan tabel ringkasan
+    harian. Tabel news_sentiment lama (tanpa kolom headline_hash) dimigrasi sekali.
+    """
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        perlu_migrasi = inspector.has_table(NEWS_TABLE) and 'headline_hash' not in {c['name'] for c in inspector.get_columns(NEWS_TABLE)}
+        if perlu_migrasi:
+            conn.execute(sqlalchemy_text(f"ALTER TABLE {NEWS_TABLE} RENAME TO {NEWS_TABLE}_lama"))
+        conn.execute(sqlalchemy_text(f"""
+        CREATE TABLE IF NOT EXISTS {NEWS_TABLE} (
+            date TEXT NOT NULL,
+            ticker VARCHAR(20) NOT NULL,
+            headline TEXT NOT NULL,
+            sentiment INTEGER NOT NULL,
+            headline_hash VARCHAR(16) NOT NULL,
+            UNIQUE (ticker, date, headline_hash)
+        );
+        """))
+        conn.execute(sqlalchemy_text(f"CREATE INDEX IF NOT EXISTS idx_{NEWS_TABLE}_ticker_date ON {NEWS_TABLE} (ticker, date)"))
+        conn.execute(sqlalchemy_text(f"""
+        CREATE TABLE IF NOT EXISTS {DAILY_TABLE} (
+            ticker VARCHAR(20) NOT NULL,
+            date TEXT NOT NULL,
+            sentiment_sum REAL NOT NULL,
+            news_count INTEGER NOT NULL,
+            PRIMARY KEY (ticker, date)
+        );
+        """))
+
+    if perlu_migrasi:
+        df_lama = pd.read_sql(f"SELECT date, ticker, headline, sentiment FROM {NEWS_TABLE}_lama", engine)
+        df_lama['date'] = pd.to_datetime(df_lama['date']).dt.strftime('%Y-%m-%d')
+        simpan_berita(engine, df_lama.to_dict('records'))
+        with engine.begin() as conn:
+            conn.execute(sqlalchemy_text(f"DROP TABLE {NEWS_TABLE}_lama"))
+
+def perbarui_harian(conn, tickers):
+    """Menghitung ulang ringkasan harian untuk 'tickers' dari tabel berita (di dalam transaksi pemanggil)."""
+    param = {"tickers": list(tickers)}
+    conn.execute(sqlalchemy_text(f"DELETE FROM {DAILY_TABLE} WHERE ticker IN :tickers")
+                 .bindparams(bindparam('tickers', expanding=True)), param)
+    conn.execute(sqlalchemy_text(f"""
+    INSERT INTO {DAILY_TABLE} (ticker, date, sentiment_sum, news_count)
+    SELECT ticker, date, SUM(sentiment), COUNT(*) FROM {NEWS_TABLE}
+    WHERE ticker IN :tickers GROUP BY ticker, date
+    """).bindparams(bindparam('tickers', expanding=True)), param)
+
+def simpan_berita(engine, news_list):
+    """
+    INSERT OR IGNORE berita baru secara massal lalu memperbarui ringkasan harian ticker
+    yang mendapat berita baru, semuanya dalam satu transaksi.
+    Prediksi tersimpan ticker tersebut sejak tanggal berita tertua di batch ikut dihapus.
+    Mengembalikan dict ticker -> jumlah berita yang benar-benar baru.
+    """
+    if not news_list:
+        return {}
+    baris = [{**berita, 'headline_hash': hash_headline(berita['headline'])} for berita in news_list]
+    tickers = sorted({berita['ticker'] for berita in baris})
+    hitung = sqlalchemy_text(f"SELECT ticker, COUNT(*) FROM {NEWS_TABLE} WHERE ticker IN :tickers GROUP BY ticker") \
+        .bindparams(bindparam('tickers', expanding=True))
+    with span('db_write'), engine.begin() as conn:
+        sebelum = dict(conn.execute(hitung, {"tickers": tickers}).fetchall())
+        conn.execute(sqlalchemy_text(f"""
+        INSERT OR IGNORE INTO {NEWS_TABLE} (date, ticker, headline, sentiment, headline_hash)
+        VALUES (:date, :ticker, :headline, :sentiment, :headline_hash)
+        """), baris)
+        sesudah = dict(conn.execute(hitung, {"tickers": tickers}).fetchall())
+        baru = {ticker: sesudah.get(ticker, 0) - sebelum.get(ticker, 0) for ticker in tickers if sesudah.get(ticker, 0) > sebelum.get(ticker, 0)}
+        if baru:
+            perbarui_harian(conn, baru)
+    if baru:
+        # Sentimen tanggal lampau bisa berubah (berita terlambat): prediksi sejak tanggal
+        # berita tertua di batch tidak berlaku lagi
+        from prediction_store import hapus_prediksi # Impor malas: prediction_store mengimpor features -> news_store
+        for ticker in baru:
+            hapus_prediksi(engine, ticker, sejak=min(berita['date'] for berita in baris if berita['ticker'] == ticker))
+    return baru
+
+def load_news(engine, ticker, mulai=None):
+    """Berita satu ticker (sudah unik), terbaru lebih dulu. DataFrame kosong jika belum ada."""
+    query = f"SELECT date, ticker, headline, sentiment FROM {NEWS_TABLE} WHERE ticker = :ticker"
+    if mulai is not None:
+        query += " AND date >= :mulai"
+    try:
+        return pd.read_sql(sqlalchemy_text(query + " ORDER BY date DESC"), engine, parse_dates=['date'],
+                           params={"ticker": ticker, "mulai": str(pd.Timestamp(mulai).date()) if mulai is not None else None})
+    except Exception:
+        return pd.DataFrame(columns=['date', 'ticker', 'headline', 'sentiment'])
+
+def load_sentiment_harian(engine, ticker, mulai=None, kolom=('sentiment_sum', 'news_count')):
+    """Ringkasan sentimen harian satu ticker berindeks tanggal. DataFrame kosong jika belum ada."""
+    query = f"SELECT date, {', '.join(kolom)} FROM {DAILY_TABLE} WHERE ticker = :ticker"
+    if mulai is not None:
+        query += " AND date >= :mulai"
+    try:
+        df = pd.read_sql(sqlalchemy_text(query + " ORDER BY date"), engine, parse_dates=['date'], index_col='date',
+                         params={"ticker": ticker, "mulai": str(pd.Timestamp(mulai).date()) if mulai is not None else None})
+    except Exception:
+        return pd.DataFrame()
+    return df if not df.empty else pd.DataFrame()
+
+# --- BAGIAN EKSEKUSI UTAMA (MIGRASI & PEMBANGUNAN ULANG RINGKASAN) ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrasi tabel berita ke format unik + indeks dan membangun ulang sentiment_daily.")
+    parser.add_argument("--tickers", nargs='+', help="(Opsional) Hanya bangun ulang ringkasan ticker tertentu.")
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite:///data_saham.db")
+    start_time = time.time()
+    create_news_tables(engine)
+    if args.tickers:
+        tickers = [ticker.upper() for ticker in args.tickers]
+    else:
+        with engine.connect() as conn:
+            tickers = [row[0] for row in conn.execute(sqlalchemy_text(f"SELECT DISTINCT ticker FROM {NEWS_TABLE}"))]
+    with engine.begin() as conn:
+        if tickers:
+            perbarui_harian(conn, tickers)
+        jumlah_berita = conn.execute(sqlalchemy_text(f"SELECT COUNT(*) FROM {NEWS_TABLE}")).scalar()
+
+    print("="*54)
+    print("--- PENYIMPANAN BERITA SIAP ---")
+    print(f"Laporan Akhir:")
+    print(f"Total waktu            : {time.time() - start_time:.2f} detik")
+    print(f"Berita unik tersimpan  : {jumlah_berita}")
+    print(f"Ticker diringkas       : {len(tickers)}")
+    print("="*54)
@@ -12,6 +12,8 @@ import os
 import argparse
 from datetime import datetime
 from github_sync import sync_to_github # <-- Impor kurir kita
+from data_versions import bump_version
+from instrumentation import span, mulai_run, selesai_run, cetak_ringkasan
 
 # --- FUNGSI UNTUK MEMPERSIAPKAN DATA DENGAN PARAMETER DINAMIS ---
 def prepare_features_and_target(df, params):
@@ -51,9 +53,50 @@ def prepare_features_and_target(df, params):
     
     return X, y
 
+# --- PENCARIAN GRID UNTUK SATU SAHAM ---
+def cari_parameter_terbaik(raw_df, all_param_combinations, ticker=None):
+    """
+    Melatih & mengevaluasi satu model per kombinasi parameter (F1 kelas 1 pada 20% data terakhir).
+    Mengembalikan (skor terbaik, parameter terbaik); (-1, None) jika tidak ada kombinasi yang valid.
+    """
+    best_score_for_ticker = -1
+    best_params_for_ticker = None
+
+    # Loop untuk setiap kombinasi parameter
+    for params in all_param_combinations:
+
+        with span('feature_build', ticker):
+            X, y = prepare_features_and_target(raw_df, params)
+
+        if X.empty: continue
+
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, shuffle=False)
+
+        if len(X_train) == 0 or len(X_test) == 0: continue
+
+        model = RandomForestClassifier(
+            n_estimators=params['n_estimators'],
+            max_depth=params['max_depth'],
+            min_samples_leaf=params['min_samples_leaf'],
+            random_state=42,
+            n_jobs=-1
+        )
+        with span('train', ticker):
+            model.fit(X_train, y_train)
+
+        with span('predict', ticker):
+            predictions = model.predict(X_test)
+        score = f1_score(y_test, predictions, pos_label=1, zero_division=0)
+
+        if score > best_score_for_ticker:
+            best_score_for_ticker = score
+            best_params_for_ticker = params
+    return best_score_for_ticker, best_params_for_ticker
+
 # --- BAGIAN EKSEKUSI UTAMA ---
 if __name__ == "__main__":
     start_time = time.time()
+    mulai_run('optimizer')
     engine = create_engine("sqlite:///data_saham.db")
     
     # Siapkan argumen parser
@@ -107,7 +150,8 @@ if __name__ == "__main__":
         print(f"\n({i+1}/{len(tickers_to_process)}) Memulai optimasi untuk: {ticker}")
         
         try:
-            raw_df = pd.read_sql(f"SELECT * FROM '{ticker}'", engine, index_col='Date', parse_dates=['Date'])
+            with span('db_load', ticker):
+                raw_df = pd.read_sql(f"SELECT * FROM '{ticker}'", engine, index_col='Date', parse_dates=['Date'])
             if len(raw_df) < 250:
                 print(f"-> Data untuk {ticker} tidak cukup panjang. Melewati.")
                 all_best_params[ticker] = {'error': 'data tidak cukup'}
@@ -117,36 +161,8 @@ if __name__ == "__main__":
             all_best_params[ticker] = {'error': f'gagal memuat data: {e}'}
             continue
 
-        best_score_for_ticker = -1
-        best_params_for_ticker = None
-        
-        # Loop untuk setiap kombinasi parameter
-        for j, params in enumerate(all_param_combinations):
-            
-            X, y = prepare_features_and_target(raw_df, params)
+        best_score_for_ticker, best_params_for_ticker = cari_parameter_terbaik(raw_df, all_param_combinations, ticker)
 
-            if X.empty: continue
-            
-            X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, shuffle=False)
-            
-            if len(X_train) == 0 or len(X_test) == 0: continue
-
-            model = RandomForestClassifier(
-                n_estimators=params['n_estimators'],
-                max_depth=params['max_depth'],
-                min_samples_leaf=params['min_samples_leaf'],
-                random_state=42,
-                n_jobs=-1
-            )
-            model.fit(X_train, y_train)
-            
-            predictions = model.predict(X_test)
-            score = f1_score(y_test, predictions, pos_label=1, zero_division=0)
-            
-            if score > best_score_for_ticker:
-                best_score_for_ticker = score
-                best_params_for_ticker = params
-        
         if best_params_for_ticker:
             print(f"-> 'Resep Emas' ditemukan untuk {ticker} dengan skor F1: {best_score_for_ticker:.4f}")
             all_best_params[ticker] = best_params_for_ticker
@@ -158,6 +174,7 @@ if __name__ == "__main__":
         # Simpan hasil ke file JSON setiap kali satu saham selesai, untuk keamanan
         with open(output_file, 'w') as f:
             json.dump(all_best_params, f, indent=4)
+        bump_version(engine, 'params', [ticker])
         print(f"-> Hasil untuk {ticker} disimpan ke '{output_file}'.")
 
 
@@ -171,6 +188,7 @@ if __name__ == "__main__":
     print(f"Total waktu            : {total_waktu_menit:.2f} menit")
     print(f"Total saham diproses   : {len(tickers_to_process)}")
     print(f"File 'resep emas' telah diperbarui di '{output_file}'")
+    cetak_ringkasan(selesai_run(saham=len(tickers_to_process)))
     
     # Meninggalkan jejak
     with open('logs/optimizer_last_run.log', 'w') as f:
@@ -181,4 +199,4 @@ if __name__ == "__main__":
     # --- PANGGIL "KURIR" UNTUK SINKRONISASI OTOMATIS ---
     if saham_yang_dioptimasi_kali_ini: # Hanya sync jika ada resep baru yang ditemukan
         pesan_commit = f"Auto-sync: Optimasi {len(saham_yang_dioptimasi_kali_ini)} resep saham"
-        sync_to_github(pesan_commit)
\ No newline at end of file
+        sync_to_github(pesan_commit, [output_file, 'data_saham.db', 'logs/optimizer_last_run.log'])
\ No newline at end of file
@@ -1,10 +1,29 @@
 import streamlit as st
 from sqlalchemy import create_engine
-from screener import run_screener, get_available_stocks
+from screener import run_screener, stream_screener, hitung_rekomendasi, get_available_stocks, ticker_tanpa_snapshot
 import pandas as pd
+from contextlib import closing
 
 st.set_page_config(layout="wide")
 
+def analisis_langsung(tickers, db_file_path, atr_multiplier, risk_reward_ratio, rrr_long_term):
+    """
+    Screener langsung untuk 'tickers' dengan progres & 10 besar sementara; hasilnya masuk ke snapshot
+    secara bertahap. Jika halaman di-rerun di tengah jalan, generator langsung ditutup: sisa antrean
+    dibatalkan dan baris yang sudah selesai tetap tersimpan.
+    """
+    progress_bar = st.progress(0, text="Analisis Dimulai...")
+    live_cols = st.columns(2)
+    live_short, live_long = live_cols[0].empty(), live_cols[1].empty()
+    with closing(stream_screener(tickers, db_file_path)) as hasil_stream:
+        for ticker, selesai, df_top in hasil_stream:
+            progress_bar.progress(selesai / len(tickers), text=f"Menganalisis: {ticker} ({selesai}/{len(tickers)})")
+            top_short, top_long = hitung_rekomendasi(df_top, atr_multiplier, risk_reward_ratio, rrr_long_term)
+            live_short.dataframe(top_short[['Saham', 'Skor Rekomendasi', 'Harga Beli', 'Harga Stop Loss', 'Harga Take Profit']], hide_index=True)
+            live_long.dataframe(top_long[['Saham', 'RSI Mingguan', 'Harga Beli', 'Harga Stop Loss', 'Harga Take Profit']], hide_index=True)
+    progress_bar.empty(); live_short.empty(); live_long.empty()
+    st.success("Analisis selesai! Hasil disimpan sebagai snapshot screener.")
+
 def display_recommendations_page():
     st.title("🥇 Top Rekomendasi Saham")
     st.write("Pusat komando untuk menemukan saham-saham unggulan berdasarkan analisis AI dan Systematic.")
@@ -16,37 +35,35 @@ def display_recommendations_page():
         st.warning("Database saham kosong. Harap jalankan `get_data.py` terlebih dahulu.")
         return
     
-    # Tombol untuk membersihkan cache
-    if st.sidebar.button("🔄 Refresh Data Cache", use_container_width=True, key='refresh_recs'):
-        st.cache_data.clear()
-        st.cache_resource.clear()
-        st.success("Cache berhasil dibersihkan! Data akan dimuat ulang.")
-        st.rerun()
-
     st.sidebar.header("Parameter Screener")
     atr_multiplier = st.sidebar.slider("Multiplier ATR (Jangka Pendek)", 1.0, 4.0, 2.0, 0.1, key='recs_atr')
     risk_reward_ratio = st.sidebar.slider("Rasio R/R (Jangka Pendek)", 1.0, 4.0, 1.5, 0.1, key='recs_rrr')
     rrr_long_term = st.sidebar.slider("Rasio R/R (Jangka Panjang)", 1.0, 5.0, 2.0, 0.5, key='recs_rrr_long')
 
-    if 'run_analysis' not in st.session_state:
-        st.session_state['run_analysis'] = False
+    # Screener membaca tabel snapshot (screener_snapshot.py), jadi cukup dihitung ulang
+    # setiap kali slider digeser.
+    df_short, df_long = run_screener(stock_list, db_file_path, atr_multiplier, risk_reward_ratio, rrr_long_term)
 
-    if st.button("Jalankan Analisis & Cari Saham Unggulan", use_container_width=True):
-        st.session_state['run_analysis'] = True
+    if df_short is None:
+        # Snapshot belum ada: analisis langsung seluruh saham hanya atas permintaan (mahal), 10 besar sementara tampil selama berjalan
+        st.info("Snapshot screener belum tersedia. Jalankan `screener_snapshot.py`, atau analisis langsung semua saham di sini.")
+        if st.button("Jalankan Analisis & Cari Saham Unggulan", use_container_width=True, key='recs_analisis_langsung'):
+            analisis_langsung(stock_list, db_file_path, atr_multiplier, risk_reward_ratio, rrr_long_term)
+            df_short, df_long = run_screener(stock_list, db_file_path, atr_multiplier, risk_reward_ratio, rrr_long_term)
+        if df_short is None:
+            df_short, df_long = pd.DataFrame(), pd.DataFrame()
+    else:
+        # Saham yang tidak ada di snapshot tidak ikut diperingkat: tampilkan dan tawarkan analisis langsung
+        tanpa_snapshot = ticker_tanpa_snapshot(stock_list, db_file_path)
+        if tanpa_snapshot:
+            with st.expander(f"⚠️ {len(tanpa_snapshot)} saham belum ada di snapshot screener dan tidak ikut diperingkat"):
+                st.caption("Data/model belum tersedia atau snapshot belum diperbarui: " + ", ".join(tanpa_snapshot))
+                if st.button(f"Analisis {len(tanpa_snapshot)} saham ini sekarang", key='recs_tanpa_snapshot'):
+                    analisis_langsung(tanpa_snapshot, db_file_path, atr_multiplier, risk_reward_ratio, rrr_long_term)
+                    df_short, df_long = run_screener(stock_list, db_file_path, atr_multiplier, risk_reward_ratio, rrr_long_term)
 
-    if st.session_state['run_analysis']:
-        progress_bar = st.progress(0, text="Analisis Dimulai...")
-        def update_progress(ticker, percentage):
-            progress_bar.progress(percentage, text=f"Menganalisis: {ticker}")
-        
-        with st.spinner("Mesin AI sedang menganalisis seluruh saham... Harap tunggu."):
-            df_short, df_long = run_screener(stock_list, db_file_path, atr_multiplier, risk_reward_ratio, rrr_long_term, update_progress)
-        
-        st.session_state['df_short'] = df_short
-        st.session_state['df_long'] = df_long
-        st.success("Analisis selesai!")
-        progress_bar.empty()
-        st.session_state['run_analysis'] = False
+    st.session_state['df_short'] = df_short
+    st.session_state['df_long'] = df_long
 
     st.write("---")
     
@@ -1,11 +1,14 @@
 import streamlit as st
 import pandas as pd
 from sqlalchemy import create_engine, inspect
-import plotly.graph_objects as go
-import joblib
-import pandas_ta as ta
 import numpy as np
 import json
+from prediction_store import get_predictions
+from chart_utils import bangun_grafik_harga, jumlah_titik
+from data_versions import get_versions, get_total_version
+from features import aktifkan_pandas_ta
+from news_store import load_news, load_sentiment_harian
+import data_cache
 
 # --- KONFIGURASI & SETUP ---
 st.set_page_config(layout="wide") 
@@ -13,47 +16,58 @@ db_file_path = "data_saham.db"
 engine = create_engine(f"sqlite:///{db_file_path}")
 
 # --- FUNGSI-FUNGSI BANTU ---
-@st.cache_data
 def load_data(ticker, timeframe='daily'):
-    table_name = f"{ticker}_weekly" if timeframe == 'weekly' else ticker
-    try:
-        df = pd.read_sql(f"SELECT * FROM '{table_name}'", engine, index_col='Date', parse_dates=['Date'])
-        return df
-    except Exception:
-        return pd.DataFrame()
+    # Cache LRU bersama seluruh halaman & sesi (data_cache), tanpa salinan saat hit
+    return data_cache.load_price(ticker, engine, timeframe)
 
-@st.cache_data
-def load_sentiment_data(ticker):
-    try:
-        df = pd.read_sql(f"SELECT * FROM news_sentiment WHERE ticker='{ticker}'", engine, parse_dates=['date'])
-        df = df.sort_values(by='date', ascending=False).drop_duplicates(subset=['headline'])
-        return df
-    except Exception:
-        return pd.DataFrame()
+# Argumen 'versi' (dari data_versions) hanya menjadi bagian kunci cache: begitu get_data,
+# news_scraper atau optimizer menulis data baru, ticker tersebut otomatis dimuat ulang.
+@st.cache_data(max_entries=256)
+def load_sentiment_data(ticker, versi=None):
+    # Berita sudah unik di database (news_store), tidak perlu drop_duplicates lagi
+    return load_news(engine, ticker)
+
+@st.cache_data(max_entries=256)
+def load_sentiment_harian_cached(ticker, versi=None):
+    return load_sentiment_harian(engine, ticker)
 
 @st.cache_data
-def get_available_stocks(_engine):
+def get_available_stocks(_engine, versi=None):
     inspector = inspect(_engine)
-    stock_names = [name for name in inspector.get_table_names() if not name.endswith(('_weekly', '_sentiment')) and 'news' not in name and 'broker' not in name]
+    stock_names = [name for name in inspector.get_table_names() if not name.endswith(('_weekly', '_sentiment')) and 'news' not in name and 'broker' not in name and '.' in name]
     return sorted(stock_names)
 
-@st.cache_resource
-def load_ai_model(ticker):
-    model_filename = f'models/{ticker}_model.joblib'
-    try:
-        model = joblib.load(model_filename)
-        return model
-    except FileNotFoundError:
-        return None
-
 @st.cache_data
-def load_optimal_params():
+def load_optimal_params(versi=None):
     try:
         with open('optimal_params.json', 'r') as f:
             return json.load(f)
     except FileNotFoundError:
         return {}
 
+def hitung_fitur(df_daily, df_weekly, sentiment_daily, params):
+    """Fitur teknikal + sentimen harian (sentiment_sum & news_count) untuk grafik & narasi halaman ini (hasilnya di-cache di data_cache)."""
+    aktifkan_pandas_ta()
+    # Tanpa menambah kolom ke df_weekly: frame itu milik cache data bersama
+    df_weekly_features = pd.DataFrame({'SMA_20_weekly': df_weekly.ta.sma(length=20), 'RSI_14_weekly': df_weekly.ta.rsi(length=14)})
+    df_merged = pd.merge_asof(df_daily, df_weekly_features, left_index=True, right_index=True)
+    df = df_merged.merge(sentiment_daily, left_index=True, right_index=True, how='left')
+
+    df.ta.rsi(length=params.get('rsi_length', 14), append=True)
+    df.ta.macd(fast=12, slow=26, signal=9, append=True)
+    df.ta.bbands(length=params.get('bbands_length', 20), append=True)
+    df.ta.atr(length=14, append=True)
+    df.ta.obv(append=True)
+    df.ta.adx(length=14, append=True)
+    df.ta.cdl_pattern(name="all", append=True)
+    df.ta.pivots(append=True)
+    pivot_levels_raw = ['PIVOTS_TRAD_D_P','PIVOTS_TRAD_D_S1','PIVOTS_TRAD_D_R1']
+    pivot_levels_simple = ['p','s1','r1']
+    rename_dict = {old: new for old, new in zip(pivot_levels_raw, pivot_levels_simple)}
+    df.rename(columns=rename_dict, inplace=True)
+    df.fillna(0, inplace=True)
+    return df
+
 def interpretasi_adx(row):
     adx = row.get('ADX_14', 0)
     dmp = row.get('DMP_14', 0)
@@ -103,13 +117,7 @@ st.title("🔍 Analisis Detail Saham")
 
 # --- SIDEBAR ---
 st.sidebar.header("Panel Kontrol")
-available_stocks = get_available_stocks(engine)
-# Tombol untuk membersihkan cache
-if st.sidebar.button("🔄 Refresh Data Cache", use_container_width=True, key='refresh_detail'):
-    st.cache_data.clear()
-    st.cache_resource.clear()
-    st.success("Cache berhasil dibersihkan! Data akan dimuat ulang.")
-    st.rerun()
+available_stocks = get_available_stocks(engine, get_total_version(engine, 'prices'))
 
 if not available_stocks:
     st.sidebar.error("Database saham kosong.")
@@ -131,16 +139,17 @@ else:
     atr_multiplier = st.sidebar.slider("Multiplier ATR untuk Cut Loss", 1.0, 4.0, 2.0, 0.1, key='detail_atr')
     risk_reward_ratio = st.sidebar.slider("Rasio Risk/Reward untuk Take Profit", 1.0, 4.0, 1.5, 0.1, key='detail_rrr')
     
-    all_optimal_params = load_optimal_params()
+    all_optimal_params = load_optimal_params(get_total_version(engine, 'params'))
 
     # --- UTAMA APLIKASI ---
+    versi_harga, versi_sentimen = get_versions(engine, selected_ticker, ('prices', 'sentiment'))
     df_daily = load_data(selected_ticker, timeframe='daily')
     df_weekly = load_data(selected_ticker, timeframe='weekly')
-    df_sentiment_raw = load_sentiment_data(selected_ticker)
+    df_sentiment_raw = load_sentiment_data(selected_ticker, versi=versi_sentimen)
     
     if len(df_daily) > 1 and len(df_weekly) > 1:
-        model = load_ai_model(selected_ticker)
-        if model is not None:
+        prediksi = get_predictions(selected_ticker, engine, all_optimal_params)
+        if prediksi is not None:
             
             params = all_optimal_params.get(selected_ticker, {'rsi_length': 14, 'bbands_length': 20, 'n_estimators': 100, 'max_depth': 20, 'min_samples_leaf': 1})
             with st.sidebar.expander("Parameter Optimal Digunakan", expanded=False):
@@ -153,38 +162,12 @@ else:
                     st.metric("BBands Length", params.get('bbands_length', 'N/A'))
                     st.metric("Max Depth", str(params.get('max_depth', 'N/A')))
 
-            if not df_sentiment_raw.empty:
-                sentiment_daily = df_sentiment_raw.groupby(df_sentiment_raw['date'].dt.date).agg(sentiment_sum=('sentiment', 'sum')).reset_index()
-                sentiment_daily['date'] = pd.to_datetime(sentiment_daily['date'])
-                sentiment_daily.set_index('date', inplace=True)
-            else:
-                sentiment_daily = pd.DataFrame()
-
-            df_weekly['SMA_20_weekly'] = df_weekly.ta.sma(length=20)
-            df_weekly['RSI_14_weekly'] = df_weekly.ta.rsi(length=14)
-            df_weekly_features = df_weekly[['SMA_20_weekly', 'RSI_14_weekly']]
-            df_merged = pd.merge_asof(df_daily, df_weekly_features, left_index=True, right_index=True)
-            df = df_merged.merge(sentiment_daily, left_index=True, right_index=True, how='left')
+            # Fitur dihitung sekali per versi data & parameter, lalu dibagi lewat cache bersama
+            kunci_fitur = ('fitur_detail', selected_ticker, versi_harga, versi_sentimen, params.get('rsi_length', 14), params.get('bbands_length', 20))
+            df = data_cache.get_or_load(kunci_fitur, lambda: hitung_fitur(df_daily, df_weekly, load_sentiment_harian_cached(selected_ticker, versi=versi_sentimen), params))
 
-            df.ta.rsi(length=params.get('rsi_length', 14), append=True)
-            df.ta.macd(fast=12, slow=26, signal=9, append=True)
-            df.ta.bbands(length=params.get('bbands_length', 20), append=True)
-            df.ta.atr(length=14, append=True)
-            df.ta.obv(append=True)
-            df.ta.adx(length=14, append=True)
-            df.ta.cdl_pattern(name="all", append=True)
-            df.ta.pivots(append=True)
-            pivot_levels_raw = ['PIVOTS_TRAD_D_P','PIVOTS_TRAD_D_S1','PIVOTS_TRAD_D_R1']
-            pivot_levels_simple = ['p','s1','r1']
-            rename_dict = {old: new for old, new in zip(pivot_levels_raw, pivot_levels_simple)}
-            df.rename(columns=rename_dict, inplace=True)
-            df.fillna(0, inplace=True)
-            
-            required_features = model.feature_names_in_
-            for col in required_features:
-                if col not in df.columns: df[col] = 0
-            X = df[required_features]
-            df['Prediksi_Sinyal'] = model.predict(X)
+            # Sinyal AI dibaca dari penyimpanan prediksi, bukan menjalankan model ulang setiap kali halaman dibuka
+            df['Prediksi_Sinyal'] = prediksi['Sinyal'].reindex(df.index).fillna(0)
             
             data_hari_terakhir = df.iloc[-1]
             data_hari_kemarin = df.iloc[-2]
@@ -286,17 +269,15 @@ else:
 
             st.header("Grafik Interaktif (Harian)", divider='rainbow')
             
-            fig = go.Figure()
-            fig.add_trace(go.Scatter(x=df.index, y=df['Close'], mode='lines', name='Harga Penutupan', line=dict(color='skyblue')))
-            
+            # Rentang tampilan: makin sempit rentangnya, makin detail titik yang dikirim (LTTB per rentang)
+            tanggal_awal, tanggal_akhir = df.index[0].date(), df.index[-1].date()
+            rentang = st.slider("Rentang Tanggal Grafik", min_value=tanggal_awal, max_value=tanggal_akhir,
+                                value=(tanggal_awal, tanggal_akhir), format="DD MMM YYYY", key='detail_rentang')
+            df_grafik = df.loc[str(rentang[0]):str(rentang[1])]
+
             bbu_col = f'BBU_{params.get("bbands_length", 20)}_2.0_2.0'
             bbl_col = f'BBL_{params.get("bbands_length", 20)}_2.0_2.0'
-            if bbu_col in df.columns and bbl_col in df.columns:
-                fig.add_trace(go.Scatter(x=df.index, y=df[bbu_col], mode='lines', name='Bollinger Atas', line=dict(width=0.5, color='gray')))
-                fig.add_trace(go.Scatter(x=df.index, y=df[bbl_col], mode='lines', name='Bollinger Bawah', line=dict(width=0.5, color='gray'), fill='tonexty', fillcolor='rgba(128,128,128,0.1)'))
-            
-            buy_periods = df[df['Prediksi_Sinyal'] == 1]
-            fig.add_trace(go.Scatter(x=buy_periods.index, y=buy_periods['Close'], mode='markers', name='AI: Beli/Tahan', marker=dict(color='lime', size=5, symbol='circle-open')))
+            fig = bangun_grafik_harga(df_grafik, bbu_col, bbl_col)
             
             if rencana_trading_valid:
                 entry_price = harga_beli_saran if sinyal_terakhir == 1 else harga_pemicu_beli
@@ -312,6 +293,8 @@ else:
             
             fig.update_layout(title=f'Analisis Interaktif untuk {selected_ticker}', xaxis_title='Tanggal', yaxis_title='Harga (IDR)', legend_title='Legenda', height=600)
             st.plotly_chart(fig, use_container_width=True)
+            # Ukuran payload sengaja tidak dihitung di sini (perlu serialisasi penuh); lihat 'python chart_utils.py'
+            st.caption(f"{len(df_grafik):,} hari dalam rentang → {jumlah_titik(fig):,} titik dikirim (LTTB + WebGL)")
             
     else:
         st.error(f"Data untuk {selected_ticker} tidak dapat dimuat.")
\ No newline at end of file
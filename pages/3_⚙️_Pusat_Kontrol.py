@@ -1,10 +1,14 @@
 import streamlit as st
 import os
-import subprocess
-import sys
+from collections import deque
 from datetime import datetime
 from sqlalchemy import create_engine, inspect
 import pandas as pd
+from data_versions import get_total_version, load_versions
+from data_cache import statistik_cache
+from instrumentation import muat_runs, tabel_tahap, tabel_outlier, RUNS_FILE
+from latest_quotes import load_latest_quotes
+from job_runner import mulai_job, batalkan_job, daftar_job, baca_log, STATUS_AKTIF, MAKS_BARIS_LOG, MAKS_JOB_PARALEL
 
 st.set_page_config(layout="wide")
 
@@ -22,66 +26,130 @@ def get_last_run_time(log_file):
                 return "Format tidak valid"
     return "Belum pernah dijalankan"
 
-def run_script(command, output_placeholder):
-    """Menjalankan script eksternal dan menampilkan outputnya secara real-time."""
-    output_text = ""
-    try:
-        process = subprocess.Popen([sys.executable] + command, 
-                                   stdout=subprocess.PIPE, 
-                                   stderr=subprocess.STDOUT, 
-                                   text=True, 
-                                   encoding='utf-8', 
-                                   bufsize=1,
-                                   creationflags=subprocess.CREATE_NO_WINDOW)
-        
-        for line in iter(process.stdout.readline, ''):
-            output_text += line
-            output_placeholder.code(output_text, language='powershell')
-        
-        process.stdout.close()
-        process.wait()
-        return process.returncode
-    except FileNotFoundError:
-        output_placeholder.code(f"Error: Perintah '{sys.executable}' tidak ditemukan.")
-        return -1
-    except Exception as e:
-        output_placeholder.code(f"Terjadi error saat menjalankan subprocess: {e}")
-        return -1
+def kirim_job(command, deskripsi):
+    """Mengirim script sebagai job latar belakang; progresnya dipantau di panel Job Latar Belakang."""
+    job_id, error = mulai_job(command)
+    if error:
+        st.warning(error)
+    else:
+        st.session_state.setdefault('job_dipantau', []).insert(0, job_id)
+        st.success(f"Job `{job_id}` dimulai: {deskripsi}. Pantau di panel Job Latar Belakang di bawah.")
+
+@st.fragment(run_every=2)
+def panel_job():
+    """
+    Memantau job tanpa memblokir halaman: hanya fragmen ini yang di-rerun setiap 2 detik,
+    dan hanya baris log baru (seq > seq terakhir yang sudah diambil) yang dibaca.
+    """
+    jobs = daftar_job(limit=10)
+    if not jobs:
+        st.caption("Belum ada job.")
+        return
+    buffer_log = st.session_state.setdefault('job_log', {})
+    for job in jobs:
+        aktif = job['status'] in STATUS_AKTIF
+        ikon = {'menunggu': '⏳', 'berjalan': '🔄', 'selesai': '✅', 'gagal': '❌', 'dibatalkan': '⛔', 'hilang': '❓'}[job['status']]
+        dipantau = job['id'] in st.session_state.get('job_dipantau', [])
+        with st.expander(f"{ikon} {' '.join(job['command'])} — {job['status']} ({job['mulai'][:19].replace('T', ' ')})", expanded=aktif or dipantau):
+            seq_terakhir, baris = buffer_log.setdefault(job['id'], (0, deque(maxlen=MAKS_BARIS_LOG)))
+            baru = baca_log(job['id'], seq_terakhir)
+            if baru:
+                baris.extend(teks for _, teks in baru)
+                buffer_log[job['id']] = (baru[-1][0], baris)
+            st.code("\n".join(baris) + (f"\n{job['progres']}" if aktif and job['progres'] else ""), language='powershell')
+            if aktif:
+                if st.button("Batalkan Job", key=f"batal_{job['id']}"):
+                    batalkan_job(job['id'])
+                    st.info("Permintaan pembatalan dikirim.")
+            elif job['status'] == 'selesai':
+                st.success("Job selesai.")
+            elif job['status'] == 'hilang':
+                st.error("Supervisor job berhenti tanpa melapor (mis. komputer dimatikan).")
+            elif job['status'] == 'gagal':
+                st.error(f"Job gagal (kode keluar {job['returncode']}).")
 
 # !! PERBAIKAN DI SINI: Tambahkan garis bawah pada argumen 'engine' !!
 @st.cache_data
-def get_available_stocks_for_control_panel(_engine):
+def get_available_stocks_for_control_panel(_engine, versi=None):
     """Fungsi khusus untuk Pusat Kontrol agar tidak konflik cache."""
     inspector = inspect(_engine)
-    stock_names = [name for name in inspector.get_table_names() if not name.endswith(('_weekly', '_sentiment')) and 'news' not in name and 'broker' not in name]
+    stock_names = [name for name in inspector.get_table_names() if not name.endswith(('_weekly', '_sentiment')) and 'news' not in name and 'broker' not in name and '.' in name]
     return sorted(stock_names)
 
 # --- JUDUL APLIKASI ---
 st.title("⚙️ Pusat Kontrol Sistem AI")
 st.write("Halaman ini digunakan untuk memonitor dan menjalankan proses backend secara manual.")
 
-# Tambahkan sidebar dengan tombol refresh
-st.sidebar.header("Panel Opsi")
-# Tombol untuk membersihkan cache
-if st.sidebar.button("🔄 Refresh Data Cache", use_container_width=True, key='refresh_control'):
-    st.cache_data.clear()
-    st.cache_resource.clear()
-    st.success("Cache berhasil dibersihkan! Data akan dimuat ulang.")
-    st.rerun()
+# Inisialisasi engine sekali saja
+db_file_path = "data_saham.db"
+engine = create_engine(f"sqlite:///{db_file_path}")
 
 # --- PANEL MONITORING ---
 st.header("Panel Monitoring Status", divider='rainbow')
 st.write("Menampilkan waktu terakhir setiap tugas otomatis berhasil diselesaikan.")
 
-col1, col2, col3 = st.columns(3)
+col1, col2, col3, col4 = st.columns(4)
 with col1:
     st.metric("Update Data Harga Terakhir", get_last_run_time('get_data_last_run.log'))
 with col2:
     st.metric("Update Sentimen Terakhir", get_last_run_time('news_scraper_last_run.log'))
 with col3:
     st.metric("Pelatihan Ulang AI Terakhir", get_last_run_time('trainer_last_run.log'))
+with col4:
+    st.metric("Snapshot Screener Terakhir", get_last_run_time('screener_snapshot_last_run.log'))
 
 st.info("Catatan: Waktu di atas hanya diperbarui jika script yang relevan berjalan sampai selesai tanpa error.")
+with st.expander("Registri Versi Data (cache halaman otomatis dimuat ulang per ticker saat versinya naik)"):
+    st.dataframe(load_versions(engine).head(50), use_container_width=True, hide_index=True)
+with st.expander("Kuotasi Terakhir Seluruh Saham (tabel latest_quotes)"):
+    df_quotes = load_latest_quotes(engine)
+    if df_quotes.empty:
+        st.caption("Tabel belum ada. Jalankan get_data.py atau `python latest_quotes.py` untuk backfill.")
+    else:
+        st.caption(f"{len(df_quotes)} saham, data terakhir {df_quotes['last_date'].max():%d %b %Y}.")
+        st.dataframe(df_quotes.drop(columns=['updated_at']).sort_values('change_pct', ascending=False), use_container_width=True)
+with st.expander("Statistik Cache Data Bersama (semua halaman & sesi dalam proses ini)"):
+    stat = statistik_cache()
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Hit Rate", f"{stat['hit_rate_pct']:.1f}%", help=f"{stat['hit']} hit / {stat['miss']} miss")
+    c2.metric("Entri", stat['entri'])
+    c3.metric("Memori Terpakai", f"{stat['byte'] / 1024**2:,.1f} / {stat['batas_byte'] / 1024**2:,.0f} MB")
+    c4.metric("Eviction (LRU)", stat['eviction'])
+with st.expander("Metrik Kinerja Jalur Panas (rincian per tahap, saham terlambat & tren antar run)"):
+    runs = muat_runs(batas=500)
+    if not runs:
+        st.caption(f"Belum ada run tercatat di '{RUNS_FILE}'. Setiap script menambahkan satu baris saat selesai berjalan.")
+    else:
+        daftar_skrip = sorted({r['skrip'] for r in runs})
+        skrip = st.selectbox("Script", daftar_skrip, index=daftar_skrip.index(runs[-1]['skrip']))
+        runs_skrip = [r for r in runs if r['skrip'] == skrip]
+        terakhir = runs_skrip[-1]
+        sebelumnya = runs_skrip[-2] if len(runs_skrip) > 1 else None
+        m1, m2, m3, m4 = st.columns(4)
+        m1.metric("Durasi Run Terakhir", f"{terakhir['durasi']:,.1f} dtk", delta_color='inverse',
+                  delta=f"{terakhir['durasi'] - sebelumnya['durasi']:+,.1f} dtk" if sebelumnya else None)
+        m2.metric("Status", terakhir['status'])
+        # Waktu span worker paralel dijumlahkan, jadi bisa melebihi durasi run
+        m3.metric("Total Waktu Span", f"{sum(t['detik'] for t in terakhir['tahap'].values()):,.1f} dtk")
+        m4.metric("Jumlah Run Tercatat", len(runs_skrip))
+
+        df_tahap = tabel_tahap(runs_skrip)
+        kiri, kanan = st.columns(2)
+        with kiri:
+            st.caption(f"Rincian tahap run terakhir ({terakhir['mulai'].replace('T', ' ')})")
+            if terakhir['tahap']:
+                st.bar_chart(df_tahap[df_tahap['run_id'] == terakhir['run_id']].set_index('tahap')['detik'], horizontal=True)
+        with kanan:
+            st.caption("Tren waktu per tahap antar run (detik)")
+            if not df_tahap.empty:
+                st.area_chart(df_tahap.pivot_table(index='mulai', columns='tahap', values='detik', aggfunc='sum').fillna(0))
+        df_outlier = tabel_outlier(terakhir)
+        if not df_outlier.empty:
+            st.caption("Saham paling lambat per tahap pada run terakhir (x_median = kelipatan median waktu per saham)")
+            st.dataframe(df_outlier, use_container_width=True, hide_index=True,
+                         column_config={'detik': st.column_config.NumberColumn(format="%.3f"), 'x_median': st.column_config.NumberColumn(format="%.1fx")})
+        if terakhir['counter']:
+            st.caption("Penghitung: " + ", ".join(f"{nama}={n:,}" for nama, n in sorted(terakhir['counter'].items())))
 # --- PANEL EKSEKUSI MANUAL ---
 st.header("Panel Eksekusi Manual", divider='rainbow')
 
@@ -117,11 +185,9 @@ st.write("---")
 # --- Sub-Bagian: Pengumpulan Data Harian ---
 st.subheader("Pengumpulan Data Harian", divider='rainbow')
 
-# Inisialisasi engine dan daftar saham sekali saja
-db_file_path = "data_saham.db"
-engine = create_engine(f"sqlite:///{db_file_path}")
+# Inisialisasi daftar saham sekali saja
 # Panggil fungsi yang sudah diperbaiki
-stock_list = get_available_stocks_for_control_panel(engine)
+stock_list = get_available_stocks_for_control_panel(engine, get_total_version(engine, 'prices'))
 
 data_tickers = st.multiselect(
     "Pilih saham spesifik untuk diunduh (kosongkan untuk semua dari 'semua_saham_bei.csv'):",
@@ -137,14 +203,7 @@ with col_data1:
             command.append("--tickers")
             command.extend(data_tickers)
         
-        with st.spinner(f"Menjalankan `get_data.py` untuk {len(data_tickers) or 'semua'} saham..."):
-            with st.expander("Lihat Output Terminal", expanded=True):
-                terminal_output = st.empty()
-                return_code = run_script(command, terminal_output)
-                if return_code == 0:
-                    st.success("Proses unduh data harga selesai!")
-                else:
-                    st.error("Terjadi error saat menjalankan script.")
+        kirim_job(command, f"`get_data.py` untuk {len(data_tickers) or 'semua'} saham")
 
 with col_data2:
     if st.button("Unduh Data Sentimen Pilihan", use_container_width=True):
@@ -153,15 +212,9 @@ with col_data2:
             command.append("--tickers")
             command.extend(data_tickers)
             
-        with st.spinner(f"Menjalankan `news_scraper.py` untuk {len(data_tickers) or 'watchlist default'} saham..."):
-            with st.expander("Lihat Output Terminal", expanded=True):
-                terminal_output = st.empty()
-                return_code = run_script(command, terminal_output)
-                if return_code == 0:
-                    st.success("Proses unduh data sentimen selesai!")
-                else:
-                    st.error("Terjadi error saat menjalankan script.")
-                    # --- Sub-Bagian: Pelatihan & Analisis ---
+        kirim_job(command, f"`news_scraper.py` untuk {len(data_tickers) or 'watchlist default'} saham")
+
+# --- Sub-Bagian: Pelatihan & Analisis ---
 st.write("---")
 st.subheader("Pelatihan, Optimasi, & Backtesting", divider='rainbow')
 
@@ -171,7 +224,7 @@ analysis_tickers = st.multiselect(
     key="analysis_selection"
 )
 
-col_analysis1, col_analysis2 = st.columns(2)
+col_analysis1, col_analysis2, col_analysis3 = st.columns(3)
 with col_analysis1:
     if st.button("4. Latih Ulang Model AI Pilihan", use_container_width=True):
         command = ['trainer.py']
@@ -179,14 +232,7 @@ with col_analysis1:
             command.append("--tickers")
             command.extend(analysis_tickers)
             
-        with st.spinner(f"Menjalankan `trainer.py` untuk {len(analysis_tickers) or 'semua'} saham..."):
-            with st.expander("Lihat Output Terminal", expanded=True):
-                terminal_output = st.empty()
-                return_code = run_script(command, terminal_output)
-                if return_code == 0:
-                    st.success("Proses pelatihan ulang model selesai!")
-                else:
-                    st.error("Terjadi error saat menjalankan script.")
+        kirim_job(command, f"`trainer.py` untuk {len(analysis_tickers) or 'semua'} saham")
 
 with col_analysis2:
     if st.button("5. Jalankan Backtest Pilihan", use_container_width=True):
@@ -195,14 +241,16 @@ with col_analysis2:
             command.append("--tickers")
             command.extend(analysis_tickers)
 
-        with st.spinner(f"Menjalankan `ai_backtester.py` untuk {len(analysis_tickers) or 'semua'} saham..."):
-            with st.expander("Lihat Output Terminal", expanded=True):
-                terminal_output = st.empty()
-                return_code = run_script(command, terminal_output)
-                if return_code == 0:
-                    st.success("Proses backtesting selesai! Laporan CSV telah diperbarui.")
-                else:
-                    st.error("Terjadi error saat menjalankan script.")
+        kirim_job(command, f"`ai_backtester.py` untuk {len(analysis_tickers) or 'semua'} saham")
+
+with col_analysis3:
+    if st.button("Perbarui Snapshot Screener", use_container_width=True):
+        command = ['screener_snapshot.py']
+        if analysis_tickers:
+            command.append("--tickers")
+            command.extend(analysis_tickers)
+
+        kirim_job(command, f"`screener_snapshot.py` untuk {len(analysis_tickers) or 'semua'} saham")
 
 # Expander khusus untuk Optimizer karena ini proses yang sangat berat
 with st.expander("⚠️ 6. Jalankan Optimasi Parameter (Proses Sangat Lama)"):
@@ -217,13 +265,30 @@ with st.expander("⚠️ 6. Jalankan Optimasi Parameter (Proses Sangat Lama)"):
     if st.button("JALANKAN OPTIMASI SEKARANG", type="primary"):
         if optimizer_tickers:
             command = ['optimizer.py', '--tickers'] + optimizer_tickers
-            with st.spinner(f"Memulai proses optimasi untuk {len(optimizer_tickers)} saham. Ini akan berjalan di latar belakang..."):
-                with st.expander("Lihat Output Terminal", expanded=True):
-                    terminal_output = st.empty()
-                    return_code = run_script(command, terminal_output)
-                    if return_code == 0:
-                        st.success("Proses optimasi selesai! File 'optimal_params.json' telah diperbarui.")
-                    else:
-                        st.error("Terjadi error saat menjalankan script.")
+            kirim_job(command, f"`optimizer.py` untuk {len(optimizer_tickers)} saham")
         else:
-            st.error("Silakan pilih setidaknya satu saham untuk dioptimasi.")
\ No newline at end of file
+            st.error("Silakan pilih setidaknya satu saham untuk dioptimasi.")
+
+# --- Sub-Bagian: Pipeline Inkremental ---
+st.write("---")
+st.subheader("Pipeline Inkremental", divider='rainbow')
+st.write("Data → sentimen → latih → backtest → screener dalam satu job; setiap tahap hanya memproses saham yang inputnya berubah sejak run terakhir (optimasi tidak termasuk).")
+
+col_pipe1, col_pipe2 = st.columns(2)
+with col_pipe1:
+    if st.button("Lihat Rencana Pipeline", use_container_width=True):
+        from pipeline import susun_rencana, ringkas_rencana # Impor malas: hanya saat rencana diminta
+        try:
+            universe = pd.read_csv('semua_saham_bei.csv')['ticker'].tolist()
+        except FileNotFoundError:
+            universe = stock_list
+        with st.spinner("Membandingkan versi input setiap saham..."):
+            st.dataframe(ringkas_rencana(susun_rencana(universe, engine)), use_container_width=True, hide_index=True)
+with col_pipe2:
+    if st.button("Jalankan Pipeline Inkremental", use_container_width=True, type="primary"):
+        kirim_job(['pipeline.py', 'run'], "`pipeline.py run` (inkremental)")
+
+# --- PANEL JOB LATAR BELAKANG ---
+st.header("Job Latar Belakang", divider='rainbow')
+st.write(f"Script berjalan sebagai proses terpisah (maksimal {MAKS_JOB_PARALEL} bersamaan); halaman tetap bisa dipakai dan job tetap jalan walau halaman ditutup.")
+panel_job()
@@ -7,33 +7,19 @@ from portfolio_manager import (
     add_position, 
     update_position, 
     delete_position, 
-    get_recommendation_for_position,
-    load_data
+    get_latest_prices,
+    hitung_profit_loss,
+    get_recommendations_for_portfolio
 )
 
 st.set_page_config(layout="wide")
 
-# --- FUNGSI BANTU KHUSUS UNTUK HALAMAN INI ---
-@st.cache_data(ttl=900) # Cache harga selama 15 menit
-def get_latest_price(ticker):
-    """Mengambil harga penutupan terakhir untuk satu saham."""
-    df = load_data(ticker, 'daily')
-    if not df.empty:
-        return df['Close'].iloc[-1]
-    return 0
-
 # --- JUDUL APLIKASI ---
 st.title("💼 Portofolio Saya & Asisten AI")
 st.write("Catat posisi trading Anda dan dapatkan rekomendasi aksi personal dari Super AI.")
 
 # --- BAGIAN 1: FORMULIR UNTUK MENAMBAH POSISI BARU (TANPA TANGGAL) ---
 st.header("Tambah Posisi Baru", divider='rainbow')
-# Tombol untuk membersihkan cache
-if st.sidebar.button("🔄 Refresh Data Cache", use_container_width=True, key='refresh_portfolio'):
-    st.cache_data.clear()
-    st.cache_resource.clear()
-    st.success("Cache berhasil dibersihkan! Data akan dimuat ulang.")
-    st.rerun()
 
 with st.form("add_position_form", clear_on_submit=True):
     col1, col2, col3 = st.columns(3)
@@ -54,11 +40,11 @@ with st.form("add_position_form", clear_on_submit=True):
                 lots=lots_input
             )
             st.success(f"Posisi {ticker_input.upper()} berhasil ditambahkan!")
-            st.cache_data.clear() # Hapus cache agar data portofolio di-load ulang
             st.rerun()
         else:
             st.warning("Harap isi semua kolom dengan benar.")
-            # --- BAGIAN 2: MENAMPILKAN SEMUA POSISI AKTIF ---
+
+# --- BAGIAN 2: MENAMPILKAN SEMUA POSISI AKTIF ---
 st.write("---")
 st.header("Posisi Aktif Saya", divider='rainbow')
 
@@ -67,6 +53,37 @@ all_my_positions = get_all_positions()
 if all_my_positions.empty:
     st.info("Anda belum memiliki posisi aktif. Silakan tambahkan posisi baru menggunakan formulir di atas.")
 else:
+    # Harga terakhir seluruh saham dalam satu query, P/L seluruh posisi dihitung sekaligus
+    all_my_positions = hitung_profit_loss(all_my_positions, get_latest_prices(all_my_positions['ticker']))
+
+    total_beli = all_my_positions['nilai_beli'].sum()
+    total_pl = all_my_positions['profit_loss'].sum()
+    sum_col1, sum_col2, sum_col3, sum_col4 = st.columns([2, 2, 2, 1.5])
+    sum_col1.metric("Total Nilai Beli", f"Rp {total_beli:,.0f}")
+    sum_col2.metric("Total Nilai Saat Ini", f"Rp {all_my_positions['nilai_kini'].sum():,.0f}")
+    sum_col3.metric("Total Profit/Loss", f"Rp {total_pl:,.0f}", delta=f"{(total_pl / total_beli * 100) if total_beli > 0 else 0:.2f}%")
+    with sum_col4:
+        if st.button("Analisis AI Seluruh Portofolio", use_container_width=True, type="primary"):
+            st.session_state['show_analysis_portofolio'] = not st.session_state.get('show_analysis_portofolio', False)
+
+    # Rekomendasi seluruh posisi dalam satu lintasan (model & fitur per saham hanya diproses sekali)
+    semua_rekomendasi = {}
+    if st.session_state.get('show_analysis_portofolio', False):
+        with st.spinner(f"AI sedang menganalisis {all_my_positions['ticker'].nunique()} saham di portofolio Anda..."):
+            semua_rekomendasi = get_recommendations_for_portfolio(all_my_positions)
+        ringkasan = all_my_positions[['ticker', 'lots', 'buy_price', 'harga_terakhir', 'profit_loss_pct']].assign(
+            rekomendasi=[semua_rekomendasi[pid].get('rekomendasi_aksi') or semua_rekomendasi[pid]['error'] for pid in all_my_positions['id']],
+            stop_loss=[semua_rekomendasi[pid].get('stop_loss_price') for pid in all_my_positions['id']],
+            take_profit=[semua_rekomendasi[pid].get('take_profit_price') for pid in all_my_positions['id']]
+        )
+        st.dataframe(ringkasan, use_container_width=True, hide_index=True, column_config={
+            "buy_price": st.column_config.NumberColumn("Harga Beli", format="Rp %d"),
+            "harga_terakhir": st.column_config.NumberColumn("Harga Terakhir", format="Rp %d"),
+            "profit_loss_pct": st.column_config.NumberColumn("P/L", format="%.2f%%"),
+            "stop_loss": st.column_config.NumberColumn("Stop Loss AI", format="Rp %d"),
+            "take_profit": st.column_config.NumberColumn("Take Profit AI", format="Rp %d"),
+        })
+
     for index, position in all_my_positions.iterrows():
         with st.container(border=True):
             col1, col2, col3, col4 = st.columns([2, 2, 2, 1.5])
@@ -76,11 +93,10 @@ else:
                 st.write(f"Harga Beli Rata-rata:")
                 st.subheader(f"Rp {position['buy_price']:,.0f}")
 
-            latest_price = get_latest_price(position['ticker'])
-            buy_value = position['buy_price'] * position['lots'] * 100
-            current_value = latest_price * position['lots'] * 100 if latest_price > 0 else 0
-            profit_loss = current_value - buy_value
-            profit_loss_pct = (profit_loss / buy_value) * 100 if buy_value > 0 else 0
+            latest_price = position['harga_terakhir']
+            buy_value = position['nilai_beli']
+            profit_loss = position['profit_loss']
+            profit_loss_pct = position['profit_loss_pct']
 
             with col2:
                 st.metric("Nilai Beli", f"Rp {buy_value:,.0f}")
@@ -95,9 +111,6 @@ else:
                 )
             
             with col4:
-                if st.button("Dapatkan Analisis AI", key=f"analyze_{position['id']}", use_container_width=True, type="primary"):
-                    st.session_state[f"show_analysis_{position['id']}"] = not st.session_state.get(f"show_analysis_{position['id']}", False)
-                
                 action_cols = st.columns(2)
                 with action_cols[0]:
                     if st.button("✏️", key=f"edit_{position['id']}", use_container_width=True, help="Edit Posisi"):
@@ -105,14 +118,11 @@ else:
                 with action_cols[1]:
                     if st.button("🗑️", key=f"delete_{position['id']}", use_container_width=True, help="Hapus Posisi"):
                         delete_position(position['id'])
-                        st.cache_data.clear()
                         st.rerun()
 
             # --- BAGIAN 3: MENAMPILKAN HASIL ANALISIS & FORM EDIT ---
-            if st.session_state.get(f"show_analysis_{position['id']}", False):
-                with st.spinner(f"AI sedang menganalisis posisi {position['ticker']}..."):
-                    rekomendasi = get_recommendation_for_position(position)
-                
+            rekomendasi = semua_rekomendasi.get(position['id'])
+            if rekomendasi:
                 if rekomendasi.get("error"):
                     st.error(f"Gagal mendapatkan rekomendasi: {rekomendasi['error']}")
                 else:
@@ -148,7 +158,6 @@ else:
                                 position_id=position['id'], ticker=new_ticker, buy_price=new_buy_price, lots=new_lots
                             )
                             st.session_state[f"edit_mode_{position['id']}"] = False
-                            st.cache_data.clear()
                             st.rerun()
                     with cancel_button:
                         if st.form_submit_button("Batal", use_container_width=True):
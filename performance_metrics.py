@@ -0,0 +1,156 @@
+import pandas as pd
+import numpy as np
+
+# --- KONFIGURASI ---
+HARI_BURSA_PER_TAHUN = 252
+MAKS_ELEMEN_BOOTSTRAP = 4_000_000   # Batas ukuran tensor resampling per potongan baris (~32 MB per array)
+
+# --- METRIK KINERJA TERVEKTORISASI ---
+# Semua fungsi menerima matriks (baris = saham/varian, kolom = hari). Baris dengan
+# panjang berbeda diisi NaN di bagian akhir (ekuitas) atau 0 (posisi).
+
+def _bagi(pembilang, penyebut):
+    """Pembagian aman: hasil NaN jika penyebut 0 atau NaN."""
+    pembilang = np.asarray(pembilang, dtype=float)
+    penyebut = np.asarray(penyebut, dtype=float)
+    hasil = np.full(np.broadcast(pembilang, penyebut).shape, np.nan)
+    np.divide(pembilang, penyebut, out=hasil, where=(penyebut != 0) & ~np.isnan(penyebut))
+    return hasil
+
+def susun_kurva(daftar_ekuitas, daftar_posisi):
+    """Menyusun kurva beberapa saham (panjang berbeda) menjadi matriks: ekuitas diisi NaN, posisi 0 di bagian akhir."""
+    n_hari = max(len(e) for e in daftar_ekuitas)
+    ekuitas = np.full((len(daftar_ekuitas), n_hari), np.nan)
+    posisi = np.zeros((len(daftar_ekuitas), n_hari), dtype=np.int8)
+    for i, (e, p) in enumerate(zip(daftar_ekuitas, daftar_posisi)):
+        ekuitas[i, :len(e)] = e
+        posisi[i, :len(p)] = p
+    return ekuitas, posisi
+
+def return_harian(ekuitas):
+    """Return harian dari kurva ekuitas; kolom pertama NaN."""
+    ekuitas = np.atleast_2d(np.asarray(ekuitas, dtype=float))
+    r = np.full(ekuitas.shape, np.nan)
+    r[:, 1:] = ekuitas[:, 1:] / ekuitas[:, :-1] - 1
+    return r
+
+def statistik_trade(ekuitas, posisi):
+    """
+    Jumlah trade dan win rate per baris. Trade dibuka saat posisi 0 -> 1 dan ditutup
+    saat 1 -> 0 (trade yang masih terbuka ditutup pada hari valid terakhir).
+    Return trade = ekuitas saat keluar / ekuitas saat masuk - 1.
+    """
+    n_baris, n_hari = ekuitas.shape
+    sebelumnya = np.zeros_like(posisi)
+    sebelumnya[:, 1:] = posisi[:, :-1]
+    baris_masuk, hari_masuk = np.nonzero((posisi == 1) & (sebelumnya == 0))
+    baris_keluar, hari_keluar = np.nonzero((posisi == 0) & (sebelumnya == 1))
+
+    # Abaikan "penutupan" semu di area padding, lalu tutup trade yang masih
+    # terbuka pada hari valid terakhir masing-masing baris
+    hari_terakhir = (~np.isnan(ekuitas)).sum(axis=1) - 1
+    dalam_data = hari_keluar <= hari_terakhir[baris_keluar]
+    baris_keluar, hari_keluar = baris_keluar[dalam_data], hari_keluar[dalam_data]
+    terbuka = np.flatnonzero(posisi[np.arange(n_baris), hari_terakhir] == 1)
+    baris_keluar = np.concatenate((baris_keluar, terbuka))
+    hari_keluar = np.concatenate((hari_keluar, hari_terakhir[terbuka]))
+    urutan = np.lexsort((hari_keluar, baris_keluar))
+    hari_keluar = hari_keluar[urutan]
+
+    ret = ekuitas[baris_masuk, hari_keluar] / ekuitas[baris_masuk, hari_masuk] - 1
+    jumlah = np.bincount(baris_masuk, minlength=n_baris)
+    menang = np.bincount(baris_masuk, weights=(ret > 0).astype(float), minlength=n_baris)
+    return jumlah, _bagi(menang, jumlah)
+
+def durasi_drawdown_maksimum(ekuitas):
+    """Jumlah hari bursa terpanjang berturut-turut di bawah puncak sebelumnya."""
+    puncak = np.fmax.accumulate(ekuitas, axis=1)
+    di_bawah = ekuitas < puncak
+    hari = np.arange(ekuitas.shape[1])
+    reset_terakhir = np.maximum.accumulate(np.where(di_bawah, 0, hari[None, :]), axis=1)
+    return np.where(di_bawah, hari[None, :] - reset_terakhir, 0).max(axis=1)
+
+def hitung_metrik(ekuitas, posisi, risk_free_tahunan=0.0):
+    """
+    Menghitung metrik kinerja untuk banyak kurva ekuitas sekaligus dalam satu pass:
+    CAGR, volatilitas tahunan, Sharpe, Sortino, max drawdown & durasinya,
+    win rate, exposure, turnover dan jumlah trade.
+    """
+    ekuitas = np.atleast_2d(np.asarray(ekuitas, dtype=float))
+    posisi = np.atleast_2d(np.asarray(posisi)).astype(np.int8)
+    valid = ~np.isnan(ekuitas)
+    n_valid = valid.sum(axis=1)
+    idx_akhir = np.clip(n_valid - 1, 0, None)
+    awal = ekuitas[:, 0]
+    akhir = ekuitas[np.arange(len(ekuitas)), idx_akhir]
+    tahun = _bagi(n_valid - 1, HARI_BURSA_PER_TAHUN)
+
+    r = return_harian(ekuitas)
+    r_lebih = r - risk_free_tahunan / HARI_BURSA_PER_TAHUN
+    rata_rata = np.nanmean(r_lebih, axis=1)
+    std = np.nanstd(r, axis=1, ddof=1)
+    downside = np.sqrt(np.nanmean(np.minimum(r_lebih, 0) ** 2, axis=1))
+
+    puncak = np.fmax.accumulate(ekuitas, axis=1)
+    max_drawdown = np.nanmin(ekuitas / puncak - 1, axis=1)
+
+    jumlah_trade, win_rate = statistik_trade(ekuitas, posisi)
+    # Perubahan ke area padding (posisi terbuka -> 0) bukan transaksi
+    perubahan_posisi = (np.abs(np.diff(posisi, axis=1)) * valid[:, 1:]).sum(axis=1)
+
+    return pd.DataFrame({
+        'cagr_pct': (np.power(_bagi(akhir, awal), _bagi(1, tahun)) - 1) * 100,
+        'volatility_pct': std * np.sqrt(HARI_BURSA_PER_TAHUN) * 100,
+        'sharpe': _bagi(rata_rata, std) * np.sqrt(HARI_BURSA_PER_TAHUN),
+        'sortino': _bagi(rata_rata, downside) * np.sqrt(HARI_BURSA_PER_TAHUN),
+        'max_drawdown_pct': max_drawdown * 100,
+        'max_dd_duration_days': durasi_drawdown_maksimum(ekuitas),
+        'win_rate_pct': win_rate * 100,
+        'exposure_pct': _bagi((posisi * valid).sum(axis=1), n_valid) * 100,
+        'turnover': _bagi(perubahan_posisi, tahun),
+        'trade_count': jumlah_trade
+    })
+
+def bootstrap_sharpe_ci(ekuitas, n_sampel=500, tingkat_kepercayaan=0.95, seed=42, maks_elemen=MAKS_ELEMEN_BOOTSTRAP):
+    """
+    Interval kepercayaan Sharpe ratio lewat bootstrap return harian, untuk banyak baris
+    sekaligus: indeks resampling satu potongan baris ditarik sebagai satu tensor
+    (baris, n_sampel, hari), bagian baris yang lebih pendek di-mask. Indeks berasal dari
+    satu matriks uniform bersama, sehingga hasil tiap baris hanya bergantung pada datanya
+    sendiri (bukan pada baris lain dalam batch atau ukuran potongan). Baris dengan < 2 return
+    atau return konstan (kurva datar, varians nol) bernilai NaN tanpa peringatan.
+    Mengembalikan array (n_baris, 2) berisi batas bawah dan atas.
+    """
+    ekuitas = np.atleast_2d(np.asarray(ekuitas, dtype=float))
+    alpha = (1 - tingkat_kepercayaan) / 2
+    hasil = np.full((len(ekuitas), 2), np.nan)
+
+    # Return valid tiap baris dipadatkan ke kiri (NaN di tengah kurva dilewati)
+    r = return_harian(ekuitas)[:, 1:]
+    valid = ~np.isnan(r)
+    r = np.take_along_axis(r, np.argsort(~valid, axis=1, kind='stable'), axis=1)
+    n = valid.sum(axis=1)
+    mask = np.arange(r.shape[1]) < n[:, None]
+    varians_ada = np.where(mask, r, -np.inf).max(axis=1, initial=-np.inf) > np.where(mask, r, np.inf).min(axis=1, initial=np.inf)
+    baris = np.flatnonzero((n >= 2) & varians_ada)
+    if len(baris) == 0:
+        return hasil
+
+    # Ditarik (hari, n_sampel) lalu ditranspos: elemen [s, j] tidak bergantung pada panjang maksimum
+    panjang = n[baris].max()
+    uniform = np.random.default_rng(seed).random((panjang, n_sampel)).T
+    per_potongan = max(1, maks_elemen // (n_sampel * panjang))
+    for mulai in range(0, len(baris), per_potongan):
+        potongan = baris[mulai:mulai + per_potongan]
+        n_baris = n[potongan]
+        m = mask[potongan, :panjang][:, None, :]
+        indeks = (uniform[None, :, :] * n_baris[:, None, None]).astype(np.intp)
+        sampel = np.where(m, np.take_along_axis(r[potongan, :panjang][:, None, :], indeks, axis=2), 0.0)
+        rata_rata = sampel.sum(axis=2) / n_baris[:, None]
+        std = np.sqrt((np.where(m, sampel - rata_rata[..., None], 0.0) ** 2).sum(axis=2) / (n_baris[:, None] - 1))
+        sharpe = _bagi(rata_rata, std) * np.sqrt(HARI_BURSA_PER_TAHUN)
+
+        # Sampel yang kebetulan konstan (std 0) bernilai NaN; baris tanpa satu pun sampel valid tetap NaN
+        ada = ~np.isnan(sharpe).all(axis=1)
+        hasil[potongan[ada]] = np.nanquantile(sharpe[ada], [alpha, 1 - alpha], axis=1).T
+    return hasil
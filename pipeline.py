@@ -0,0 +1,276 @@
+import pandas as pd
+from sqlalchemy import create_engine, text as sqlalchemy_text
+import subprocess
+import sys
+import os
+import json
+import time
+import argparse
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from data_versions import load_versions, SEMUA
+from features import load_price_tail
+from instrumentation import mulai_run, selesai_run
+
+# --- KONFIGURASI ---
+# DAG tahap pipeline. Setiap tahap mencatat "tanda tangan input" per ticker yang terakhir
+# berhasil diproses (tabel pipeline_state). Ticker hanya diproses ulang jika tanda tangannya
+# berubah: versi artifact input naik (data_versions), periode jadwal berganti, atau (untuk
+# pelatihan) distribusi data bergeser. Tahap yang tidak saling bergantung berjalan bersamaan.
+#   input  : artifact data_versions yang dibaca tahap ini
+#   hasil  : artifact yang ditulis tahap ini (dipakai untuk memperkirakan rambatan di rencana)
+#   jadwal : format strftime periode; berganti periode = semua ticker diproses ulang
+#   opsional: hanya dijalankan jika diminta lewat --tahap / --paksa (optimasi: berjam-jam per saham)
+TAHAP = {
+    'data':      {'script': 'get_data.py',          'hulu': [],                    'input': [],
+                  'hasil': 'prices',    'jadwal': '%Y-%m-%d'},
+    'sentiment': {'script': 'news_scraper.py',      'hulu': [],                    'input': [],
+                  'hasil': 'sentiment', 'jadwal': '%Y-%m-%d'},
+    'optimize':  {'script': 'optimizer.py',         'hulu': ['data'],              'input': [],
+                  'hasil': 'params',    'jadwal': None, 'opsional': True},  # Sekali per ticker (optimizer melewati yang sudah ada)
+    'train':     {'script': 'trainer.py',           'hulu': ['data', 'optimize'],  'input': ['params'],
+                  'hasil': 'model',     'jadwal': '%Y-%m', 'drift': True},
+    'backtest':  {'script': 'ai_backtester.py',     'hulu': ['train'],             'input': ['model', 'params'],
+                  'hasil': None,        'jadwal': None, 'argumen': ['--perbarui']},
+    'screen':    {'script': 'screener_snapshot.py', 'hulu': ['train', 'sentiment'], 'input': ['prices', 'sentiment', 'model', 'params'],
+                  'hasil': None,        'jadwal': None},
+}
+STATE_TABLE = "pipeline_state"
+LOG_DIR = os.path.join('logs', 'pipeline')
+MAKS_TAHAP_PARALEL = 2
+JENDELA_VOLATILITAS = 20   # Hari untuk mengukur volatilitas harian (deteksi drift)
+BATAS_DRIFT = 0.5          # Latih ulang jika volatilitas bergeser > 50% dari saat model dilatih
+
+# --- STATUS PER TICKER ---
+def create_state_table(engine):
+    """Membuat tabel status pipeline jika belum ada."""
+    with engine.connect() as conn:
+        conn.execute(sqlalchemy_text(f"""
+        CREATE TABLE IF NOT EXISTS {STATE_TABLE} (
+            stage VARCHAR(20) NOT NULL,
+            ticker VARCHAR(20) NOT NULL,
+            signature TEXT NOT NULL,
+            info TEXT,
+            updated_at TIMESTAMP,
+            PRIMARY KEY (stage, ticker)
+        );
+        """))
+        conn.commit()
+
+def load_state(engine):
+    """dict (stage, ticker) -> (signature, info dict)."""
+    create_state_table(engine)
+    with engine.connect() as conn:
+        baris = conn.execute(sqlalchemy_text(f"SELECT stage, ticker, signature, info FROM {STATE_TABLE}")).fetchall()
+    return {(stage, ticker): (signature, json.loads(info) if info else {}) for stage, ticker, signature, info in baris}
+
+def simpan_state(engine, stage, signatures, info=None):
+    """Mencatat tanda tangan input yang sudah berhasil diproses untuk setiap ticker."""
+    info = info or {}
+    sekarang = datetime.now().isoformat()
+    with engine.begin() as conn:
+        conn.execute(sqlalchemy_text(f"""
+        INSERT INTO {STATE_TABLE} (stage, ticker, signature, info, updated_at) VALUES (:stage, :ticker, :signature, :info, :sekarang)
+        ON CONFLICT(stage, ticker) DO UPDATE SET signature = excluded.signature, info = excluded.info, updated_at = excluded.updated_at
+        """), [{"stage": stage, "ticker": ticker, "signature": signature, "sekarang": sekarang,
+                "info": json.dumps(info[ticker]) if ticker in info else None} for ticker, signature in signatures.items()])
+
+def volatilitas(ticker, engine):
+    """Standar deviasi return harian JENDELA_VOLATILITAS hari terakhir (None jika data kurang)."""
+    df = load_price_tail(ticker, engine, JENDELA_VOLATILITAS + 1, 'daily')
+    if len(df) <= JENDELA_VOLATILITAS // 2:
+        return None
+    return float(df['Close'].pct_change().std())
+
+def tanda_tangan(stage, ticker, versi, sekarang):
+    """Tanda tangan input satu ticker: versi artifact input (ticker & global) + periode jadwal."""
+    konfigurasi = TAHAP[stage]
+    bagian = [[versi.get((a, ticker), 0), versi.get((a, SEMUA), 0)] for a in konfigurasi['input']]
+    if konfigurasi['jadwal']:
+        bagian.append(sekarang.strftime(konfigurasi['jadwal']))
+    return json.dumps(bagian)
+
+def ticker_kotor(stage, tickers, engine, state, sekarang, hulu_kotor=None):
+    """
+    Ticker yang harus diproses 'stage' beserta alasannya: dict ticker -> alasan
+    ('baru', 'input', 'jadwal', 'drift', 'hulu'). 'hulu_kotor' (khusus rencana) adalah
+    ticker yang AKAN diubah tahap hulu; saat eksekusi versi sebenarnya dibaca ulang.
+    """
+    df_versi = load_versions(engine)
+    versi = {(a, t): v for a, t, v in zip(df_versi['artifact'], df_versi['ticker'], df_versi['version'])}
+    konfigurasi = TAHAP[stage]
+    kotor = {}
+    for ticker in tickers:
+        tersimpan = state.get((stage, ticker))
+        signature = tanda_tangan(stage, ticker, versi, sekarang)
+        if tersimpan is None:
+            kotor[ticker] = 'baru'
+        elif tersimpan[0] != signature:
+            lama, baru = json.loads(tersimpan[0]), json.loads(signature)
+            kotor[ticker] = 'jadwal' if konfigurasi['jadwal'] and lama[:-1] == baru[:-1] else 'input'
+        elif hulu_kotor and ticker in hulu_kotor:
+            kotor[ticker] = 'hulu'
+        elif konfigurasi.get('drift') and tersimpan[1].get('volatilitas'):
+            vol = volatilitas(ticker, engine)
+            if vol is not None and abs(vol / tersimpan[1]['volatilitas'] - 1) > BATAS_DRIFT:
+                kotor[ticker] = 'drift'
+    return kotor, {ticker: tanda_tangan(stage, ticker, versi, sekarang) for ticker in kotor}
+
+def urutan_topologis(tahap_dipilih=None, paksa=()):
+    """
+    Nama tahap aktif dalam urutan yang memenuhi semua ketergantungan. Tanpa 'tahap_dipilih'
+    semua tahap non-opsional aktif; tahap di 'paksa' selalu aktif.
+    """
+    urutan, sisa = [], dict(TAHAP)
+    while sisa:
+        siap = [stage for stage, k in sisa.items() if all(h not in sisa for h in k['hulu'])]
+        if not siap:
+            raise ValueError(f"Siklus pada DAG pipeline: {sorted(sisa)}")
+        for stage in siap:
+            urutan.append(stage)
+            del sisa[stage]
+    return [stage for stage in urutan
+            if stage in paksa or (stage in tahap_dipilih if tahap_dipilih else not TAHAP[stage].get('opsional'))]
+
+# --- RENCANA ---
+def susun_rencana(tickers, engine, tahap_dipilih=None, paksa=(), sekarang=None):
+    """
+    Rencana eksekusi: untuk setiap tahap (urutan topologis), ticker yang akan diproses beserta
+    alasannya. Ticker yang dijadwalkan tahap hulu penghasil input dianggap ikut berubah
+    (perkiraan atas; saat eksekusi hanya yang versinya benar-benar naik yang merambat).
+    """
+    sekarang = sekarang or datetime.now()
+    state = load_state(engine)
+    rencana, akan_berubah = {}, {}
+    for stage in urutan_topologis(tahap_dipilih, paksa):
+        konfigurasi = TAHAP[stage]
+        hulu_kotor = set()
+        for hulu in rencana:
+            if TAHAP[hulu]['hasil'] in konfigurasi['input']:
+                hulu_kotor |= akan_berubah.get(hulu, set())
+        kotor, _ = ticker_kotor(stage, tickers, engine, {} if stage in paksa else state, sekarang, hulu_kotor)
+        rencana[stage] = kotor
+        akan_berubah[stage] = set(kotor)
+    return rencana
+
+def ringkas_rencana(rencana):
+    """Rencana sebagai DataFrame: satu baris per tahap (jumlah ticker & rincian alasan)."""
+    baris = []
+    for stage, kotor in rencana.items():
+        alasan = pd.Series(list(kotor.values()), dtype=object).value_counts()
+        baris.append({'tahap': stage, 'script': TAHAP[stage]['script'], 'ticker': len(kotor),
+                      'alasan': ', '.join(f"{nama} {jumlah}" for nama, jumlah in alasan.items()) or '-',
+                      'hulu': ', '.join(TAHAP[stage]['hulu']) or 'sumber'})
+    return pd.DataFrame(baris, columns=['tahap', 'script', 'ticker', 'alasan', 'hulu'])
+
+def cetak_rencana(rencana, total):
+    """Mencetak rencana sebagai tabel ringkas."""
+    print("="*54)
+    print(f"--- RENCANA PIPELINE ({total} saham) ---")
+    print(ringkas_rencana(rencana).to_string(index=False))
+    print("="*54)
+
+# --- EKSEKUSI ---
+def jalankan_tahap(stage, tickers):
+    """Menjalankan script tahap untuk 'tickers' sebagai proses anak; output ke logs/pipeline/<tahap>.log."""
+    konfigurasi = TAHAP[stage]
+    os.makedirs(LOG_DIR, exist_ok=True)
+    command = [sys.executable, konfigurasi['script']] + konfigurasi.get('argumen', []) + ['--tickers'] + sorted(tickers)
+    env = {**os.environ, 'PYTHONUNBUFFERED': '1', 'PYTHONIOENCODING': 'utf-8'}
+    start_time = time.time()
+    with open(os.path.join(LOG_DIR, f"{stage}.log"), 'w', encoding='utf-8') as log:
+        returncode = subprocess.run(command, stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL, env=env).returncode
+    return returncode, time.time() - start_time
+
+def catat_selesai(stage, signatures, engine):
+    """Menyimpan status ticker yang berhasil diproses (tahap ber-drift juga mencatat volatilitas saat ini)."""
+    info = {}
+    if TAHAP[stage].get('drift'):
+        info = {ticker: {'volatilitas': volatilitas(ticker, engine)} for ticker in signatures}
+    simpan_state(engine, stage, signatures, info)
+
+def jalankan_pipeline(tickers, engine, tahap_dipilih=None, paralel=MAKS_TAHAP_PARALEL, paksa=()):
+    """
+    Menjalankan DAG: tahap dimulai begitu semua hulunya selesai (tahap independen berjalan
+    bersamaan). Ticker kotor setiap tahap dihitung TEPAT sebelum tahap dimulai, sehingga
+    hanya ticker yang versinya benar-benar naik di hulu yang ikut diproses.
+    Mengembalikan dict tahap -> {'status', 'ticker', 'detik'}.
+    """
+    urutan = urutan_topologis(tahap_dipilih, paksa)
+    hasil = {}
+    berjalan = {} # future -> (tahap, tanda tangan ticker yang sedang diproses)
+    with ThreadPoolExecutor(max_workers=paralel) as executor:
+        while len(hasil) < len(urutan):
+            for stage in urutan:
+                if stage in hasil or any(stage == s for s, _ in berjalan.values()):
+                    continue
+                hulu = [h for h in TAHAP[stage]['hulu'] if h in urutan]
+                if any(h not in hasil for h in hulu):
+                    continue
+                if any(hasil[h]['status'] in ('gagal', 'hulu gagal') for h in hulu):
+                    hasil[stage] = {'status': 'hulu gagal', 'ticker': 0, 'detik': 0.0}
+                    print(f"[{stage}] dilewati: tahap hulu gagal.")
+                    continue
+                # Status kosong = semua ticker dianggap baru (mode --paksa)
+                state = {} if stage in paksa else load_state(engine)
+                _, signatures = ticker_kotor(stage, tickers, engine, state, datetime.now())
+                if not signatures:
+                    hasil[stage] = {'status': 'dilewati', 'ticker': 0, 'detik': 0.0}
+                    print(f"[{stage}] tidak ada ticker yang berubah.")
+                    continue
+                print(f"[{stage}] mulai: {TAHAP[stage]['script']} untuk {len(signatures)} saham...")
+                berjalan[executor.submit(jalankan_tahap, stage, list(signatures))] = (stage, signatures)
+            if not berjalan:
+                continue
+            selesai, _ = wait(list(berjalan), return_when=FIRST_COMPLETED)
+            for future in selesai:
+                stage, signatures = berjalan.pop(future)
+                returncode, detik = future.result()
+                if returncode == 0:
+                    catat_selesai(stage, signatures, engine)
+                hasil[stage] = {'status': 'berhasil' if returncode == 0 else 'gagal', 'ticker': len(signatures), 'detik': detik}
+                print(f"[{stage}] {hasil[stage]['status']} ({len(signatures)} saham, {detik / 60:.2f} menit, log: {LOG_DIR}/{stage}.log)")
+    return hasil
+
+# --- BAGIAN EKSEKUSI UTAMA ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Orkestrator pipeline inkremental: data -> sentimen -> optimasi -> latih -> backtest -> screener.")
+    parser.add_argument("perintah", choices=['plan', 'run'], help="plan: tampilkan rencana saja; run: tampilkan rencana lalu jalankan.")
+    parser.add_argument("--tickers", nargs='+', help="(Opsional) Universe ticker. Default: 'semua_saham_bei.csv'.")
+    parser.add_argument("--tahap", nargs='+', choices=list(TAHAP), help="(Opsional) Hanya tahap tertentu (default: semua kecuali optimize).")
+    parser.add_argument("--paksa", nargs='+', choices=list(TAHAP), default=[], help="(Opsional) Proses ulang seluruh universe untuk tahap ini.")
+    parser.add_argument("--paralel", type=int, default=MAKS_TAHAP_PARALEL, help="Jumlah tahap yang boleh berjalan bersamaan.")
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite:///data_saham.db")
+    if args.tickers:
+        tickers = [ticker.upper() for ticker in args.tickers]
+    else:
+        try:
+            tickers = pd.read_csv('semua_saham_bei.csv')['ticker'].tolist()
+        except FileNotFoundError:
+            from trainer import get_available_stocks
+            tickers = get_available_stocks(engine)
+
+    rencana = susun_rencana(tickers, engine, args.tahap, args.paksa)
+    cetak_rencana(rencana, len(tickers))
+    if args.perintah == 'plan':
+        sys.exit(0)
+
+    start_time = time.time()
+    mulai_run('pipeline') # Run script tiap tahap mencatat run ini sebagai induknya (logs/metrics)
+    hasil = jalankan_pipeline(tickers, engine, args.tahap, args.paralel, args.paksa)
+
+    print("\n" + "="*54)
+    print("--- PIPELINE SELESAI ---")
+    print(f"Laporan Akhir:")
+    print(f"Total waktu            : {(time.time() - start_time) / 60:.2f} menit")
+    for stage, h in hasil.items():
+        print(f"{stage:<22} : {h['status']:<9} {h['ticker']:>5} saham {h['detik'] / 60:>7.2f} menit")
+    selesai_run('gagal' if any(h['status'] == 'gagal' for h in hasil.values()) else 'ok', tahap_pipeline=hasil)
+    print("="*54)
+
+    os.makedirs('logs', exist_ok=True)
+    with open('logs/pipeline_last_run.log', 'w') as f:
+        f.write(datetime.now().isoformat())
+    sys.exit(1 if any(h['status'] == 'gagal' for h in hasil.values()) else 0)
@@ -0,0 +1,269 @@
+import pandas as pd
+import numpy as np
+from sqlalchemy import create_engine
+import argparse
+import os
+import time
+import json
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from features import load_price_data, DEFAULT_PARAMS, aktifkan_pandas_ta
+from ai_backtester import get_available_models, load_optimal_params
+from prediction_store import get_predictions
+from instrumentation import span, mulai_run, selesai_run, cetak_ringkasan
+
+# --- KONFIGURASI ---
+PANEL_DIR = os.path.join('cache', 'panel')
+FEE_BELI = 0.0015  # Biaya beli (komisi broker + levy)
+FEE_JUAL = 0.0025  # Biaya jual (komisi broker + levy + PPh final 0.1%)
+LEMBAR_PER_LOT = 100
+
+# --- FUNGSI-FUNGSI BANTU ---
+def skor_screener(df, rsi_length):
+    """
+    Skor peringkat harian persis seperti run_screener: ADX ditambahkan jika tren naik
+    kuat (ADX > 25 dan DMP > DMN), RSI ditambahkan jika RSI > 50.
+    """
+    aktifkan_pandas_ta()
+    adx = df.ta.adx(length=14).fillna(0)
+    rsi = df.ta.rsi(length=rsi_length).fillna(0)
+    skor_adx = np.where((adx['ADX_14'] > 25) & (adx['DMP_14'] > adx['DMN_14']), adx['ADX_14'], 0)
+    skor_rsi = np.where(rsi > 50, rsi, 0)
+    return skor_adx + skor_rsi
+
+# --- TAHAP 1: MEMBANGUN MATRIKS PANEL (TANGGAL x TICKER) ---
+_worker_engine = None
+_worker_params = None
+
+def _init_worker(db_file_path, all_optimal_params):
+    """Inisialisasi setiap proses worker: satu engine database per proses."""
+    global _worker_engine, _worker_params
+    _worker_engine = create_engine(db_file_path)
+    _worker_params = all_optimal_params
+
+def _kolom_ticker(ticker):
+    """Menghitung kolom panel satu ticker: tanggal, harga penutupan, sinyal AI dan skor peringkat."""
+    try:
+        df = load_price_data(ticker, _worker_engine, 'daily')
+        prediksi = get_predictions(ticker, _worker_engine, _worker_params, n_jobs=1)
+        if df.empty or prediksi is None:
+            return ticker, None
+        params = _worker_params.get(ticker, DEFAULT_PARAMS)
+        sinyal = prediksi['Sinyal'].reindex(df.index).fillna(0).to_numpy(dtype=np.int8)
+        with span('feature_build', ticker):
+            skor = skor_screener(df, params.get('rsi_length', 14))
+        return ticker, (df.index.to_numpy(), df['Close'].to_numpy(dtype=float), sinyal, skor.astype(np.float32))
+    except Exception as e:
+        print(f"\n-> [{ticker}] GAGAL membangun panel: {e}")
+        return ticker, None
+
+def bangun_panel(tickers, db_file_path, all_optimal_params, mulai=None, sampai=None, workers=None):
+    """
+    Membangun matriks panel tanggal x ticker sebagai file memmap di 'cache/panel/'.
+    Hanya satu kolom ticker yang berada di memori pada satu waktu, sehingga
+    pemakaian memori tidak tumbuh dengan ukuran universe.
+    """
+    engine = create_engine(db_file_path)
+    semua_tanggal = set()
+    for ticker in tickers:
+        try:
+            with span('db_load', ticker):
+                semua_tanggal.update(pd.read_sql(f"SELECT Date FROM '{ticker}'", engine, parse_dates=['Date'])['Date'])
+        except Exception:
+            continue
+    tanggal = pd.DatetimeIndex(sorted(semua_tanggal))
+    if mulai: tanggal = tanggal[tanggal >= pd.Timestamp(mulai)]
+    if sampai: tanggal = tanggal[tanggal <= pd.Timestamp(sampai)]
+
+    os.makedirs(PANEL_DIR, exist_ok=True)
+    bentuk = (len(tanggal), len(tickers))
+    close = np.lib.format.open_memmap(os.path.join(PANEL_DIR, 'close.npy'), mode='w+', dtype=np.float64, shape=bentuk)
+    sinyal = np.lib.format.open_memmap(os.path.join(PANEL_DIR, 'sinyal.npy'), mode='w+', dtype=np.int8, shape=bentuk)
+    skor = np.lib.format.open_memmap(os.path.join(PANEL_DIR, 'skor.npy'), mode='w+', dtype=np.float32, shape=bentuk)
+    close[:] = np.nan; sinyal[:] = 0; skor[:] = 0
+
+    kolom_ke = {ticker: j for j, ticker in enumerate(tickers)}
+    tanggal_np = tanggal.to_numpy()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(db_file_path, all_optimal_params)) as executor:
+        for i, (ticker, kolom) in enumerate(executor.map(_kolom_ticker, tickers, chunksize=4)):
+            print(f"Membangun panel: ({i+1}/{len(tickers)}) {ticker:<10}", end='\r')
+            if kolom is None:
+                continue
+            tgl, c, s, k = kolom
+            posisi = np.searchsorted(tanggal_np, tgl)
+            cocok = (posisi < len(tanggal_np)) & (tanggal_np[np.clip(posisi, 0, len(tanggal_np) - 1)] == tgl)
+            j = kolom_ke[ticker]
+            close[posisi[cocok], j] = c[cocok]
+            sinyal[posisi[cocok], j] = s[cocok]
+            skor[posisi[cocok], j] = k[cocok]
+
+    for matriks in (close, sinyal, skor):
+        matriks.flush()
+    pd.Series(tanggal).to_frame('Date').to_csv(os.path.join(PANEL_DIR, 'tanggal.csv'), index=False)
+    with open(os.path.join(PANEL_DIR, 'tickers.json'), 'w') as f:
+        json.dump(list(tickers), f)
+    return tanggal
+
+def muat_panel():
+    """Membuka matriks panel yang sudah dibangun (mode baca saja, tanpa memuat ke memori)."""
+    tanggal = pd.DatetimeIndex(pd.read_csv(os.path.join(PANEL_DIR, 'tanggal.csv'), parse_dates=['Date'])['Date'])
+    with open(os.path.join(PANEL_DIR, 'tickers.json'), 'r') as f:
+        tickers = json.load(f)
+    close = np.load(os.path.join(PANEL_DIR, 'close.npy'), mmap_mode='r')
+    sinyal = np.load(os.path.join(PANEL_DIR, 'sinyal.npy'), mmap_mode='r')
+    skor = np.load(os.path.join(PANEL_DIR, 'skor.npy'), mmap_mode='r')
+    return tanggal, tickers, close, sinyal, skor
+
+# --- TAHAP 2: SIMULASI PORTOFOLIO (STREAMING PER BLOK TANGGAL) ---
+def simulasi_portofolio(tanggal, tickers, close, sinyal, skor, modal_awal=100_000_000, top_n=10,
+                        fee_beli=FEE_BELI, fee_jual=FEE_JUAL, chunk_hari=250):
+    """
+    Mensimulasikan portofolio multi-saham. Setiap hari (pada harga penutupan):
+    1. Posisi yang sinyal AI-nya berubah menjadi 0 dijual.
+    2. Slot kosong (maksimal 'top_n' posisi) diisi kandidat bersinyal 1 dengan skor
+       screener tertinggi; kas dibagi rata ke slot kosong dan dibelikan dalam lot 100 lembar.
+    Peringkat kandidat dihitung tervektorisasi per blok 'chunk_hari' baris (matriks dibaca
+    per blok sehingga memori tetap terbatas). Kas dan posisi bergantung pada hari sebelumnya,
+    jadi pengisian slot tetap berjalan per hari, tetapi hanya menyentuh 2 x top_n kandidat teratas.
+    """
+    n_tanggal, n_ticker = close.shape
+    kas = float(modal_awal)
+    lembar = np.zeros(n_ticker, dtype=np.int64)
+    harga_beli = np.zeros(n_ticker)
+    tanggal_beli = np.full(n_ticker, -1)
+    harga_terakhir = np.full(n_ticker, np.nan)
+    total_biaya = 0.0
+
+    nilai_portfolio = np.empty(n_tanggal)
+    kas_harian = np.empty(n_tanggal)
+    jumlah_posisi = np.empty(n_tanggal, dtype=np.int64)
+    transaksi = []
+
+    for awal in range(0, n_tanggal, chunk_hari):
+        akhir = min(awal + chunk_hari, n_tanggal)
+        blok_close = np.asarray(close[awal:akhir])
+        blok_sinyal = np.asarray(sinyal[awal:akhir])
+        blok_skor = np.asarray(skor[awal:akhir])
+
+        # Peringkat seluruh blok sekaligus: 2 x top_n kandidat teratas per hari (bersinyal 1 &
+        # berharga), urut skor menurun. Posisi yang dipegang paling banyak top_n, jadi setelah
+        # disaring masih tersisa cukup kandidat untuk semua slot kosong.
+        layak = (blok_sinyal == 1) & ~np.isnan(blok_close)
+        skor_layak = np.where(layak, blok_skor, -np.inf)
+        k = min(2 * top_n, n_ticker)
+        if k < n_ticker:
+            teratas = np.argpartition(-skor_layak, k - 1, axis=1)[:, :k]
+        else:
+            teratas = np.broadcast_to(np.arange(n_ticker), skor_layak.shape)
+        urutan = np.argsort(-np.take_along_axis(skor_layak, teratas, axis=1), axis=1, kind='stable')
+        peringkat = np.take_along_axis(teratas, urutan, axis=1)
+        peringkat_layak = np.take_along_axis(layak, peringkat, axis=1)
+
+        for b in range(akhir - awal):
+            t = awal + b
+            c = blok_close[b]
+            valid = ~np.isnan(c)
+            harga_terakhir[valid] = c[valid]
+            dipegang = lembar > 0
+
+            # 1. Jual posisi yang sinyalnya berubah menjadi 0
+            jual = dipegang & valid & (blok_sinyal[b] == 0)
+            if jual.any():
+                nilai_kotor = lembar[jual] * c[jual]
+                kas += float(np.sum(nilai_kotor * (1 - fee_jual)))
+                total_biaya += float(np.sum(nilai_kotor * fee_jual))
+                for j in np.flatnonzero(jual):
+                    transaksi.append({
+                        "ticker": tickers[j], "tanggal_beli": tanggal[tanggal_beli[j]], "harga_beli": harga_beli[j],
+                        "tanggal_jual": tanggal[t], "harga_jual": c[j], "lembar": int(lembar[j]),
+                        "return_pct": (c[j] * (1 - fee_jual) / (harga_beli[j] * (1 + fee_beli)) - 1) * 100
+                    })
+                lembar[jual] = 0
+                dipegang = lembar > 0
+
+            # 2. Isi slot kosong dengan kandidat berskor tertinggi (seperti run_screener)
+            slot = top_n - int(dipegang.sum())
+            kandidat = peringkat[b][peringkat_layak[b] & ~dipegang[peringkat[b]]][:max(slot, 0)]
+            if len(kandidat) > 0 and kas > 0:
+                # Kas dibagi ke slot yang benar-benar terisi, bukan ke semua slot kosong
+                anggaran = kas / len(kandidat)
+                lot = np.floor(anggaran / (c[kandidat] * LEMBAR_PER_LOT * (1 + fee_beli))).astype(np.int64)
+                beli = lot > 0
+                kandidat, lot = kandidat[beli], lot[beli]
+                nilai_kotor = lot * LEMBAR_PER_LOT * c[kandidat]
+                kas -= float(np.sum(nilai_kotor * (1 + fee_beli)))
+                total_biaya += float(np.sum(nilai_kotor * fee_beli))
+                lembar[kandidat] = lot * LEMBAR_PER_LOT
+                harga_beli[kandidat] = c[kandidat]
+                tanggal_beli[kandidat] = t
+
+            nilai_saham = np.nansum(lembar * harga_terakhir)
+            nilai_portfolio[t] = kas + nilai_saham
+            kas_harian[t] = kas
+            jumlah_posisi[t] = int((lembar > 0).sum())
+
+    kurva = pd.DataFrame({'Nilai_Portfolio': nilai_portfolio, 'Kas': kas_harian, 'Jumlah_Posisi': jumlah_posisi},
+                         index=pd.DatetimeIndex(tanggal, name='Date'))
+    posisi_terbuka = [{"ticker": tickers[j], "tanggal_beli": tanggal[tanggal_beli[j]], "harga_beli": harga_beli[j],
+                       "lembar": int(lembar[j]), "harga_terakhir": harga_terakhir[j]} for j in np.flatnonzero(lembar > 0)]
+    return {
+        "kurva": kurva,
+        "transaksi": pd.DataFrame(transaksi),
+        "posisi_terbuka": pd.DataFrame(posisi_terbuka),
+        "total_biaya": total_biaya,
+        "nilai_akhir": nilai_portfolio[-1] if n_tanggal else modal_awal,
+        "total_return_pct": ((nilai_portfolio[-1] - modal_awal) / modal_awal) * 100 if n_tanggal else 0.0
+    }
+
+# --- BAGIAN EKSEKUSI UTAMA ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtester Portofolio Multi-Saham (Top-N Screener).")
+    parser.add_argument("--tickers", nargs='+', help="(Opsional) Universe ticker spesifik (default: semua model yang ada).")
+    parser.add_argument("--top-n", type=int, default=10, help="Jumlah posisi maksimal yang dipegang bersamaan.")
+    parser.add_argument("--modal", type=float, default=100_000_000, help="Modal awal dalam Rupiah.")
+    parser.add_argument("--mulai", help="(Opsional) Tanggal awal simulasi, contoh: 2021-01-01")
+    parser.add_argument("--sampai", help="(Opsional) Tanggal akhir simulasi.")
+    parser.add_argument("--chunk-hari", type=int, default=250, help="Jumlah baris tanggal per blok simulasi.")
+    parser.add_argument("--workers", type=int, default=None, help="Jumlah proses paralel saat membangun panel.")
+    parser.add_argument("--pakai-panel", action='store_true', help="Gunakan panel yang sudah dibangun sebelumnya (lewati tahap 1).")
+    args = parser.parse_args()
+
+    db_file_path = "sqlite:///data_saham.db"
+    start_time = time.time()
+    mulai_run('portfolio_backtester')
+
+    if not args.pakai_panel:
+        tickers = [t.upper() for t in args.tickers] if args.tickers else get_available_models()
+        print(f"--- MEMBANGUN PANEL UNTUK {len(tickers)} SAHAM ---")
+        bangun_panel(tickers, db_file_path, load_optimal_params(), args.mulai, args.sampai, workers=args.workers)
+        waktu_panel = time.time() - start_time
+        print(f"\nPanel selesai dibangun dalam {waktu_panel:.1f} detik.")
+
+    tanggal, tickers, close, sinyal, skor = muat_panel()
+    start_simulasi = time.time()
+    with span('simulate'):
+        hasil = simulasi_portofolio(tanggal, tickers, close, sinyal, skor, modal_awal=args.modal,
+                                    top_n=args.top_n, chunk_hari=args.chunk_hari)
+    waktu_simulasi = time.time() - start_simulasi
+
+    hasil['kurva'].to_csv('hasil_backtest_portofolio.csv', float_format='%.2f')
+    hasil['transaksi'].to_csv('transaksi_backtest_portofolio.csv', index=False, float_format='%.2f')
+
+    print("\n" + "="*54)
+    print("--- BACKTEST PORTOFOLIO SELESAI ---")
+    print(f"Periode                : {tanggal[0].date()} s/d {tanggal[-1].date()} ({len(tanggal)} hari bursa)")
+    print(f"Universe               : {len(tickers)} saham, maksimal {args.top_n} posisi")
+    print(f"Modal Awal             : Rp {args.modal:,.0f}")
+    print(f"Nilai Akhir Portfolio  : Rp {hasil['nilai_akhir']:,.0f}")
+    print(f"Total Return           : {hasil['total_return_pct']:.2f}%")
+    print(f"Jumlah Transaksi Tutup : {len(hasil['transaksi'])}")
+    print(f"Posisi Masih Terbuka   : {len(hasil['posisi_terbuka'])}")
+    print(f"Total Biaya Transaksi  : Rp {hasil['total_biaya']:,.0f}")
+    print(f"Waktu Simulasi         : {waktu_simulasi:.2f} detik")
+    print("Kurva ekuitas tersimpan di 'hasil_backtest_portofolio.csv', transaksi di 'transaksi_backtest_portofolio.csv'.")
+    cetak_ringkasan(selesai_run(saham=len(tickers), top_n=args.top_n))
+    print("="*54)
+
+    with open('logs/portfolio_backtester_last_run.log', 'w') as f:
+        f.write(datetime.now().isoformat())
@@ -1,8 +1,9 @@
 import pandas as pd
 from sqlalchemy import create_engine, inspect, text as sqlalchemy_text
-import numpy as np
-import pandas_ta as ta
-import joblib
+import data_cache
+from features import load_features_tail, feature_matrix
+from latest_quotes import load_latest_quotes
+from instrumentation import span
 import json
 from datetime import datetime
 
@@ -84,20 +85,15 @@ def delete_position(position_id):
 
 # --- FUNGSI-FUNGSI BANTU ANALISIS ---
 def load_data(ticker, timeframe='daily'):
-    engine = get_engine()
-    table_name = f"{ticker}_weekly" if timeframe == 'weekly' else ticker
-    try:
-        df = pd.read_sql(f"SELECT * FROM '{table_name}'", engine, index_col='Date', parse_dates=['Date'])
-        return df
-    except Exception:
-        return pd.DataFrame()
+    """Data harga dari cache LRU bersama (data_cache), dimuat ulang otomatis saat versi harga naik."""
+    return data_cache.load_price(ticker, get_engine(), timeframe)
 
 # Fungsi baru untuk memuat 3 model AI
 def load_ai_models(ticker):
     try:
-        model_arah = joblib.load(f'models/{ticker}_arah_model.joblib')
-        model_sl = joblib.load(f'models/{ticker}_sl_model.joblib')
-        model_tp = joblib.load(f'models/{ticker}_tp_model.joblib')
+        model_arah = data_cache.load_model(f'models/{ticker}_arah_model.joblib')
+        model_sl = data_cache.load_model(f'models/{ticker}_sl_model.joblib')
+        model_tp = data_cache.load_model(f'models/{ticker}_tp_model.joblib')
         return model_arah, model_sl, model_tp
     except FileNotFoundError:
         return None, None, None
@@ -118,76 +114,60 @@ def interpretasi_adx(row):
     elif adx < 20: return "Sideways / Tren Lemah"
     else: return "Tren Netral"
 
-# --- FUNGSI BARU: MESIN REKOMENDASI POSISI (VERSI REGRESSOR) ---
-def get_recommendation_for_position(position_data):
+# --- HARGA TERAKHIR & PROFIT/LOSS SELURUH PORTOFOLIO ---
+def get_latest_prices(tickers, engine=None):
     """
-    Menganalisis posisi trading dan memberikan rekomendasi aksi
-    menggunakan tiga model AI: Arah, Stop Loss (SL), dan Take Profit (TP).
+    Harga penutupan terakhir banyak saham. Dibaca dari tabel latest_quotes (satu query
+    berindeks); ticker yang belum punya kuotasi diambil dalam SATU query lintas tabel harga
+    (UNION ALL per ticker, hanya baris tanggal terakhir). Series ticker -> Close; ticker tanpa data dilewati.
+    """
+    engine = engine or get_engine()
+    tickers = list(dict.fromkeys(tickers))
+    harga = load_latest_quotes(engine, tickers)['close'].rename('Close')
+    tables = set(inspect(engine).get_table_names())
+    tickers = [ticker for ticker in tickers if ticker in tables and ticker not in harga.index]
+    if not tickers:
+        return harga
+    query = " UNION ALL ".join(
+        f"""SELECT '{ticker}' AS ticker, Close FROM "{ticker}" WHERE Date = (SELECT MAX(Date) FROM "{ticker}")"""
+        for ticker in tickers
+    )
+    sisa = pd.read_sql(query, engine).drop_duplicates('ticker').set_index('ticker')['Close']
+    return pd.concat([harga, sisa]) if not harga.empty else sisa
+
+def hitung_profit_loss(positions, harga_terakhir):
+    """Menambahkan kolom harga terakhir, nilai beli/kini dan P/L ke seluruh posisi sekaligus (vektor)."""
+    df = positions.copy()
+    df['harga_terakhir'] = df['ticker'].map(harga_terakhir).fillna(0.0)
+    df['nilai_beli'] = df['buy_price'] * df['lots'] * 100
+    df['nilai_kini'] = df['harga_terakhir'] * df['lots'] * 100
+    df['profit_loss'] = df['nilai_kini'] - df['nilai_beli']
+    df['profit_loss_pct'] = (df['profit_loss'] / df['nilai_beli'].where(df['nilai_beli'] > 0)).fillna(0.0) * 100
+    return df
+
+# --- MESIN REKOMENDASI POSISI (VERSI REGRESSOR, BATCH SELURUH PORTOFOLIO) ---
+def prediksi_ticker(ticker, engine, all_optimal_params):
+    """
+    Menjalankan ketiga model AI (Arah, SL, TP) sekali untuk hari terakhir satu saham.
+    Mengembalikan (last_day, prediksi_arah, prediksi_sl, prediksi_tp) atau None.
     """
-    ticker = position_data['ticker']
-    buy_price = position_data['buy_price']
-    
-    # 1. Muat semua data dan TIGA model AI
-    df_daily = load_data(ticker, 'daily')
-    df_weekly = load_data(ticker, 'weekly')
     model_arah, model_sl, model_tp = load_ai_models(ticker)
-    all_optimal_params = load_optimal_params()
-
-    # Validasi data dan model
-    if df_daily.empty or df_weekly.empty or not all([model_arah, model_sl, model_tp]):
-        return {"error": "Data pasar atau salah satu model AI (Arah, SL, TP) tidak ditemukan."}
-
-    # 2. Lakukan rekayasa fitur yang sama persis seperti di trainer.py
-    params = all_optimal_params.get(ticker, {'rsi_length': 14, 'bbands_length': 20})
-    
-    df_weekly['SMA_20_weekly'] = df_weekly.ta.sma(length=20)
-    df_weekly['RSI_14_weekly'] = df_weekly.ta.rsi(length=14)
-    df_weekly_features = df_weekly[['SMA_20_weekly', 'RSI_14_weekly']]
-    df = pd.merge_asof(df_daily, df_weekly_features, left_index=True, right_index=True)
-    
-    df.ta.rsi(length=params.get('rsi_length', 14), append=True)
-    df.ta.macd(fast=12, slow=26, signal=9, append=True)
-    df.ta.bbands(length=params.get('bbands_length', 20), append=True)
-    df.ta.atr(length=14, append=True)
-    df.ta.obv(append=True)
-    df.ta.adx(length=14, append=True)
-    df.ta.cdl_pattern(name="all", append=True)
-    df.ta.pivots(append=True)
-    pivot_levels_raw = ['PIVOTS_TRAD_D_P','PIVOTS_TRAD_D_S1','PIVOTS_TRAD_D_R1','PIVOTS_TRAD_D_S2','PIVOTS_TRAD_D_R2']
-    pivot_levels_simple = ['p','s1','r1','s2','r2']
-    rename_dict = {old: new for old, new in zip(pivot_levels_raw, pivot_levels_simple)}
-    df.rename(columns=rename_dict, inplace=True)
-    for level in pivot_levels_simple:
-        if level in df.columns: df[f'Jarak_ke_{level.upper()}'] = (df['Close'] - df[level]) / df['Close']
-    for level in ['p', 's1', 'r1']:
-        if level in df.columns: df[f'Posisi_vs_{level.upper()}'] = np.where(df['Close'] > df[level], 1, 0)
-    try:
-        df_sentiment = pd.read_sql(f"SELECT * FROM news_sentiment WHERE ticker='{ticker}'", get_engine(), parse_dates=['date'])
-        if not df_sentiment.empty:
-            sentiment_daily = df_sentiment.groupby(df_sentiment['date'].dt.date).agg(sentiment_sum=('sentiment', 'sum')).reset_index()
-            sentiment_daily['date'] = pd.to_datetime(sentiment_daily['date'])
-            sentiment_daily.set_index('date', inplace=True)
-            df = df.merge(sentiment_daily, left_index=True, right_index=True, how='left')
-    except:
-        df['sentiment_sum'] = 0
-    df.fillna(0, inplace=True)
-
-    # 3. Buat prediksi dengan ketiga model
-    # Siapkan data X (fitur) untuk hari terakhir saja
-    X_last_day = df.drop(columns=[col for col in df.columns if col in pivot_levels_simple]).iloc[[-1]]
-    
-    # Pastikan semua fitur yang dibutuhkan model ada
-    for col in model_arah.feature_names_in_:
-        if col not in X_last_day.columns:
-            X_last_day[col] = 0
-    X_last_day = X_last_day[model_arah.feature_names_in_] # Urutkan kolom
-
-    prediksi_arah = model_arah.predict(X_last_day)[0]
-    prediksi_sl = model_sl.predict(X_last_day)[0]
-    prediksi_tp = model_tp.predict(X_last_day)[0]
-
-    # 4. Bangun rekomendasi berdasarkan data hari terakhir
-    last_day = df.iloc[-1]
+    if not all([model_arah, model_sl, model_tp]):
+        return None
+
+    # Rekayasa fitur yang sama persis seperti di trainer.py, tetapi mode tail-window:
+    # hanya riwayat secukupnya yang dimuat dan fitur dihitung untuk hari terakhir saja
+    df = load_features_tail(ticker, engine, all_optimal_params, n_terakhir=1, min_rows=1)
+    if df is None:
+        return None
+
+    X_last_day = feature_matrix(df, model_arah)
+    with span('predict', ticker):
+        return df.iloc[-1], model_arah.predict(X_last_day)[0], model_sl.predict(X_last_day)[0], model_tp.predict(X_last_day)[0]
+
+def susun_rekomendasi(buy_price, prediksi):
+    """Membangun rekomendasi satu posisi dari hasil prediksi_ticker (dipakai bersama oleh semua posisi ticker yang sama)."""
+    last_day, prediksi_arah, prediksi_sl, prediksi_tp = prediksi
     harga_terakhir = last_day['Close']
 
     # Logika Rekomendasi Aksi
@@ -221,6 +201,34 @@ def get_recommendation_for_position(position_data):
         "error": None
     }
 
+def get_recommendations_for_portfolio(positions):
+    """
+    Rekomendasi AI untuk seluruh posisi dalam satu lintasan: parameter & engine dimuat sekali,
+    posisi dikelompokkan per ticker sehingga model dan fitur setiap saham hanya diproses sekali.
+    Mengembalikan dict id posisi -> rekomendasi.
+    """
+    engine = get_engine()
+    all_optimal_params = load_optimal_params()
+    hasil = {}
+    for ticker, grup in positions.groupby('ticker', sort=False):
+        prediksi = prediksi_ticker(ticker, engine, all_optimal_params)
+        for _, position in grup.iterrows():
+            if prediksi is None:
+                hasil[position['id']] = {"error": "Data pasar atau salah satu model AI (Arah, SL, TP) tidak ditemukan."}
+            else:
+                hasil[position['id']] = susun_rekomendasi(position['buy_price'], prediksi)
+    return hasil
+
+def get_recommendation_for_position(position_data):
+    """
+    Menganalisis satu posisi trading dan memberikan rekomendasi aksi
+    menggunakan tiga model AI: Arah, Stop Loss (SL), dan Take Profit (TP).
+    """
+    prediksi = prediksi_ticker(position_data['ticker'], get_engine(), load_optimal_params())
+    if prediksi is None:
+        return {"error": "Data pasar atau salah satu model AI (Arah, SL, TP) tidak ditemukan."}
+    return susun_rekomendasi(position_data['buy_price'], prediksi)
+
 # --- BAGIAN EKSEKUSI UTAMA ---
 if __name__ == "__main__":
     print("Mengecek dan mempersiapkan database portofolio...")
@@ -0,0 +1,172 @@
+import pandas as pd
+import numpy as np
+from sqlalchemy import text as sqlalchemy_text
+from sqlalchemy.exc import OperationalError
+import data_cache
+import hashlib
+import copy
+import os
+from data_versions import get_versions
+from features import load_features, load_features_tail, feature_matrix
+from instrumentation import span, hitung
+
+# --- KONFIGURASI ---
+TABLE_NAME = "prediksi_model"
+_fingerprint_cache = {}
+
+# --- SIDIK JARI MODEL ---
+def fingerprint_model(model_filename):
+    """
+    Sidik jari (hash isi file) sebuah model. Berubah setiap kali trainer.py
+    menyimpan model baru, sehingga prediksi lama otomatis tidak dipakai lagi.
+    Hash di-cache per (mtime, ukuran) agar file tidak dibaca ulang setiap panggilan.
+    """
+    stat = os.stat(model_filename)
+    kunci = (model_filename, stat.st_mtime_ns, stat.st_size)
+    if kunci not in _fingerprint_cache:
+        hasher = hashlib.sha1()
+        with open(model_filename, 'rb') as f:
+            for blok in iter(lambda: f.read(1 << 20), b''):
+                hasher.update(blok)
+        _fingerprint_cache[kunci] = hasher.hexdigest()[:16]
+    return _fingerprint_cache[kunci]
+
+def kunci_prediksi(model_filename, engine, ticker):
+    """
+    Kunci penyimpanan prediksi (kolom model_fp): sidik jari model digabung versi parameter
+    optimal ticker. Parameter ikut membentuk fitur, jadi optimizer.py yang mengubahnya
+    membuat seluruh prediksi lama ticker ini tidak berlaku. Revisi harga/sentimen untuk
+    tanggal lampau ditangani lewat hapus_prediksi oleh penulisnya.
+    """
+    versi_params = get_versions(engine, ticker, ('params',))
+    return hashlib.sha1(f"{fingerprint_model(model_filename)}|{versi_params}".encode()).hexdigest()[:16]
+
+# --- FUNGSI-FUNGSI DATABASE ---
+def create_prediction_table(engine):
+    """Membuat tabel penyimpanan prediksi jika belum ada."""
+    with engine.connect() as conn:
+        conn.execute(sqlalchemy_text(f"""
+        CREATE TABLE IF NOT EXISTS {TABLE_NAME} (
+            ticker VARCHAR(20) NOT NULL,
+            model_fp VARCHAR(16) NOT NULL,
+            Date TIMESTAMP NOT NULL,
+            Sinyal INTEGER NOT NULL,
+            Probabilitas REAL,
+            PRIMARY KEY (ticker, model_fp, Date)
+        );
+        """))
+        conn.commit()
+
+def load_predictions(ticker, engine, model_fp):
+    """Membaca semua prediksi tersimpan untuk satu ticker dan satu versi model."""
+    try:
+        with span('db_load', ticker):
+            return pd.read_sql(
+                sqlalchemy_text(f"SELECT Date, Sinyal, Probabilitas FROM {TABLE_NAME} WHERE ticker = :ticker AND model_fp = :fp ORDER BY Date"),
+                engine, params={"ticker": ticker, "fp": model_fp}, index_col='Date', parse_dates=['Date']
+            )
+    except Exception:
+        return pd.DataFrame(columns=['Sinyal', 'Probabilitas'])
+
+def _last_price_date(ticker, engine):
+    """Tanggal data harga terakhir untuk ticker (None jika tabel tidak ada)."""
+    try:
+        with engine.connect() as conn:
+            hasil = conn.execute(sqlalchemy_text(f"SELECT MAX(Date) FROM '{ticker}'")).scalar()
+        return pd.Timestamp(hasil) if hasil is not None else None
+    except Exception:
+        return None
+
+def _count_rows_after(ticker, engine, tanggal):
+    """Jumlah baris harga setelah 'tanggal' (tanggal yang belum punya prediksi)."""
+    with engine.connect() as conn:
+        return conn.execute(sqlalchemy_text(f"SELECT COUNT(*) FROM '{ticker}' WHERE Date > :tanggal"),
+                            {"tanggal": str(tanggal)}).scalar()
+
+def save_predictions(ticker, engine, model_fp, df_pred):
+    """Menambahkan prediksi baru. Prediksi dari versi model lama untuk ticker ini dihapus."""
+    with span('db_write', ticker):
+        create_prediction_table(engine)
+        with engine.connect() as conn:
+            conn.execute(sqlalchemy_text(f"DELETE FROM {TABLE_NAME} WHERE ticker = :ticker AND model_fp != :fp"),
+                         {"ticker": ticker, "fp": model_fp})
+            conn.commit()
+        df_simpan = df_pred.reset_index().assign(ticker=ticker, model_fp=model_fp)
+        df_simpan[['ticker', 'model_fp', 'Date', 'Sinyal', 'Probabilitas']].to_sql(TABLE_NAME, engine, if_exists='append', index=False)
+
+def hapus_prediksi(engine, ticker, sejak=None):
+    """
+    Menghapus prediksi tersimpan ticker mulai tanggal 'sejak' (semua jika None). Dipanggil
+    penulis data (get_data, news_store) saat baris lampau berubah: fitur tanggal t hanya
+    bergantung pada data s.d. t, jadi prediksi sebelum 'sejak' tetap berlaku dan sisanya
+    dihitung ulang pada panggilan get_predictions berikutnya.
+    """
+    query = f"DELETE FROM {TABLE_NAME} WHERE ticker = :ticker"
+    if sejak is not None:
+        query += " AND Date >= :sejak"
+    try:
+        with engine.begin() as conn:
+            conn.execute(sqlalchemy_text(query), {"ticker": ticker, "sejak": str(pd.Timestamp(sejak)) if sejak is not None else None})
+    except OperationalError:
+        pass # Tabel prediksi belum ada: tidak ada yang perlu dihapus
+
+# --- FUNGSI UTAMA ---
+def predict_frame(model, df, ticker=None):
+    """Menjalankan model pada DataFrame fitur dan mengembalikan kolom Sinyal & Probabilitas."""
+    X = feature_matrix(df, model)
+    with span('predict', ticker):
+        sinyal = model.predict(X)
+        kelas = list(model.classes_)
+        if 1 in kelas:
+            probabilitas = model.predict_proba(X)[:, kelas.index(1)]
+        else:
+            probabilitas = np.zeros(len(X))
+    return pd.DataFrame({'Sinyal': sinyal.astype(int), 'Probabilitas': probabilitas}, index=df.index)
+
+def get_predictions(ticker, engine, all_optimal_params, model=None, n_jobs=None):
+    """
+    Mengembalikan sinyal & probabilitas harian untuk seluruh riwayat ticker.
+    Prediksi dibaca dari tabel penyimpanan; fitur dibangun ulang dan model
+    dijalankan hanya untuk tanggal yang belum punya prediksi pada versi model saat ini
+    (lewat mode tail-window jika sebagian besar riwayat sudah diprediksi).
+    Mengembalikan None jika model atau data tidak tersedia.
+    """
+    model_filename = f'models/{ticker}_model.joblib'
+    if not os.path.exists(model_filename):
+        return None
+    model_fp = kunci_prediksi(model_filename, engine, ticker)
+
+    df_tersimpan = load_predictions(ticker, engine, model_fp)
+    tanggal_terakhir = _last_price_date(ticker, engine)
+    if tanggal_terakhir is None:
+        return None
+    if not df_tersimpan.empty and df_tersimpan.index[-1] >= tanggal_terakhir:
+        hitung('prediksi_tersimpan_penuh')
+        return df_tersimpan
+
+    # Ada tanggal baru (atau model baru): bangun fitur dan prediksi hanya baris yang belum ada.
+    # Model baru butuh seluruh riwayat; untuk beberapa tanggal baru cukup mode tail-window.
+    if df_tersimpan.empty:
+        df = load_features(ticker, engine, all_optimal_params)
+    else:
+        n_baru = _count_rows_after(ticker, engine, df_tersimpan.index[-1])
+        df = load_features_tail(ticker, engine, all_optimal_params, n_terakhir=max(n_baru, 1))
+    if df is None:
+        return None
+    if not df_tersimpan.empty:
+        df = df[df.index > df_tersimpan.index[-1]]
+    if model is None:
+        model = data_cache.load_model(model_filename)
+    if n_jobs is not None and getattr(model, 'n_jobs', n_jobs) != n_jobs:
+        # Salinan dangkal: model dari data_cache dipakai bersama pemanggil lain di proses ini,
+        # pohon-pohonnya tetap dibagi (tidak disalin)
+        model = copy.copy(model)
+        model.n_jobs = n_jobs
+    df_baru = predict_frame(model, df, ticker)
+    hitung('baris_diprediksi', len(df_baru))
+
+    try:
+        save_predictions(ticker, engine, model_fp, df_baru)
+    except OperationalError:
+        pass # Database sedang dikunci proses lain; prediksi tetap dikembalikan, disimpan di run berikutnya
+    return pd.concat([df_tersimpan, df_baru]) if not df_tersimpan.empty else df_baru
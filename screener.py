@@ -1,129 +1,136 @@
 import streamlit as st
 import pandas as pd
 from sqlalchemy import create_engine, inspect
-import pandas_ta as ta
-import joblib
 import numpy as np
+import heapq
 import json
+import multiprocessing
+from data_versions import get_total_version
+from screener_snapshot import iter_baris_snapshot, muat_snapshot, simpan_snapshot, KOLOM_SNAPSHOT
+from instrumentation import span, run
 
 # --- FUNGSI-FUNGSI BANTU ---
+# Cache dikunci versi data (data_versions): otomatis dimuat ulang setelah get_data/optimizer berjalan
 @st.cache_data
-def load_data(ticker, timeframe='daily', db_file_path=None):
-    _engine = create_engine(f"sqlite:///{db_file_path}")
-    table_name = f"{ticker}_weekly" if timeframe == 'weekly' else ticker
-    try:
-        df = pd.read_sql(f"SELECT * FROM '{table_name}'", _engine, index_col='Date', parse_dates=['Date'])
-        return df
-    except Exception:
-        return pd.DataFrame()
-
-@st.cache_data
-def get_available_stocks(db_file_path):
+def _get_available_stocks(db_file_path, versi_harga):
     _engine = create_engine(f"sqlite:///{db_file_path}")
     inspector = inspect(_engine)
-    stock_names = [name for name in inspector.get_table_names() if not name.endswith(('_weekly', '_sentiment')) and 'news' not in name and 'broker' not in name]
+    stock_names = [name for name in inspector.get_table_names() if not name.endswith(('_weekly', '_sentiment')) and 'news' not in name and 'broker' not in name and '.' in name]
     return sorted(stock_names)
 
-@st.cache_resource
-def load_ai_model(ticker):
-    model_filename = f'models/{ticker}_model.joblib'
-    try:
-        model = joblib.load(model_filename)
-        return model
-    except FileNotFoundError:
-        return None
+def get_available_stocks(db_file_path):
+    return _get_available_stocks(db_file_path, get_total_version(create_engine(f"sqlite:///{db_file_path}"), 'prices'))
 
 @st.cache_data
-def load_optimal_params():
+def _load_optimal_params(versi_params):
     try:
         with open('optimal_params.json', 'r') as f:
             return json.load(f)
     except FileNotFoundError:
         return {}
 
-def calculate_all_features(_df, _df_weekly, params):
-    df = _df.copy()
-    df_weekly = _df_weekly.copy()
-    
-    df_weekly_features = df_weekly[['SMA_20_weekly', 'RSI_14_weekly']]
-    df_merged = pd.merge_asof(df, df_weekly_features, left_index=True, right_index=True)
-    df = df_merged
-    
-    df.ta.rsi(length=params.get('rsi_length', 14), append=True)
-    df.ta.macd(fast=12, slow=26, signal=9, append=True)
-    df.ta.bbands(length=params.get('bbands_length', 20), append=True)
-    df.ta.atr(length=14, append=True)
-    df.ta.obv(append=True)
-    df.ta.adx(length=14, append=True)
-    df.fillna(0, inplace=True)
-    return df
-# Fungsi inti screener (diperbarui untuk menerima parameter risiko jangka panjang)
-@st.cache_data(ttl=3600)
-def run_screener(stock_list, db_file_path, atr_multiplier, risk_reward_ratio, rrr_long_term, _status_callback):
-    _engine = create_engine(f"sqlite:///{db_file_path}")
-    all_optimal_params = load_optimal_params()
-    short_term_picks, long_term_picks = [], []
+def load_optimal_params(db_file_path="data_saham.db"):
+    return _load_optimal_params(get_total_version(create_engine(f"sqlite:///{db_file_path}"), 'params'))
+
+# --- PERINGKAT BERJALAN (BOUNDED HEAP) ---
+def ranking_keys(baris):
+    """Kunci peringkat satu baris snapshot: (skor jangka pendek, RSI mingguan); None jika tidak lolos kriteria."""
+    skor_pendek = None
+    if baris['Prediksi_Sinyal'] == 1:
+        skor_pendek = 0
+        if baris['ADX_14'] > 25 and baris['DMP_14'] > baris['DMN_14']: skor_pendek += baris['ADX_14']
+        if baris['RSI'] > 50: skor_pendek += baris['RSI']
+    rsi_mingguan = None
+    if baris['Close'] > baris['SMA_20_weekly'] and baris['RSI_14_weekly'] > 55:
+        rsi_mingguan = baris['RSI_14_weekly']
+    return skor_pendek, rsi_mingguan
+
+def push_top_n(heap, kunci, baris, n=10):
+    """Menyimpan maksimal n baris berkunci tertinggi dalam min-heap (baris terlemah di heap[0])."""
+    item = (kunci, baris['ticker'], baris)
+    if len(heap) < n:
+        heapq.heappush(heap, item)
+    elif item[:2] > heap[0][:2]:
+        heapq.heapreplace(heap, item)
+
+def stream_screener(stock_list, db_file_path, workers=None, simpan_setiap=25):
+    """
+    Menjalankan screener langsung (tanpa snapshot) di process pool berkonteks spawn (server
+    Streamlit multithread tidak aman di-fork). Generator yang
+    menghasilkan (ticker, selesai, df_top) setiap kali satu ticker selesai; df_top
+    berisi kandidat 10 besar jangka pendek & panjang sejauh ini (gabungan, tanpa duplikat).
+    Baris disimpan ke snapshot setiap 'simpan_setiap' ticker dan sekali lagi saat generator
+    berakhir atau ditutup (mis. halaman di-rerun), sehingga run yang terputus tidak terbuang.
+    """
+    engine = create_engine(f"sqlite:///{db_file_path}")
+    heap_pendek, heap_panjang, belum_disimpan = [], [], []
+    baris_iter = iter_baris_snapshot(stock_list, f"sqlite:///{db_file_path}", load_optimal_params(db_file_path), workers,
+                                     mp_context=multiprocessing.get_context('spawn'))
+    try:
+        for selesai, (ticker, baris) in enumerate(baris_iter, start=1):
+            if baris:
+                belum_disimpan.append(baris)
+                skor_pendek, rsi_mingguan = ranking_keys(baris)
+                if skor_pendek is not None: push_top_n(heap_pendek, skor_pendek, baris)
+                if rsi_mingguan is not None: push_top_n(heap_panjang, rsi_mingguan, baris)
+                if len(belum_disimpan) >= simpan_setiap:
+                    simpan_snapshot(pd.DataFrame(belum_disimpan, columns=KOLOM_SNAPSHOT), engine, ganti_semua=False)
+                    belum_disimpan = []
+            kandidat = {item[1]: item[2] for item in heap_pendek + heap_panjang}
+            yield ticker, selesai, pd.DataFrame(list(kandidat.values()), columns=KOLOM_SNAPSHOT)
+    finally:
+        baris_iter.close() # Batalkan sisa antrean pool
+        if belum_disimpan:
+            simpan_snapshot(pd.DataFrame(belum_disimpan, columns=KOLOM_SNAPSHOT), engine, ganti_semua=False)
+
+def hitung_rekomendasi(df_snapshot, atr_multiplier, risk_reward_ratio, rrr_long_term):
+    """Peringkat & rencana SL/TP jangka pendek dan panjang dari snapshot, tervektorisasi untuk semua saham."""
+    df = df_snapshot
 
-    for i, ticker in enumerate(stock_list):
-        _status_callback(ticker, (i + 1) / len(stock_list))
-        
-        df_daily = load_data(ticker, timeframe='daily', db_file_path=db_file_path)
-        df_weekly = load_data(ticker, timeframe='weekly', db_file_path=db_file_path)
-        
-        if len(df_daily) < 250 or len(df_weekly) < 52: continue
+    # Logika Peringkat Jangka Pendek (Short Term)
+    short = df[df['Prediksi_Sinyal'] == 1]
+    score = (np.where((short['ADX_14'] > 25) & (short['DMP_14'] > short['DMN_14']), short['ADX_14'], 0)
+             + np.where(short['RSI'] > 50, short['RSI'], 0))
+    risiko = atr_multiplier * short['ATRr_14']
+    df_short = pd.DataFrame({
+        "Saham": short['ticker'],
+        "Harga Terakhir": short['Close'],
+        "Rekomendasi AI": "BELI",
+        "Harga Beli": short['Close'],
+        "Harga Take Profit": short['Close'] + (risiko * risk_reward_ratio),
+        "Harga Stop Loss": short['Close'] - risiko,
+        "Skor Rekomendasi": score
+    })
 
-        df_weekly['SMA_20_weekly'] = df_weekly.ta.sma(length=20)
-        df_weekly['RSI_14_weekly'] = df_weekly.ta.rsi(length=14)
-        params = all_optimal_params.get(ticker, {'rsi_length': 14, 'bbands_length': 20})
-        df = calculate_all_features(df_daily, df_weekly, params)
-        model = load_ai_model(ticker)
-        if model is None: continue
+    # Logika Peringkat Jangka Panjang (Long Term)
+    # Risiko (harga beli - SMA mingguan) harus positif untuk menghindari pembagian dengan nol
+    long = df[(df['Close'] > df['SMA_20_weekly']) & (df['RSI_14_weekly'] > 55)]
+    risiko_long = long['Close'] - long['SMA_20_weekly']
+    long = long[risiko_long > 0]
+    risiko_long = risiko_long[risiko_long > 0]
+    df_long = pd.DataFrame({
+        "Saham": long['ticker'], "Harga Terakhir": long['Close'], "Rekomendasi Sistem": "TAHAN/BELI",
+        "Harga Beli": long['Close'], "Harga Take Profit": long['Close'] + (risiko_long * rrr_long_term),
+        "Harga Stop Loss": long['SMA_20_weekly'], "RSI Mingguan": long['RSI_14_weekly']
+    })
 
-        required_features = model.feature_names_in_
-        for col in required_features:
-            if col not in df.columns: df[col] = 0
-        X = df[required_features]
-        df['Prediksi_Sinyal'] = model.predict(X)
-        last_day = df.iloc[-1]
-        
-        # Logika Peringkat Jangka Pendek (Short Term)
-        if last_day['Prediksi_Sinyal'] == 1:
-            score = 0
-            if last_day['ADX_14'] > 25 and last_day['DMP_14'] > last_day['DMN_14']: score += last_day['ADX_14']
-            if last_day[f'RSI_{params.get("rsi_length", 14)}'] > 50: score += last_day[f'RSI_{params.get("rsi_length", 14)}']
-            
-            harga_beli = last_day['Close']
-            atr_rupiah = last_day['ATRr_14']
-            risiko = atr_multiplier * atr_rupiah
-            harga_sl = harga_beli - risiko
-            harga_tp = harga_beli + (risiko * risk_reward_ratio)
+    df_short = df_short.sort_values(by="Skor Rekomendasi", ascending=False).head(10).reset_index(drop=True)
+    df_long = df_long.sort_values(by="RSI Mingguan", ascending=False).head(10).reset_index(drop=True)
+    return df_short, df_long
 
-            short_term_picks.append({
-                "Saham": ticker,
-                "Harga Terakhir": last_day['Close'],
-                "Rekomendasi AI": "BELI",
-                "Harga Beli": harga_beli,
-                "Harga Take Profit": harga_tp,
-                "Harga Stop Loss": harga_sl,
-                "Skor Rekomendasi": score
-            })
+def ticker_tanpa_snapshot(stock_list, db_file_path):
+    """Saham di 'stock_list' yang tidak punya baris snapshot (data/model belum ada atau snapshot belum diperbarui)."""
+    tersedia = set(muat_snapshot(create_engine(f"sqlite:///{db_file_path}"), stock_list)['ticker'])
+    return [ticker for ticker in stock_list if ticker not in tersedia]
 
-        # Logika Peringkat Jangka Panjang (Long Term) - DIPERBARUI
-        if last_day['Close'] > last_day['SMA_20_weekly'] and last_day['RSI_14_weekly'] > 55:
-            harga_beli_long = last_day['Close']
-            harga_sl_long = last_day['SMA_20_weekly']
-            # Pastikan risiko tidak nol untuk menghindari pembagian dengan nol
-            if (harga_beli_long - harga_sl_long) > 0:
-                risiko_long = harga_beli_long - harga_sl_long
-                harga_tp_long = harga_beli_long + (risiko_long * rrr_long_term)
-                
-                long_term_picks.append({
-                    "Saham": ticker, "Harga Terakhir": last_day['Close'], "Rekomendasi Sistem": "TAHAN/BELI",
-                    "Harga Beli": harga_beli_long, "Harga Take Profit": harga_tp_long, "Harga Stop Loss": harga_sl_long,
-                    "RSI Mingguan": last_day['RSI_14_weekly']
-                })
-            
-    df_short = pd.DataFrame(short_term_picks).sort_values(by="Skor Rekomendasi", ascending=False).head(10)
-    df_long = pd.DataFrame(long_term_picks).sort_values(by="RSI Mingguan", ascending=False).head(10)
-    
-    return df_short, df_long
\ No newline at end of file
+# Fungsi inti screener: satu query ke tabel snapshot + aritmetika SL/TP tervektorisasi.
+# Mengembalikan (None, None) jika snapshot belum ada; halaman lalu memakai stream_screener.
+# Setiap panggilan dicatat sebagai satu run (di sesi Streamlit: thread-lokal, di memori; lihat instrumentation.py).
+def run_screener(stock_list, db_file_path, atr_multiplier, risk_reward_ratio, rrr_long_term):
+    with run('run_screener', saham=len(stock_list)):
+        _engine = create_engine(f"sqlite:///{db_file_path}")
+        df_snapshot = muat_snapshot(_engine, stock_list)
+        if df_snapshot.empty:
+            return None, None
+        with span('screen'):
+            return hitung_rekomendasi(df_snapshot, atr_multiplier, risk_reward_ratio, rrr_long_term)
@@ -0,0 +1,178 @@
+import pandas as pd
+from sqlalchemy import create_engine, text as sqlalchemy_text
+import argparse
+import os
+import time
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from features import load_price_tail, weekly_features, aktifkan_pandas_ta, DEFAULT_PARAMS, LOOKBACK_HARIAN, LOOKBACK_MINGGUAN
+from prediction_store import get_predictions
+from instrumentation import span, mulai_run, selesai_run, cetak_ringkasan
+from github_sync import sync_to_github
+
+# --- KONFIGURASI ---
+SNAPSHOT_TABLE = "screener_snapshot"
+KOLOM_SNAPSHOT = ['ticker', 'Date', 'Close', 'ATRr_14', 'ADX_14', 'DMP_14', 'DMN_14', 'RSI', 'rsi_length',
+                  'SMA_20_weekly', 'RSI_14_weekly', 'Prediksi_Sinyal']
+
+# --- PERHITUNGAN SATU BARIS SNAPSHOT ---
+def hitung_baris_snapshot(ticker, engine, all_optimal_params):
+    """
+    Menghitung kondisi hari terakhir satu saham untuk screener: harga, ATR, ADX/DMP/DMN,
+    RSI (panjang sesuai parameter optimal), SMA/RSI mingguan dan sinyal AI.
+    Mengembalikan None jika data atau model tidak tersedia.
+    """
+    # Mode tail-window: hanya baris yang dibutuhkan indikator, bukan seluruh riwayat
+    df_daily = load_price_tail(ticker, engine, LOOKBACK_HARIAN, 'daily')
+    df_weekly = load_price_tail(ticker, engine, LOOKBACK_MINGGUAN, 'weekly')
+    if len(df_daily) < 250 or len(df_weekly) < 52:
+        return None
+
+    params = all_optimal_params.get(ticker, DEFAULT_PARAMS)
+    rsi_length = params.get('rsi_length', 14)
+    with span('feature_build', ticker):
+        df = pd.merge_asof(df_daily, weekly_features(df_weekly), left_index=True, right_index=True)
+        # Hanya indikator yang dipakai screener; nilainya sama dengan versi "semua fitur"
+        aktifkan_pandas_ta()
+        df.ta.rsi(length=rsi_length, append=True)
+        df.ta.atr(length=14, append=True)
+        df.ta.adx(length=14, append=True)
+
+    # Sinyal AI dibaca dari penyimpanan prediksi (model hanya dijalankan untuk tanggal baru)
+    prediksi = get_predictions(ticker, engine, all_optimal_params)
+    if prediksi is None:
+        return None
+
+    last_day = df.iloc[-1].fillna(0)
+    return {
+        'ticker': ticker,
+        'Date': df.index[-1],
+        'Close': last_day['Close'],
+        'ATRr_14': last_day['ATRr_14'],
+        'ADX_14': last_day['ADX_14'],
+        'DMP_14': last_day['DMP_14'],
+        'DMN_14': last_day['DMN_14'],
+        'RSI': last_day[f'RSI_{rsi_length}'],
+        'rsi_length': rsi_length,
+        'SMA_20_weekly': last_day['SMA_20_weekly'],
+        'RSI_14_weekly': last_day['RSI_14_weekly'],
+        'Prediksi_Sinyal': int(prediksi['Sinyal'].get(df.index[-1], 0))
+    }
+
+# --- EKSEKUSI PARALEL (PROCESS POOL, HASIL DIALIRKAN) ---
+_worker_engine = None
+_worker_params = None
+
+def _init_worker(db_url, all_optimal_params):
+    """Inisialisasi setiap proses worker: satu engine database per proses."""
+    global _worker_engine, _worker_params
+    _worker_engine = create_engine(db_url)
+    _worker_params = all_optimal_params
+
+def _snapshot_worker(ticker):
+    """Menghitung baris snapshot satu ticker di dalam proses worker."""
+    try:
+        return ticker, hitung_baris_snapshot(ticker, _worker_engine, _worker_params)
+    except Exception as e:
+        print(f"\n-> [{ticker}] GAGAL: {e}")
+        return ticker, None
+
+def iter_baris_snapshot(tickers, db_url, all_optimal_params, workers=None, mp_context=None):
+    """
+    Generator: menghitung baris snapshot di process pool dan menghasilkan (ticker, baris)
+    begitu setiap ticker selesai (urutan selesai, bukan urutan input). 'baris' None
+    jika data atau model ticker tersebut tidak tersedia. 'mp_context' (mis. spawn) untuk
+    pemanggil multithread seperti server Streamlit, yang tidak aman di-fork.
+    """
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=mp_context, initializer=_init_worker,
+                                   initargs=(db_url, all_optimal_params))
+    futures = [executor.submit(_snapshot_worker, ticker) for ticker in tickers]
+    try:
+        for future in as_completed(futures):
+            yield future.result()
+    finally:
+        # Konsumen berhenti lebih awal (mis. halaman di-rerun): batalkan sisa antrean tanpa
+        # menunggu ticker yang sedang dihitung, agar pemanggil tidak ikut tertahan
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def bangun_snapshot(tickers, db_url, all_optimal_params, status_callback=None, workers=None):
+    """Menghitung baris snapshot untuk banyak saham secara paralel. Saham tanpa data/model dilewati."""
+    baris = []
+    for i, (ticker, hasil) in enumerate(iter_baris_snapshot(tickers, db_url, all_optimal_params, workers)):
+        if status_callback:
+            status_callback(ticker, (i + 1) / len(tickers))
+        if hasil:
+            baris.append(hasil)
+    return pd.DataFrame(baris, columns=KOLOM_SNAPSHOT).sort_values('ticker', ignore_index=True)
+
+# --- FUNGSI-FUNGSI DATABASE ---
+def simpan_snapshot(df_snapshot, engine, ganti_semua=True):
+    """
+    Menulis snapshot ke database. Mode penuh menulis ke tabel sementara lalu menukarnya
+    dalam satu transaksi, sehingga pembaca tidak pernah melihat tabel setengah jadi.
+    Mode parsial (ganti_semua=False) hanya mengganti baris ticker yang ada di df_snapshot.
+    """
+    tabel_sementara = f"{SNAPSHOT_TABLE}_baru"
+    with span('db_write'):
+        df_snapshot.to_sql(tabel_sementara, engine, if_exists='replace', index=False)
+    with span('db_write'), engine.begin() as conn:
+        if ganti_semua:
+            conn.execute(sqlalchemy_text(f"DROP TABLE IF EXISTS {SNAPSHOT_TABLE}"))
+            conn.execute(sqlalchemy_text(f"ALTER TABLE {tabel_sementara} RENAME TO {SNAPSHOT_TABLE}"))
+        else:
+            conn.execute(sqlalchemy_text(f"CREATE TABLE IF NOT EXISTS {SNAPSHOT_TABLE} AS SELECT * FROM {tabel_sementara} WHERE 0"))
+            conn.execute(sqlalchemy_text(f"DELETE FROM {SNAPSHOT_TABLE} WHERE ticker IN (SELECT ticker FROM {tabel_sementara})"))
+            conn.execute(sqlalchemy_text(f"INSERT INTO {SNAPSHOT_TABLE} SELECT * FROM {tabel_sementara}"))
+            conn.execute(sqlalchemy_text(f"DROP TABLE {tabel_sementara}"))
+
+def muat_snapshot(engine, tickers=None):
+    """Membaca tabel snapshot (opsional hanya untuk 'tickers'). DataFrame kosong jika belum ada."""
+    try:
+        with span('db_load'):
+            df = pd.read_sql(f"SELECT * FROM {SNAPSHOT_TABLE}", engine, parse_dates=['Date'])
+    except Exception:
+        return pd.DataFrame(columns=KOLOM_SNAPSHOT)
+    if tickers is not None:
+        df = df[df['ticker'].isin(tickers)]
+    return df.reset_index(drop=True)
+
+# --- BAGIAN EKSEKUSI UTAMA ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Membangun tabel snapshot screener (jalankan setelah get_data.py dan trainer.py).")
+    parser.add_argument("--tickers", nargs='+', help="(Opsional) Hanya perbarui baris ticker tertentu.")
+    parser.add_argument("--workers", type=int, default=None, help="(Opsional) Jumlah proses paralel (default: jumlah core CPU).")
+    args = parser.parse_args()
+
+    db_url = "sqlite:///data_saham.db"
+    engine = create_engine(db_url)
+    from ai_backtester import load_optimal_params
+    all_optimal_params = load_optimal_params()
+    if args.tickers:
+        tickers_to_process = [ticker.upper() for ticker in args.tickers]
+    else:
+        from trainer import get_available_stocks
+        tickers_to_process = get_available_stocks(engine)
+
+    print(f"--- MEMBANGUN SNAPSHOT SCREENER UNTUK {len(tickers_to_process)} SAHAM ---")
+    start_time = time.time()
+    mulai_run('screener_snapshot')
+    df_snapshot = bangun_snapshot(tickers_to_process, db_url, all_optimal_params, workers=args.workers,
+                                  status_callback=lambda ticker, persen: print(f"({persen:.0%}) Memproses: {ticker:<10}", end='\r'))
+    simpan_snapshot(df_snapshot, engine, ganti_semua=not args.tickers)
+
+    print("\n\n" + "="*54)
+    print("--- SNAPSHOT SCREENER SELESAI ---")
+    print(f"Laporan Akhir:")
+    print(f"Total waktu            : {(time.time() - start_time) / 60:.2f} menit")
+    print(f"Saham dalam snapshot   : {len(df_snapshot)} dari {len(tickers_to_process)}")
+    print(f"Sinyal BELI dari AI    : {int(df_snapshot['Prediksi_Sinyal'].sum())}")
+    cetak_ringkasan(selesai_run(saham=len(tickers_to_process)))
+    print("="*54)
+
+    os.makedirs('logs', exist_ok=True)
+    with open('logs/screener_snapshot_last_run.log', 'w') as f:
+        f.write(datetime.now().isoformat())
+
+    # Halaman Top Rekomendasi membaca snapshot ini: kirim bersama database agar remote tidak tertinggal satu siklus
+    if not df_snapshot.empty:
+        sync_to_github(f"Auto-sync: Snapshot screener untuk {len(df_snapshot)} saham", ['data_saham.db', 'logs/screener_snapshot_last_run.log'])
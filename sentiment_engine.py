@@ -0,0 +1,181 @@
+import pandas as pd
+import numpy as np
+import re
+import argparse
+import time
+from bisect import bisect_right
+
+# --- KONFIGURASI ---
+# Kamus berbobot: kolom kata, bobot (positif/negatif) dan imbuhan (ya = boleh berimbuhan,
+# mis. "naik" juga cocok dengan "kenaikan"/"menaikkan"; tidak = hanya kata/frasa utuh).
+KAMUS_FILE = "kamus_sentimen.csv"
+
+# Aturan imbuhan bahasa Indonesia yang dikenali di sekitar kata dasar
+AWALAN = r'(?:ke|ber|be|ter|di|se|per|pe|me|mem|men|meng|peng|pem|pen)?'
+AKHIRAN = r'(?:kan|an|i|nya|lah)*'
+# Peluluhan meN-/peN-: huruf awal kata dasar k/p/t/s luluh (turun -> menurun, koreksi -> mengoreksi)
+PELULUHAN = {'k': 'ng', 'p': 'm', 't': 'n', 's': 'ny'}
+
+# --- MESIN SENTIMEN ---
+def regex_trie(kata_kata):
+    """
+    Pola regex berbentuk trie untuk daftar kata: awalan bersama hanya dicocokkan sekali,
+    sehingga biaya pencocokan tidak tumbuh linear dengan ukuran kamus seperti alternatif biasa.
+    Cabang yang lebih panjang dicoba lebih dulu (kecocokan terpanjang menang).
+    """
+    if not kata_kata:
+        return '(?!)'
+    trie = {}
+    for kata in set(kata_kata):
+        node = trie
+        for huruf in kata:
+            node = node.setdefault(huruf, {})
+        node[''] = True
+
+    def pola(node):
+        cabang = [re.escape(huruf).replace(r'\ ', r'\s+') + pola(anak) for huruf, anak in sorted(node.items()) if huruf]
+        selesai = '' in node
+        if not cabang:
+            return ''
+        isi = cabang[0] if len(cabang) == 1 and not selesai else '(?:' + '|'.join(cabang) + ')'
+        return isi + '?' if selesai else isi
+    return pola(trie)
+
+class MesinSentimen:
+    """
+    Mencocokkan seluruh kamus dengan SATU regex gabungan (kamus dikompilasi menjadi trie,
+    dibatasi batas kata, dengan aturan imbuhan) lalu menjumlahkan bobot kata yang cocok.
+    """
+    def __init__(self, kamus):
+        self.bobot = {}
+        self.kanonik = {}   # bentuk luluh -> kata dasar
+        berimbuhan, utuh, luluh = [], [], []
+        for kata, bobot, imbuhan in kamus:
+            kata = kata.strip().lower()
+            self.bobot[kata] = float(bobot)
+            if imbuhan and ' ' not in kata:
+                berimbuhan.append(kata)
+                if kata[0] in PELULUHAN:
+                    bentuk = PELULUHAN[kata[0]] + kata[1:]
+                    self.kanonik[bentuk] = kata
+                    luluh.append(bentuk)
+            else:
+                utuh.append(kata)
+
+        self.pola = re.compile(
+            rf"\b(?:({regex_trie(utuh)})"
+            rf"|(?:me|pe)({regex_trie(luluh)}){AKHIRAN}"
+            rf"|{AWALAN}({regex_trie(berimbuhan)}){AKHIRAN})\b"
+        )
+
+    def _kata_dasar(self, match):
+        utuh, luluh, berimbuhan = match.groups()
+        if luluh:
+            return self.kanonik[luluh]
+        return re.sub(r'\s+', ' ', utuh) if utuh else berimbuhan
+
+    def kata_cocok(self, teks):
+        """Kata dasar kamus yang ditemukan di 'teks' (untuk debugging kamus)."""
+        return [self._kata_dasar(match) for match in self.pola.finditer(teks.lower())]
+
+    def skor_mentah(self, teks):
+        """Jumlah bobot kata kamus di satu teks."""
+        return sum(self.bobot[kata] for kata in self.kata_cocok(teks))
+
+    def skor_batch_mentah(self, daftar_teks):
+        """
+        Jumlah bobot untuk banyak teks sekaligus: semua teks digabung menjadi satu string dan
+        dipindai sekali; setiap kecocokan dipetakan kembali ke teks asalnya lewat offset.
+        """
+        daftar_teks = [str(teks).lower().replace('\n', ' ') for teks in daftar_teks]
+        gabungan = '\n'.join(daftar_teks)
+        awal = np.cumsum([0] + [len(teks) + 1 for teks in daftar_teks[:-1]]).tolist() if daftar_teks else []
+        skor = np.zeros(len(daftar_teks))
+        for match in self.pola.finditer(gabungan):
+            skor[bisect_right(awal, match.start()) - 1] += self.bobot[self._kata_dasar(match)]
+        return skor
+
+    def skor_batch(self, daftar_teks):
+        """Label sentimen -1/0/1 untuk banyak teks (format kolom 'sentiment' di news_sentiment)."""
+        return np.sign(self.skor_batch_mentah(daftar_teks)).astype(int)
+
+def muat_kamus(path=KAMUS_FILE):
+    """Membaca kamus CSV menjadi list (kata, bobot, boleh_berimbuhan)."""
+    df = pd.read_csv(path)
+    boleh = df['imbuhan'].astype(str).str.lower().isin(['ya', 'y', '1', 'true']) if 'imbuhan' in df.columns else pd.Series(False, index=df.index)
+    return list(zip(df['kata'], df['bobot'], boleh))
+
+_mesin_default = None
+
+def mesin_default():
+    """Mesin dari kamus_sentimen.csv, dibangun sekali per proses."""
+    global _mesin_default
+    if _mesin_default is None:
+        _mesin_default = MesinSentimen(muat_kamus())
+    return _mesin_default
+
+def skor_sentimen(daftar_teks):
+    """Label sentimen -1/0/1 untuk daftar judul berita memakai kamus bawaan."""
+    return mesin_default().skor_batch(daftar_teks)
+
+# --- PEMBANDING: PEMINDAIAN SUBSTRING LAMA ---
+def skor_substring_lama(teks, positif, negatif):
+    """Versi lama analisis_sentimen_sederhana: satu pemindaian 'in' per kata kamus."""
+    teks = teks.lower()
+    skor = sum(1 for kata in positif if kata in teks) - sum(1 for kata in negatif if kata in teks)
+    return int(np.sign(skor))
+
+def buat_judul_sintetis(n, kamus, seed=42):
+    """Judul berita sintetis: campuran kata pengisi dan kata kamus (dengan/ tanpa imbuhan)."""
+    rng = np.random.default_rng(seed)
+    pengisi = ['saham', 'emiten', 'hari', 'ini', 'investor', 'pasar', 'sektor', 'perbankan', 'tahun', 'kuartal',
+               'analis', 'target', 'harga', 'bursa', 'asing', 'sesi', 'pekan', 'depan', 'bbca', 'tlkm', 'goto']
+    imbuhan = [('', ''), ('ke', 'an'), ('me', 'kan'), ('', 'nya'), ('ber', '')]
+    kata_kamus = [kata for kata, _, _ in kamus]
+    judul = []
+    for _ in range(n):
+        kata = list(rng.choice(pengisi, size=rng.integers(5, 10)))
+        for _ in range(rng.integers(0, 3)):
+            awalan, akhiran = imbuhan[rng.integers(len(imbuhan))]
+            kata.insert(rng.integers(len(kata) + 1), f"{awalan}{rng.choice(kata_kamus)}{akhiran}")
+        judul.append(' '.join(kata).capitalize())
+    return judul
+
+# --- BAGIAN EKSEKUSI UTAMA (BENCHMARK) ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark mesin sentimen regex gabungan vs pemindaian substring lama.")
+    parser.add_argument("--judul", type=int, default=50_000, help="Jumlah judul berita sintetis.")
+    parser.add_argument("--kamus", default=KAMUS_FILE, help="File kamus CSV (kata,bobot,imbuhan).")
+    parser.add_argument("--kata-tambahan", type=int, default=0, help="(Opsional) Tambah N kata acak ke kamus untuk mengukur skala kamus besar.")
+    args = parser.parse_args()
+
+    kamus = muat_kamus(args.kamus)
+    if args.kata_tambahan:
+        rng = np.random.default_rng(7)
+        huruf = list('abcdefghijklmnoprstuwy')
+        kamus += [(''.join(rng.choice(huruf, size=rng.integers(5, 10))), rng.choice([-1, 1]), bool(rng.integers(2)))
+                  for _ in range(args.kata_tambahan)]
+    positif = [kata for kata, bobot, _ in kamus if bobot > 0]
+    negatif = [kata for kata, bobot, _ in kamus if bobot < 0]
+    judul = buat_judul_sintetis(args.judul, kamus)
+
+    start_time = time.perf_counter()
+    mesin = MesinSentimen(kamus)
+    waktu_kompilasi = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    skor_lama = np.array([skor_substring_lama(teks, positif, negatif) for teks in judul])
+    waktu_lama = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    skor_baru = mesin.skor_batch(judul)
+    waktu_baru = time.perf_counter() - start_time
+
+    print("="*54)
+    print(f"--- BENCHMARK SENTIMEN ({len(judul):,} judul, {len(kamus)} kata kamus) ---")
+    print(f"Substring lama         : {waktu_lama:.3f} dtk ({len(judul) / waktu_lama:,.0f} judul/dtk)")
+    print(f"Regex gabungan (batch) : {waktu_baru:.3f} dtk ({len(judul) / waktu_baru:,.0f} judul/dtk)")
+    print(f"Kompilasi kamus        : {waktu_kompilasi * 1000:.1f} ms")
+    print(f"Percepatan             : {waktu_lama / waktu_baru:.1f}x")
+    print(f"Label sama dengan lama : {np.mean(skor_lama == skor_baru) * 100:.1f}%")
+    print("="*54)
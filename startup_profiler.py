@@ -0,0 +1,131 @@
+import subprocess
+import sys
+import os
+import ast
+import re
+import glob
+import json
+import time
+import argparse
+import statistics
+from datetime import datetime
+
+# --- KONFIGURASI ---
+# Entry point yang diukur: beranda, semua halaman dan script CLI yang dijalankan Pusat Kontrol.
+ENTRY_POINTS = ['🏠_Beranda.py'] + sorted(glob.glob(os.path.join('pages', '*.py'))) + ['trainer.py', 'get_data.py']
+
+# Anggaran waktu impor cold-start (detik, median beberapa proses baru). Entry point tanpa
+# anggaran khusus memakai ANGGARAN_DEFAULT.
+ANGGARAN_DEFAULT = 3.0
+ANGGARAN_DETIK = {
+    'trainer.py': 2.0,
+    'get_data.py': 2.0,
+}
+
+# Dependensi berat yang tidak boleh ikut terimpor saat startup: semuanya diimpor malas di
+# fungsi yang benar-benar memakainya (features.aktifkan_pandas_ta, data_cache.load_model, dst.).
+# Modul yang sudah diimpor oleh streamlit sendiri tidak dihitung untuk halaman.
+MODUL_TERLARANG = ('pandas_ta', 'sklearn', 'matplotlib', 'yfinance', 'plotly', 'joblib')
+
+# --- PENGUKURAN ---
+def kode_impor(entry_point):
+    """
+    Semua pernyataan import level modul dari sebuah entry point, sebagai kode Python.
+    Hanya impornya yang dijalankan, sehingga halaman Streamlit bisa diukur tanpa server
+    dan script CLI tidak menyentuh database.
+    """
+    with open(entry_point, 'r', encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+    return "\n".join(ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom)))
+
+def parse_importtime(stderr):
+    """
+    Mengurai output 'python -X importtime' menjadi list (modul, self_us, kumulatif_us, level).
+    Level 0 = diimpor langsung oleh entry point (kumulatifnya sudah mencakup sub-impor).
+    """
+    hasil = []
+    for line in stderr.splitlines():
+        match = re.match(r'import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)', line)
+        if match:
+            hasil.append((match.group(4), int(match.group(1)), int(match.group(2)), len(match.group(3)) // 2))
+    return hasil
+
+def _jalankan_importtime(kode):
+    """Menjalankan 'kode' di proses Python baru dengan -X importtime. Mengembalikan (proses, durasi_detik)."""
+    env = {**os.environ, 'PYTHONPATH': os.getcwd()}
+    start_time = time.perf_counter()
+    proses = subprocess.run([sys.executable, '-X', 'importtime', '-c', kode],
+                            capture_output=True, text=True, encoding='utf-8', env=env)
+    return proses, time.perf_counter() - start_time
+
+def modul_dari(stderr):
+    """Nama paket level atas yang terimpor menurut output importtime."""
+    return {nama.split('.')[0] for nama, _, _, _ in parse_importtime(stderr)}
+
+def ukur_entry_point(entry_point, ulang=3, modul_dasar=frozenset()):
+    """
+    Menjalankan impor entry point di 'ulang' proses baru; median waktu & rincian impor proses
+    terakhir. Modul di 'modul_dasar' (impor bawaan framework) tidak dihitung sebagai terlarang.
+    """
+    kode = kode_impor(entry_point)
+    durasi = []
+    for _ in range(ulang):
+        proses, detik = _jalankan_importtime(kode)
+        durasi.append(detik)
+        if proses.returncode != 0:
+            break
+
+    impor = parse_importtime(proses.stderr)
+    modul = modul_dari(proses.stderr) - modul_dasar
+    teratas = sorted((baris for baris in impor if baris[3] == 0), key=lambda baris: baris[2], reverse=True)
+    anggaran = ANGGARAN_DETIK.get(entry_point.replace(os.sep, '/'), ANGGARAN_DEFAULT)
+    error = proses.stderr.strip().splitlines()[-1] if proses.returncode != 0 else None
+    return {
+        'entry_point': entry_point,
+        'waktu_detik': statistics.median(durasi),
+        'impor_detik': sum(baris[2] for baris in teratas) / 1e6,
+        'jumlah_modul': len(impor),
+        'teratas': [(nama, kumulatif / 1e6) for nama, _, kumulatif, _ in teratas[:5]],
+        'terlarang': sorted(modul.intersection(MODUL_TERLARANG)),
+        'anggaran_detik': anggaran,
+        'error': error,
+    }
+
+def lulus(hasil):
+    return hasil['error'] is None and not hasil['terlarang'] and hasil['waktu_detik'] <= hasil['anggaran_detik']
+
+# --- BAGIAN EKSEKUSI UTAMA ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mengukur waktu impor cold-start setiap entry point (python -X importtime) terhadap anggarannya.")
+    parser.add_argument("--entry-points", nargs='+', default=ENTRY_POINTS, help="(Opsional) Entry point tertentu saja.")
+    parser.add_argument("--ulang", type=int, default=3, help="Jumlah proses baru per entry point (diambil median).")
+    parser.add_argument("--json", metavar="FILE", help="(Opsional) Simpan laporan lengkap sebagai JSON.")
+    args = parser.parse_args()
+
+    modul_streamlit = frozenset(modul_dari(_jalankan_importtime("import streamlit")[0].stderr))
+    semua_hasil = []
+    for i, entry_point in enumerate(args.entry_points):
+        print(f"({i + 1}/{len(args.entry_points)}) Mengukur: {entry_point:<40}", end='\r')
+        modul_dasar = modul_streamlit if 'streamlit' in kode_impor(entry_point) else frozenset()
+        semua_hasil.append(ukur_entry_point(entry_point, args.ulang, modul_dasar))
+
+    print("\n\n" + "="*54)
+    print("--- LAPORAN WAKTU STARTUP ---")
+    for hasil in semua_hasil:
+        status = "LULUS" if lulus(hasil) else "GAGAL"
+        print(f"\n[{status}] {hasil['entry_point']}")
+        print(f"  Waktu cold-start : {hasil['waktu_detik']:.2f} dtk (anggaran {hasil['anggaran_detik']:.1f} dtk)")
+        print(f"  Total impor      : {hasil['impor_detik']:.2f} dtk, {hasil['jumlah_modul']} modul")
+        print(f"  Impor terberat   : " + ", ".join(f"{nama} {detik:.2f}s" for nama, detik in hasil['teratas']))
+        if hasil['terlarang']:
+            print(f"  Impor terlarang  : {', '.join(hasil['terlarang'])} (harus diimpor malas)")
+        if hasil['error']:
+            print(f"  Error            : {hasil['error']}")
+    jumlah_gagal = sum(not lulus(hasil) for hasil in semua_hasil)
+    print(f"\nLaporan Akhir: {len(semua_hasil) - jumlah_gagal} lulus, {jumlah_gagal} gagal")
+    print("="*54)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'waktu': datetime.now().isoformat(), 'hasil': semua_hasil}, f, indent=2, ensure_ascii=False)
+    sys.exit(1 if jumlah_gagal else 0)
@@ -1,23 +1,21 @@
-import pandas as pd
 import numpy as np
 from sqlalchemy import create_engine, inspect
-import pandas_ta as ta
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import accuracy_score, classification_report
-import joblib
 import os
 import argparse
 import time
 import json
 from datetime import datetime
 from github_sync import sync_to_github # <-- Impor kurir kita
+from features import load_features, split_features_target
+from data_versions import bump_version
+from instrumentation import span, mulai_run, selesai_run, cetak_ringkasan
 
 # --- FUNGSI-FUNGSI BANTU ---
 def get_available_stocks(engine):
     """Mendapatkan daftar semua tabel (saham) dari database."""
     inspector = inspect(engine)
-    stock_names = [name for name in inspector.get_table_names() if not name.endswith(('_weekly', '_sentiment')) and 'news' not in name and 'broker' not in name]
+    # Tabel sistem (portofolio, prediksi, dll.) tidak memakai akhiran ticker seperti '.JK'
+    stock_names = [name for name in inspector.get_table_names() if not name.endswith(('_weekly', '_sentiment')) and 'news' not in name and 'broker' not in name and '.' in name]
     return sorted(stock_names)
 
 def train_model_for_ticker(ticker_symbol, engine, all_optimal_params):
@@ -25,6 +23,13 @@ def train_model_for_ticker(ticker_symbol, engine, all_optimal_params):
     Fungsi untuk menjalankan seluruh proses training untuk satu ticker
     menggunakan parameter yang sudah dioptimasi.
     """
+    # Impor berat ditunda sampai training benar-benar dijalankan; modul lain
+    # (screener_snapshot, walk_forward, backtester) hanya mengimpor get_available_stocks
+    from sklearn.model_selection import train_test_split
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.metrics import accuracy_score, classification_report
+    import joblib
+
     model_filename = f'models/{ticker_symbol}_model.joblib'
 
     default_params = {
@@ -33,56 +38,12 @@ def train_model_for_ticker(ticker_symbol, engine, all_optimal_params):
     }
     params = all_optimal_params.get(ticker_symbol, default_params)
     
-    try:
-        df_daily = pd.read_sql(f"SELECT * FROM '{ticker_symbol}'", engine, index_col='Date', parse_dates=['Date'])
-        if len(df_daily) < 250:
-            # print(f"-> Data untuk {ticker_symbol} tidak cukup panjang ({len(df_daily)} baris). Melewati.")
-            return False, None
-    except Exception as e:
-        # print(f"-> Gagal memuat data harian untuk {ticker_symbol}. Error: {e}")
+    # --- REKAYASA FITUR (LENGKAP, DIBAGI DENGAN BACKTESTER & PREDICTION STORE) ---
+    df = load_features(ticker_symbol, engine, {ticker_symbol: params})
+    if df is None:
+        # Data harian tidak ada atau kurang dari 250 baris
         return False, None
-
-    # --- REKAYASA FITUR (LENGKAP) ---
-    df_weekly = pd.read_sql(f"SELECT * FROM '{ticker_symbol}_weekly'", engine, index_col='Date', parse_dates=['Date'])
-    df_weekly['SMA_20_weekly'] = df_weekly.ta.sma(length=20)
-    df_weekly['RSI_14_weekly'] = df_weekly.ta.rsi(length=14)
-    df_weekly_features = df_weekly[['SMA_20_weekly', 'RSI_14_weekly']]
-    df = pd.merge_asof(df_daily, df_weekly_features, left_index=True, right_index=True)
-    
-    try:
-        df_sentiment = pd.read_sql(f"SELECT * FROM news_sentiment WHERE ticker='{ticker_symbol}'", engine, parse_dates=['date'])
-        if not df_sentiment.empty:
-            sentiment_daily = df_sentiment.groupby(df_sentiment['date'].dt.date).agg(sentiment_sum=('sentiment', 'sum')).reset_index()
-            sentiment_daily['date'] = pd.to_datetime(sentiment_daily['date'])
-            sentiment_daily.set_index('date', inplace=True)
-            df = df.merge(sentiment_daily, left_index=True, right_index=True, how='left')
-    except:
-        df['sentiment_sum'] = 0
-
-    df.ta.rsi(length=params.get('rsi_length', 14), append=True)
-    df.ta.macd(fast=12, slow=26, signal=9, append=True)
-    df.ta.bbands(length=params.get('bbands_length', 20), append=True)
-    df.ta.atr(length=14, append=True)
-    df.ta.obv(append=True)
-    df.ta.adx(length=14, append=True)
-    df.ta.cdl_pattern(name="all", append=True)
-    df.ta.pivots(append=True)
-    pivot_levels_raw = ['PIVOTS_TRAD_D_P','PIVOTS_TRAD_D_S1','PIVOTS_TRAD_D_R1','PIVOTS_TRAD_D_S2','PIVOTS_TRAD_D_R2']
-    pivot_levels_simple = ['p','s1','r1','s2','r2']
-    rename_dict = {old: new for old, new in zip(pivot_levels_raw, pivot_levels_simple)}
-    df.rename(columns=rename_dict, inplace=True)
-    for level in pivot_levels_simple:
-        if level in df.columns: df[f'Jarak_ke_{level.upper()}'] = (df['Close'] - df[level]) / df['Close']
-    for level in ['p', 's1', 'r1']:
-        if level in df.columns: df[f'Posisi_vs_{level.upper()}'] = np.where(df['Close'] > df[level], 1, 0)
-    
-    future_period = 5; profit_threshold = 0.02
-    df['Target'] = np.where(df['Close'].shift(-future_period) > df['Close'] * (1 + profit_threshold), 1, 0)
-    df.fillna(0, inplace=True)
-    
-    kolom_non_fitur = [col for col in df.columns if col in pivot_levels_simple + ['Target']]
-    X = df.drop(columns=kolom_non_fitur)
-    y = df['Target']
+    X, y = split_features_target(df)
 
     if len(X) < 100:
         # print(f"-> Data untuk {ticker_symbol} tidak cukup setelah diproses. Melewati.")
@@ -97,13 +58,17 @@ def train_model_for_ticker(ticker_symbol, engine, all_optimal_params):
         random_state=42,
         n_jobs=-1
     )
-    model.fit(X_train, y_train)
+    with span('train', ticker_symbol):
+        model.fit(X_train, y_train)
     
-    if os.path.exists(model_filename): os.remove(model_filename)
-    joblib.dump(model, model_filename)
+    with span('model_save', ticker_symbol):
+        if os.path.exists(model_filename): os.remove(model_filename)
+        joblib.dump(model, model_filename)
+    bump_version(engine, 'model', [ticker_symbol])
     
     # Evaluasi dan kembalikan rapornya
-    predictions = model.predict(X_test)
+    with span('predict', ticker_symbol):
+        predictions = model.predict(X_test)
     
     # Menangani kasus di mana data tes hanya memiliki satu kelas
     if len(np.union1d(y_test.unique(), predictions)) < 2:
@@ -152,7 +117,9 @@ if __name__ == "__main__":
 
     sukses_count = 0
     gagal_count = 0
+    model_dilatih = [] # Artefak yang benar-benar berubah, untuk sinkronisasi selektif
     start_time = time.time()
+    mulai_run('trainer')
     
     for i, ticker in enumerate(tickers_to_process):
         print(f"\n({i+1}/{len(tickers_to_process)}) Memproses: {ticker}")
@@ -161,6 +128,7 @@ if __name__ == "__main__":
         
         if sukses:
             sukses_count += 1
+            model_dilatih.append(f'models/{ticker}_model.joblib')
             f1_score_1 = rapor.get('Peluang Bagus (1)', {}).get('f1-score', 0)
             print(f"-> {ticker} BERHASIL dilatih. F1-Score (Peluang Bagus): {f1_score_1:.2f}")
         else:
@@ -176,6 +144,7 @@ if __name__ == "__main__":
     print(f"Total saham diproses   : {len(tickers_to_process)}")
     print(f"Berhasil dilatih       : {sukses_count}")
     print(f"Gagal dilatih          : {gagal_count}")
+    cetak_ringkasan(selesai_run(saham=len(tickers_to_process), berhasil=sukses_count))
     
     with open('logs/trainer_last_run.log', 'w') as f:
         f.write(datetime.now().isoformat())
@@ -184,4 +153,4 @@ if __name__ == "__main__":
     
     # --- PANGGIL "KURIR" UNTUK SINKRONISASI OTOMATIS ---
     if sukses_count > 0: # Hanya sync jika ada model baru yang berhasil dilatih
-        sync_to_github(f"Auto-sync: Latih ulang {sukses_count} model AI")
\ No newline at end of file
+        sync_to_github(f"Auto-sync: Latih ulang {sukses_count} model AI", model_dilatih + ['data_saham.db', 'logs/trainer_last_run.log'])
\ No newline at end of file
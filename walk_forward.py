@@ -0,0 +1,226 @@
+import pandas as pd
+import numpy as np
+from sqlalchemy import create_engine
+from sklearn.ensemble import RandomForestClassifier, HistGradientBoostingClassifier
+import argparse
+import os
+import time
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from backtest_engine import jalankan_simulasi
+from performance_metrics import hitung_metrik, susun_kurva
+from features import load_features, split_features_target, FUTURE_PERIOD
+from ai_backtester import load_optimal_params
+from instrumentation import span, mulai_run, selesai_run, cetak_ringkasan
+
+# --- KONFIGURASI ---
+MIN_BARIS_LATIH = 250
+LEARNERS = ['rf', 'rf_warm', 'hgb']
+DEFAULT_MODEL_PARAMS = {'n_estimators': 100, 'max_depth': 20, 'min_samples_leaf': 1}
+
+# --- JADWAL RETRAIN ---
+def batas_retrain(index, frekuensi='M', min_latih=MIN_BARIS_LATIH):
+    """
+    Posisi baris tempat model dilatih ulang: hari bursa pertama setiap periode
+    ('W' mingguan, 'M' bulanan, 'Q' kuartalan) setelah minimal 'min_latih' baris.
+    """
+    periode = index.to_period(frekuensi)
+    awal_periode = np.flatnonzero(np.concatenate(([True], periode[1:] != periode[:-1])))
+    return awal_periode[awal_periode >= min_latih]
+
+def buat_model(learner, params, n_jobs=1):
+    """Membuat learner baru. 'hgb' jauh lebih murah dilatih ulang daripada RandomForest."""
+    if learner == 'hgb':
+        return HistGradientBoostingClassifier(max_iter=params.get('n_estimators', 100), random_state=42)
+    return RandomForestClassifier(
+        n_estimators=params.get('n_estimators', 100),
+        max_depth=params.get('max_depth', 20),
+        min_samples_leaf=params.get('min_samples_leaf', 1),
+        random_state=42,
+        n_jobs=n_jobs,
+        warm_start=(learner == 'rf_warm')
+    )
+
+# --- PEKERJA (DIJALANKAN DI PROSES TERPISAH) ---
+def _latih_prediksi_jendela(X_latih, y_latih, X_uji, learner, params, ticker=None):
+    """Satu jendela walk-forward: latih model baru pada data masa lalu, prediksi periode berikutnya."""
+    if len(np.unique(y_latih)) < 2:
+        return np.zeros(len(X_uji), dtype=np.int8) # Belum ada contoh kedua kelas, anggap tidak ada peluang
+    model = buat_model(learner, params, n_jobs=1)
+    with span('train', ticker):
+        model.fit(X_latih, y_latih)
+    with span('predict', ticker):
+        return model.predict(X_uji).astype(np.int8)
+
+def _walk_forward_warm_start(X, y, batas, params, pohon_per_langkah, ticker=None):
+    """
+    Walk-forward RandomForest dengan warm_start: pohon lama dipertahankan dan setiap
+    jendela hanya menumbuhkan 'pohon_per_langkah' pohon baru pada data terbaru.
+    Rantai ini berurutan, jadi paralelisasinya per ticker, bukan per jendela.
+    """
+    sinyal = np.zeros(len(X) - batas[0], dtype=np.int8)
+    model = None
+    for k, b in enumerate(batas):
+        akhir_uji = batas[k + 1] if k + 1 < len(batas) else len(X)
+        y_latih = y[:b - FUTURE_PERIOD]
+        if model is None:
+            # Model baru dibuat setelah kedua kelas muncul agar kelas pohon-pohon konsisten
+            if len(np.unique(y_latih)) < 2:
+                continue
+            model = buat_model('rf_warm', params, n_jobs=1)
+        else:
+            model.n_estimators += pohon_per_langkah
+        with span('train', ticker):
+            model.fit(X[:b - FUTURE_PERIOD], y_latih)
+        with span('predict', ticker):
+            sinyal[b - batas[0]:akhir_uji - batas[0]] = model.predict(X[b:akhir_uji])
+    return sinyal
+
+# --- FUNGSI UTAMA ---
+def siapkan_data(ticker, engine, all_optimal_params, frekuensi):
+    """
+    Membangun matriks fitur SEKALI untuk seluruh riwayat. Semua indikator hanya
+    memakai data masa lalu, jadi setiap jendela cukup mengambil irisan barisnya.
+    """
+    df = load_features(ticker, engine, all_optimal_params)
+    if df is None:
+        return None
+    X, y = split_features_target(df)
+    batas = batas_retrain(df.index, frekuensi)
+    if len(batas) == 0:
+        return None
+    return df, X.to_numpy(dtype=np.float32), y.to_numpy(), batas
+
+def kirim_tugas(executor, data, learner, params, pohon_per_langkah, ticker=None):
+    """Mengirim pekerjaan satu ticker ke process pool: per jendela ('rf', 'hgb') atau satu rantai ('rf_warm')."""
+    _, X, y, batas = data
+    if learner == 'rf_warm':
+        return [executor.submit(_walk_forward_warm_start, X, y, batas, params, pohon_per_langkah, ticker)]
+    akhir = np.append(batas[1:], len(X))
+    # Training hanya memakai baris yang Target-nya sudah diketahui saat retrain (purge FUTURE_PERIOD hari)
+    return [executor.submit(_latih_prediksi_jendela, X[:b - FUTURE_PERIOD], y[:b - FUTURE_PERIOD], X[b:e], learner, params, ticker)
+            for b, e in zip(batas, akhir)]
+
+def ringkas_hasil(ticker, data, futures, learner, modal_awal, waktu_mulai):
+    """
+    Menggabungkan sinyal out-of-sample dan mensimulasikan kurva ekuitas (beserta posisinya).
+    Metrik kinerja dihitung sekali untuk semua ticker di jalankan_walk_forward.
+    """
+    df, _, _, batas = data
+    df_oos = df.iloc[batas[0]:][['Close']].copy()
+    df_oos['Sinyal'] = np.concatenate([f.result() for f in futures])
+    with span('simulate', ticker):
+        simulasi = jalankan_simulasi(df_oos, kolom_sinyal='Sinyal', modal_awal=modal_awal)
+
+    hasil = {
+        "ticker": ticker,
+        "learner": learner,
+        "jumlah_jendela": len(batas),
+        "mulai_oos": df_oos.index[0].date(),
+        "wf_return_pct": simulasi['total_return_pct'],
+        "bh_return_pct": simulasi['bh_return_pct'],
+        "alpha_pct": simulasi['alpha_pct'],
+        "nilai_akhir": simulasi['nilai_akhir'],
+        "waktu_detik": time.time() - waktu_mulai
+    }
+    kurva = simulasi['nilai_portfolio'].rename_axis('Date').reset_index().assign(ticker=ticker, Posisi=simulasi['posisi'].to_numpy())
+    return hasil, kurva
+
+def jalankan_walk_forward(tickers, engine, all_optimal_params, learner='rf', frekuensi='M',
+                          pohon_per_langkah=10, modal_awal=100_000_000, workers=None):
+    """
+    Walk-forward retrain-and-predict untuk banyak ticker. Fitur ticker berikutnya
+    dibangun di proses utama sementara jendela ticker sebelumnya dilatih di pool.
+    Mengembalikan (DataFrame hasil, DataFrame kurva ekuitas out-of-sample).
+    """
+    semua_hasil, semua_kurva = [], []
+    total = len(tickers)
+    start_time = time.time()
+
+    def selesaikan(tertunda):
+        ticker, data, futures, waktu_mulai = tertunda
+        try:
+            hasil, kurva = ringkas_hasil(ticker, data, futures, learner, modal_awal, waktu_mulai)
+            semua_hasil.append(hasil)
+            semua_kurva.append(kurva)
+        except Exception as e:
+            print(f"\n-> [{ticker}] GAGAL: {e}")
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        tertunda = None
+        for i, ticker in enumerate(tickers):
+            print(f"({i+1}/{total}) Walk-forward: {ticker:<10} | {time.time() - start_time:.1f} detik   ", end='\r')
+            waktu_mulai = time.time()
+            params = {**DEFAULT_MODEL_PARAMS, **all_optimal_params.get(ticker, {})}
+            data = siapkan_data(ticker, engine, all_optimal_params, frekuensi)
+            if tertunda:
+                selesaikan(tertunda)
+                tertunda = None
+            if data is None:
+                continue
+            tertunda = (ticker, data, kirim_tugas(executor, data, learner, params, pohon_per_langkah, ticker), waktu_mulai)
+        if tertunda:
+            selesaikan(tertunda)
+
+    if not semua_hasil:
+        return pd.DataFrame(), pd.DataFrame()
+    # Metrik kinerja semua ticker dalam satu pass tervektorisasi (kurva berbeda panjang diisi NaN)
+    with span('metrics'):
+        df_metrik = hitung_metrik(*susun_kurva([k['Nilai_Portfolio'].to_numpy() for k in semua_kurva],
+                                               [k['Posisi'].to_numpy() for k in semua_kurva]))
+    df_hasil = pd.concat([pd.DataFrame(semua_hasil), df_metrik], axis=1)
+    return df_hasil, pd.concat(semua_kurva, ignore_index=True)
+
+# --- BAGIAN EKSEKUSI UTAMA ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest walk-forward: model dilatih ulang berkala, hanya prediksi out-of-sample yang disimulasikan.")
+    parser.add_argument("--tickers", nargs='+', help="(Opsional) Daftar ticker. Default: semua saham di database.")
+    parser.add_argument("--frekuensi", choices=['W', 'M', 'Q'], default='M', help="Jadwal retrain: mingguan, bulanan (default) atau kuartalan.")
+    parser.add_argument("--learner", choices=LEARNERS, default='rf', help="rf: RandomForest baru per jendela, rf_warm: tumbuhkan pohon (warm_start), hgb: HistGradientBoosting (lebih cepat).")
+    parser.add_argument("--pohon-per-langkah", type=int, default=10, help="Jumlah pohon baru per jendela untuk learner rf_warm.")
+    parser.add_argument("--modal", type=float, default=100_000_000, help="Modal awal simulasi.")
+    parser.add_argument("--workers", type=int, default=None, help="(Opsional) Jumlah proses paralel (default: jumlah core CPU).")
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite:///data_saham.db")
+    all_optimal_params = load_optimal_params()
+    if args.tickers:
+        tickers_to_process = [ticker.upper() for ticker in args.tickers]
+    else:
+        from trainer import get_available_stocks
+        tickers_to_process = get_available_stocks(engine)
+    print(f"--- WALK-FORWARD ({args.learner}, retrain {args.frekuensi}) UNTUK {len(tickers_to_process)} SAHAM ---")
+
+    start_time = time.time()
+    mulai_run('walk_forward')
+    df_hasil, df_kurva = jalankan_walk_forward(tickers_to_process, engine, all_optimal_params, learner=args.learner,
+                                               frekuensi=args.frekuensi, pohon_per_langkah=args.pohon_per_langkah,
+                                               modal_awal=args.modal, workers=args.workers)
+
+    if not df_hasil.empty:
+        output_filename = 'hasil_walk_forward.csv'
+        kurva_filename = 'kurva_walk_forward.csv'
+        df_hasil.sort_values(by='alpha_pct', ascending=False, inplace=True)
+        df_hasil.to_csv(output_filename, index=False, float_format='%.2f')
+        df_kurva[['ticker', 'Date', 'Nilai_Portfolio']].to_csv(kurva_filename, index=False, float_format='%.2f')
+
+        total_waktu_menit = (time.time() - start_time) / 60
+        print("\n\n" + "="*54)
+        print("--- BACKTEST WALK-FORWARD SELESAI ---")
+        print(f"Laporan Akhir:")
+        print(f"Total waktu            : {total_waktu_menit:.2f} menit")
+        print(f"Total saham diuji      : {len(df_hasil)}")
+        print(f"Total jendela retrain  : {df_hasil['jumlah_jendela'].sum()}")
+        print(f"Rata-rata alpha OOS    : {df_hasil['alpha_pct'].mean():.2f}%")
+        print("\n--- 20 SAHAM DENGAN KINERJA OUT-OF-SAMPLE TERBAIK ---")
+        print(df_hasil.head(20).to_string(index=False))
+        print(f"\nLaporan lengkap tersimpan di file: '{output_filename}', kurva ekuitas di '{kurva_filename}'")
+        cetak_ringkasan(selesai_run(saham=len(tickers_to_process), learner=args.learner))
+        print("="*54)
+
+        os.makedirs('logs', exist_ok=True)
+        with open('logs/walk_forward_last_run.log', 'w') as f:
+            f.write(datetime.now().isoformat())
+    else:
+        print("Tidak ada hasil walk-forward yang bisa diproses.")
+        selesai_run(saham=len(tickers_to_process), learner=args.learner)